@@ -0,0 +1,228 @@
+"""Rule engine alert inkremental dengan hysteresis, cooldown, dedup dan histori
+
+Rule dideklarasikan sebagai data (AlertRule). Reading hanya dievaluasi sekali
+(berdasarkan timestamp terakhir yang sudah diproses), rule perangkat/rumah
+tangga hanya dievaluasi ulang saat versi tabel perangkat atau target berubah.
+"""
+import itertools
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from config import (
+    ALERT_COOLDOWN_S,
+    ALERT_DEDUP_S,
+    ALERT_DEVICE_KWH,
+    ALERT_HISTORY_SIZE,
+    ALERT_VOLTAGE_HYSTERESIS,
+    ALERT_VOLTAGE_MAX,
+    ALERT_VOLTAGE_MIN,
+)
+from sensor_buffer import format_timestamp, now_ms
+
+READING, DEVICE, HOUSEHOLD, ANOMALY = "reading", "device", "household", "anomaly"
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    name: str
+    source: str         # READING (kolom buffer sensor), DEVICE (kolom DeviceTable), HOUSEHOLD (total),
+                        # ANOMALY (event AnomalyDetector, field = jenis event)
+    field: str
+    direction: str      # "above" atau "below"
+    trigger: float      # Alert aktif saat nilai melewati batas ini...
+    clear: float        # ...dan baru selesai saat kembali melewati batas ini (hysteresis)
+    level: str          # "info" / "warning" / "danger"
+    message: str        # Template: {subject}, {value}, {trigger}
+    cooldown_s: float = ALERT_COOLDOWN_S
+    dedup_s: float = ALERT_DEDUP_S
+
+    def triggered(self, values, trigger=None):
+        trigger = self.trigger if trigger is None else trigger
+        return values > trigger if self.direction == "above" else values < trigger
+
+    def cleared(self, values, clear=None):
+        clear = self.clear if clear is None else clear
+        return values <= clear if self.direction == "above" else values >= clear
+
+
+RULES = (
+    AlertRule("voltage_low", READING, "voltage", "below", ALERT_VOLTAGE_MIN,
+              ALERT_VOLTAGE_MIN + ALERT_VOLTAGE_HYSTERESIS, "danger",
+              "⚡ Tegangan rendah terdeteksi: {value:.1f} V!"),
+    AlertRule("voltage_high", READING, "voltage", "above", ALERT_VOLTAGE_MAX,
+              ALERT_VOLTAGE_MAX - ALERT_VOLTAGE_HYSTERESIS, "danger",
+              "⚡ Tegangan tinggi terdeteksi: {value:.1f} V!"),
+    AlertRule("device_high_energy", DEVICE, "energy", "above", ALERT_DEVICE_KWH,
+              ALERT_DEVICE_KWH * 0.95, "info",
+              "💡 {subject} memiliki konsumsi tinggi ({value:.1f} kWh). Pertimbangkan optimasi."),
+    # Batas rule rumah tangga diambil dari target (trigger) dan 95% target (clear) saat evaluasi
+    AlertRule("household_over_target", HOUSEHOLD, "energy", "above", 0, 0, "warning",
+              "⚠️ Konsumsi energi ({value:.1f} kWh) melebihi target ({trigger:.0f} kWh)!"),
+    # Alert anomali tidak punya kondisi clear: selesai sendiri jika tidak muncul lagi selama dedup_s
+    AlertRule("anomaly_limit", ANOMALY, "limit", "above", 0, 0, "danger",
+              "🚨 {subject}: {value:.1f} melewati batas {trigger:g}!"),
+    AlertRule("anomaly_spike", ANOMALY, "spike", "above", 0, 0, "warning",
+              "📈 Lonjakan tidak wajar {subject}: {value:.1f} (rata-rata {trigger:.1f})"),
+    AlertRule("anomaly_change", ANOMALY, "change", "above", 0, 0, "info",
+              "🔀 Perubahan level {subject}: {value:.1f} (rata-rata sebelumnya {trigger:.1f})"),
+)
+
+
+@dataclass
+class Alert:
+    id: int
+    rule: str
+    subject: str
+    level: str
+    message: str
+    raised_ms: int
+    last_seen_ms: int
+    count: int = 1
+    cleared_ms: int = None
+    acknowledged: bool = False
+
+    def as_row(self):
+        return {
+            "Waktu": format_timestamp(self.raised_ms),
+            "Level": self.level,
+            "Pesan": self.message,
+            "Jumlah": self.count,
+            "Selesai": format_timestamp(self.cleared_ms) if self.cleared_ms else "-",
+            "Di-ack": "✅" if self.acknowledged else "",
+        }
+
+
+class AlertEngine:
+    def __init__(self, rules=RULES, history_size=ALERT_HISTORY_SIZE):
+        self.rules = rules
+        self.history = deque(maxlen=history_size)
+        self._ids = itertools.count(1)
+        self._open = {}          # (rule, subject) -> Alert yang sedang aktif (belum clear)
+        self._last_closed = {}   # (rule, subject) -> timestamp clear terakhir, untuk cooldown
+        self._last_reading_ms = None
+        self._device_key = None  # (versi tabel, target) terakhir yang dievaluasi
+
+    # ---------- state machine per (rule, subject) ----------
+    def _raise(self, rule, subject, value, timestamp, trigger):
+        key = (rule.name, subject)
+        alert = self._open.get(key)
+        if alert is not None:
+            if timestamp - alert.last_seen_ms <= rule.dedup_s * 1000:
+                # Dedup: kondisi yang sama masih berlangsung, cukup update alert yang ada
+                alert.count += 1
+                alert.last_seen_ms = timestamp
+                return
+            # Terlalu lama tidak terlihat: tutup yang lama dan buat alert baru
+            del self._open[key]
+            alert.cleared_ms = alert.last_seen_ms
+        else:
+            closed_at = self._last_closed.get(key)
+            if closed_at is not None and timestamp - closed_at < rule.cooldown_s * 1000:
+                return  # Cooldown: baru saja selesai, jangan langsung berbunyi lagi
+
+        alert = Alert(
+            next(self._ids), rule.name, subject, rule.level,
+            rule.message.format(subject=subject, value=value, trigger=trigger),
+            timestamp, timestamp,
+        )
+        self._open[key] = alert
+        self.history.append(alert)
+
+    def _clear(self, rule, subject, timestamp):
+        alert = self._open.pop((rule.name, subject), None)
+        if alert is not None:
+            alert.cleared_ms = timestamp
+            self._last_closed[(rule.name, subject)] = timestamp
+
+    def _step(self, rule, subject, values, timestamps, trigger=None, clear=None):
+        """Jalankan hysteresis pada deret nilai; hanya baris yang melewati salah satu batas yang diproses"""
+        values = np.asarray(values, dtype=np.float64)
+        hit = rule.triggered(values, trigger)
+        release = rule.cleared(values, clear)
+        for index in np.flatnonzero(hit | release):
+            if hit[index]:
+                self._raise(rule, subject, float(values[index]), int(timestamps[index]),
+                            rule.trigger if trigger is None else trigger)
+            elif (rule.name, subject) in self._open:
+                self._clear(rule, subject, int(timestamps[index]))
+
+    # ---------- evaluasi ----------
+    def evaluate_readings(self, buffer, subject="sensor"):
+        """Evaluasi reading yang belum pernah dilihat (timestamp > terakhir diproses)"""
+        start_ms = 0 if self._last_reading_ms is None else self._last_reading_ms + 1
+        views = buffer.window_since(start_ms)
+        if not len(views["timestamp"]):
+            return
+        for rule in self.rules:
+            if rule.source == READING:
+                self._step(rule, subject, views[rule.field], views["timestamp"])
+        self._last_reading_ms = int(views["timestamp"][-1])
+
+    def evaluate_events(self, events):
+        """Jadikan event anomali sebagai alert (dedup & cooldown tetap berlaku)"""
+        rules = {rule.field: rule for rule in self.rules if rule.source == ANOMALY}
+        for event in events:
+            rule = rules.get(event.kind)
+            if rule is not None:
+                self._raise(rule, f"{event.device_id} {event.channel}", event.value,
+                            event.timestamp, event.expected)
+        self._expire_events(now_ms())
+
+    def _expire_events(self, timestamp):
+        for rule in self.rules:
+            if rule.source != ANOMALY:
+                continue
+            for key, alert in list(self._open.items()):
+                if key[0] == rule.name and timestamp - alert.last_seen_ms > rule.dedup_s * 1000:
+                    self._clear(rule, key[1], timestamp)
+
+    def evaluate_devices(self, table, target_kwh):
+        """Evaluasi rule perangkat & rumah tangga, hanya jika tabel atau target berubah"""
+        key = (table.version, target_kwh)
+        if key == self._device_key:
+            return
+        self._device_key = key
+        timestamp = now_ms()
+
+        for rule in self.rules:
+            if rule.source == DEVICE:
+                names = table.column("name")
+                values = table.column(rule.field)
+                for index in np.flatnonzero(rule.triggered(values)):
+                    if (rule.name, names[index]) not in self._open:
+                        self._raise(rule, names[index], float(values[index]), timestamp, rule.trigger)
+
+                # Perangkat yang turun di bawah batas clear atau sudah dihapus -> alert selesai
+                open_subjects = [subject for name, subject in self._open if name == rule.name]
+                if open_subjects:
+                    current = dict(zip(names.tolist(), values.tolist()))
+                    for subject in open_subjects:
+                        value = current.get(subject)
+                        if value is None or rule.cleared(value):
+                            self._clear(rule, subject, timestamp)
+            elif rule.source == HOUSEHOLD:
+                total = table.total(rule.field)
+                if rule.triggered(total, target_kwh):
+                    if (rule.name, "rumah") not in self._open:
+                        self._raise(rule, "rumah", total, timestamp, target_kwh)
+                elif rule.cleared(total, target_kwh * 0.95):
+                    self._clear(rule, "rumah", timestamp)
+
+    # ---------- akses ----------
+    def active(self):
+        """Alert aktif yang belum di-acknowledge, yang paling parah dulu"""
+        severity = {"danger": 0, "warning": 1, "info": 2}
+        alerts = [alert for alert in self._open.values() if not alert.acknowledged]
+        return sorted(alerts, key=lambda alert: (severity.get(alert.level, 3), -alert.raised_ms))
+
+    def acknowledge(self, alert_id):
+        for alert in self.history:
+            if alert.id == alert_id:
+                alert.acknowledged = True
+                return True
+        return False
+
+    def history_rows(self):
+        return [alert.as_row() for alert in reversed(self.history)]
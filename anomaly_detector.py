@@ -0,0 +1,148 @@
+"""Deteksi anomali streaming per device dan per channel (tegangan, daya, suhu)
+
+Setiap stream menyimpan state berukuran tetap (EWMA mean/varians + CUSUM),
+sehingga biaya per sample O(1) dan memori tidak bertambah seiring waktu.
+Jumlah stream dan event juga dibatasi (LRU / deque).
+"""
+import itertools
+import math
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+from config import (
+    ANOMALY_ALPHA,
+    ANOMALY_CUSUM_DRIFT,
+    ANOMALY_CUSUM_LIMIT,
+    ANOMALY_EVENT_HISTORY,
+    ANOMALY_MAX_STREAMS,
+    ANOMALY_MIN_STD,
+    ANOMALY_WARMUP,
+    ANOMALY_Z_THRESHOLD,
+    TEMP_HOT_THRESHOLD,
+    VOLTAGE_LOW_THRESHOLD,
+)
+
+SPIKE, CHANGE, LIMIT = "spike", "change", "limit"
+CHANNELS = ("voltage", "power", "suhu")
+
+# Batas absolut per channel: (arah, batas, pesan)
+LIMITS = {
+    "voltage": ("below", VOLTAGE_LOW_THRESHOLD, "tegangan di bawah {limit} V"),
+    "suhu": ("above", TEMP_HOT_THRESHOLD, "suhu mencapai {limit}°C"),
+}
+
+
+@dataclass
+class AnomalyEvent:
+    seq: int
+    device_id: str
+    channel: str
+    kind: str          # SPIKE / CHANGE / LIMIT
+    value: float
+    expected: float    # Mean EWMA sebelum sample ini (atau batas untuk LIMIT)
+    z: float
+    timestamp: int
+    detail: str = ""
+
+
+class StreamState:
+    """EWMA mean/varians + CUSUM dua arah untuk satu (device, channel)"""
+
+    __slots__ = ("count", "mean", "var", "cusum_pos", "cusum_neg")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.cusum_pos = 0.0
+        self.cusum_neg = 0.0
+
+    def update(self, value, min_std):
+        """Proses satu sample; return (kind, z, expected) atau None jika normal"""
+        if self.count < ANOMALY_WARMUP:
+            # Pemanasan: rata-rata biasa supaya baseline awal tidak bias ke sample pertama
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.var += (delta * (value - self.mean) - self.var) / self.count
+            return None
+
+        expected = self.mean
+        std = max(math.sqrt(self.var), min_std)
+        z = (value - expected) / std
+
+        # CUSUM mendeteksi pergeseran level yang menetap; kontribusi spike dibatasi
+        clipped = max(-ANOMALY_Z_THRESHOLD, min(ANOMALY_Z_THRESHOLD, z))
+        self.cusum_pos = max(0.0, self.cusum_pos + clipped - ANOMALY_CUSUM_DRIFT)
+        self.cusum_neg = max(0.0, self.cusum_neg - clipped - ANOMALY_CUSUM_DRIFT)
+        if self.cusum_pos > ANOMALY_CUSUM_LIMIT or self.cusum_neg > ANOMALY_CUSUM_LIMIT:
+            # Level baru: jadikan baseline supaya tidak terus dianggap anomali
+            self.mean = value
+            self.cusum_pos = self.cusum_neg = 0.0
+            return CHANGE, z, expected
+
+        if abs(z) > ANOMALY_Z_THRESHOLD:
+            return SPIKE, z, expected  # Jangan masukkan outlier ke baseline
+
+        delta = value - self.mean
+        self.mean += ANOMALY_ALPHA * delta
+        self.var = (1 - ANOMALY_ALPHA) * (self.var + ANOMALY_ALPHA * delta * delta)
+        return None
+
+
+class AnomalyDetector:
+    """Detektor untuk semua device; `update(entry)` dipanggil untuk setiap reading baru"""
+
+    def __init__(self, channels=CHANNELS, max_streams=ANOMALY_MAX_STREAMS,
+                 history_size=ANOMALY_EVENT_HISTORY):
+        self.channels = channels
+        self.max_streams = max_streams
+        self.events = deque(maxlen=history_size)
+        self._streams = OrderedDict()  # (device_id, channel) -> StreamState, LRU
+        self._seq = itertools.count(1)
+
+    def _stream(self, key):
+        state = self._streams.get(key)
+        if state is None:
+            state = self._streams[key] = StreamState()
+            if len(self._streams) > self.max_streams:
+                self._streams.popitem(last=False)
+        else:
+            self._streams.move_to_end(key)
+        return state
+
+    def update(self, entry):
+        """Evaluasi satu reading; event langsung tersedia setelah sample yang abnormal"""
+        device_id = entry["device_id"]
+        timestamp = entry["timestamp"]
+        found = []
+        for channel in self.channels:
+            value = entry.get(channel)
+            if value is None:
+                continue
+            value = float(value)
+
+            limit = LIMITS.get(channel)
+            if limit is not None:
+                direction, threshold, detail = limit
+                if (value < threshold) if direction == "below" else (value >= threshold):
+                    found.append(AnomalyEvent(next(self._seq), device_id, channel, LIMIT, value,
+                                              threshold, 0.0, timestamp, detail.format(limit=threshold)))
+
+            result = self._stream((device_id, channel)).update(value, ANOMALY_MIN_STD.get(channel, 1.0))
+            if result is not None:
+                kind, z, expected = result
+                found.append(AnomalyEvent(next(self._seq), device_id, channel, kind, value,
+                                          expected, z, timestamp))
+
+        self.events.extend(found)
+        return found
+
+    def events_since(self, seq):
+        """Event dengan nomor urut > `seq`, urut dari yang terlama"""
+        newer = []
+        for event in reversed(self.events):
+            if event.seq <= seq:
+                break
+            newer.append(event)
+        return newer[::-1]
@@ -0,0 +1,74 @@
+"""Cache figure chart (Plotly/matplotlib) berbasis LRU, key = jenis chart + hash data"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+import pandas as pd
+from matplotlib.figure import Figure
+
+from config import CHART_CACHE_SIZE
+
+
+def data_hash(data):
+    """Hash isi DataFrame (nilai, nama kolom, dan index) untuk key cache"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(list(data.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def figure_to_png(fig):
+    """Render figure matplotlib ke PNG lalu tutup, supaya registry pyplot tidak terus membesar"""
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format="png", bbox_inches="tight")
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+class FigureCache:
+    """LRU figure yang sudah jadi, dipakai bersama semua session
+
+    Figure matplotlib disimpan sebagai PNG (figure aslinya langsung ditutup),
+    figure Plotly disimpan apa adanya.
+    """
+
+    def __init__(self, maxsize=CHART_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, kind, data, build):
+        """Chart untuk `data`; `build(data)` hanya dipanggil jika belum ada di cache"""
+        key = (kind, data_hash(data))
+        with self._lock:
+            chart = self._items.get(key)
+            if chart is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return chart
+            self.misses += 1
+
+        # Build di luar lock; jika dua session build bersamaan, hasil terakhir yang disimpan
+        chart = build(data)
+        if isinstance(chart, Figure):
+            chart = figure_to_png(chart)
+
+        with self._lock:
+            self._items[key] = chart
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return chart
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -3,7 +3,38 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import numpy as np
-import requests
+import time
+import uuid
+from contextlib import contextmanager
+
+from alert_engine import AlertEngine
+from chart_cache import FigureCache
+from config import DEVICE_ID, DEVICE_LIST_LIMIT, INGEST_BIND_HOST, INGEST_TOKEN, LIVE_CHART_POINTS
+from device_import import INVENTORY_TYPES, TEMPLATE_CSV, read_inventory, validate_inventory
+from export_service import (
+    ARCHIVE_TYPES,
+    EXPORT_FORMATS,
+    PYARROW_AVAILABLE,
+    ExportService,
+    available_formats,
+    frame_chunks,
+    import_archive,
+    store_chunks,
+)
+from household_optimizer import default_constraints, optimize_hours
+from ingest_server import INGEST_PATH, INGEST_PORT, IngestServer
+from recommendations import RecommendationEngine
+from rollups import DAY_MS, HOUR_MS, RollupEngine, pick_tier
+from relay_queue import CONFIRMED as RELAY_CONFIRMED
+from relay_queue import FAILED as RELAY_FAILED
+from relay_queue import SUPERSEDED as RELAY_SUPERSEDED
+from relay_queue import RelayCommandQueue
+from sensor_buffer import format_timestamp, now_ms, to_local_datetime
+from sensor_collector import SensorCollector, process_sensor_data
+from sensor_store import SensorStore
+from shared_state import SharedState
+from state_store import StateStore
+from tariff import PLN_TARIFFS, get_tariff
 
 # Try to import plotly, if not available use matplotlib
 try:
@@ -23,18 +54,14 @@ st.set_page_config(
 )
 
 # ==================== INISIALISASI DATA ====================
-if 'devices' not in st.session_state:
-    st.session_state.devices = []
-if 'sensor_data' not in st.session_state:
-    st.session_state.sensor_data = []
-if 'energy_rate' not in st.session_state:
-    st.session_state.energy_rate = 1500
-if 'alerts' not in st.session_state:
-    st.session_state.alerts = []
+if 'recommendation_engine' not in st.session_state:
+    st.session_state.recommendation_engine = RecommendationEngine()
+if 'alert_engine' not in st.session_state:
+    st.session_state.alert_engine = AlertEngine()
+if 'anomaly_seq' not in st.session_state:
+    st.session_state.anomaly_seq = 0
 if 'energy_target' not in st.session_state:
     st.session_state.energy_target = 300
-if 'historical_data' not in st.session_state:
-    st.session_state.historical_data = []
 if 'device_schedule' not in st.session_state:
     st.session_state.device_schedule = {}
 
@@ -50,12 +77,16 @@ if 'esp32_protocol' not in st.session_state:
 if 'esp32_data_interval' not in st.session_state:
     st.session_state.esp32_data_interval = 5
 
-# Inisialisasi status relay
-if 'relays' not in st.session_state:
-    st.session_state.relays = {
-        "relay_1": {"name": "Lampu Utama", "status": False, "pin": "r1"},
-        "relay_2": {"name": "Lampu Cadangan", "status": False, "pin": "r2"}
-    }
+if 'relay_commands' not in st.session_state:
+    st.session_state.relay_commands = []
+if 'relay_reported' not in st.session_state:
+    st.session_state.relay_reported = set()
+
+# Relay default; status & nama relay dipakai bersama semua session (lihat get_shared_state)
+DEFAULT_RELAYS = {
+    "relay_1": {"name": "Lampu Utama", "status": False, "pin": "r1"},
+    "relay_2": {"name": "Lampu Cadangan", "status": False, "pin": "r2"}
+}
 
 # ==================== FUNGSI UTILITAS ====================
 def calculate_energy_cost(power_w, hours_per_day, days_per_month, rate_per_kwh):
@@ -63,70 +94,77 @@ def calculate_energy_cost(power_w, hours_per_day, days_per_month, rate_per_kwh):
     cost = energy_kwh * rate_per_kwh
     return energy_kwh, cost
 
+def current_tariff():
+    """Tarif aktif: golongan PLN terpilih atau tarif flat dari sidebar"""
+    return get_tariff(st.session_state.tariff_code, st.session_state.energy_rate)
+
+# Nama golongan tarif untuk selectbox sidebar
+TARIFF_NAMES = {"CUSTOM": "Custom (tarif flat)"}
+TARIFF_NAMES.update({code: tariff.name for code, tariff in PLN_TARIFFS.items()})
+
+def update_shared_tariff():
+    """Callback widget tarif: tarif berlaku untuk semua session, bukan hanya session ini"""
+    code = next(code for code, name in TARIFF_NAMES.items() if name == st.session_state.tariff_name)
+    with shared_write("tariff_code", "energy_rate") as state:
+        state.tariff_code = code
+        state.energy_rate = st.session_state.energy_rate_input
+    save_settings("tariff_code", "energy_rate")
+
+def effective_rate():
+    """Rp/kWh untuk kWh berikutnya pada pemakaian saat ini (preview & estimasi penghematan)"""
+    return float(current_tariff().marginal_rate(st.session_state.devices.total("energy")))
+
+def reprice_all():
+    """Hitung ulang biaya semua perangkat dan rollup histori jika tarif atau inventaris berubah"""
+    tariff = current_tariff()
+    demo_rollups = st.session_state.get("demo_rollups")
+    if demo_rollups is not None and demo_rollups.tariff != tariff:
+        demo_rollups.set_tariff(tariff)
+
+    snapshot = get_shared_state().read()
+    if snapshot.priced_key == (tariff, snapshot.devices.version):
+        return
+
+    with shared_write("devices", "priced_key") as state:
+        if len(state.devices):
+            state.devices.set_column("cost", tariff.allocate(state.devices.column("energy")))
+        state.priced_key = (tariff, state.devices.version)
+    get_sensor_collector().set_tariff(tariff)
+
 def calculate_carbon_footprint(energy_kwh):
     """Hitung jejak karbon (kg CO2) - Asumsi: 0.85 kg CO2/kWh"""
     return energy_kwh * 0.85
 
 def check_energy_alerts():
-    """Cek dan generate alerts untuk konsumsi tinggi"""
-    alerts = []
-    total_energy = sum(device["energy"] for device in st.session_state.devices)
-
-    # Alert jika melebihi target
-    if total_energy > st.session_state.energy_target:
-        alerts.append({
-            "type": "warning",
-            "message": f"⚠️ Konsumsi energi ({total_energy:.1f} kWh) melebihi target ({st.session_state.energy_target} kWh)!"
-        })
-
-    # Alert untuk perangkat high consumption
-    for device in st.session_state.devices:
-        if device["energy"] > 100:
-            alerts.append({
-                "type": "info",
-                "message": f"💡 {device['name']} memiliki konsumsi tinggi ({device['energy']:.1f} kWh). Pertimbangkan optimasi."
-            })
+    """Evaluasi alert hanya untuk reading baru dan perubahan perangkat/target"""
+    engine = st.session_state.alert_engine
+    engine.evaluate_readings(st.session_state.sensor_data)
+    pull_anomaly_alerts()
+    engine.evaluate_devices(st.session_state.devices, st.session_state.energy_target)
 
-    # Alert untuk sensor anomali
-    if st.session_state.sensor_data:
-        latest = st.session_state.sensor_data[-1]
-        if latest.get("voltage", 220) < 210 or latest.get("voltage", 220) > 230:
-            alerts.append({
-                "type": "danger",
-                "message": f"⚡ Tegangan abnormal terdeteksi: {latest.get('voltage', 220)} V!"
-            })
+def pull_anomaly_alerts():
+    """Ambil event anomali baru dari collector ke alert engine; return alert yang baru muncul
 
-    st.session_state.alerts = alerts
+    Anomali dideteksi collector untuk setiap reading semua device, di sini hanya diambil event barunya.
+    """
+    engine = st.session_state.alert_engine
+    last_id = engine.history[-1].id if engine.history else 0
+    events = get_sensor_collector().anomalies_since(st.session_state.anomaly_seq)
+    if events:
+        st.session_state.anomaly_seq = events[-1].seq
+    engine.evaluate_events(events)
+    return [alert for alert in engine.history if alert.id > last_id]
 
 def generate_recommendations():
-    """Generate rekomendasi penghematan energi"""
-    recommendations = []
-
+    """Generate rekomendasi penghematan energi (diurutkan dari penghematan terbesar)"""
     if not st.session_state.devices:
         return ["📝 Tambahkan perangkat untuk mendapatkan rekomendasi"]
 
-    # Analisis device dengan konsumsi tertinggi
-    sorted_devices = sorted(st.session_state.devices, key=lambda x: x["energy"], reverse=True)
-
-    if sorted_devices:
-        top_device = sorted_devices[0]
-        recommendations.append(
-            f"🎯 **{top_device['name']}** adalah konsumen energi terbesar ({top_device['energy']:.1f} kWh). "
-            f"Mengurangi penggunaan 2 jam/hari dapat menghemat Rp {(top_device['cost'] * 0.25):,.0f}/bulan"
-        )
-
-    # Rekomendasi umum
-    total_energy = sum(device["energy"] for device in st.session_state.devices)
-
-    if total_energy > 200:
-        recommendations.append("💡 Pertimbangkan upgrade ke perangkat hemat energi (label A++)")
-        recommendations.append("🌙 Manfaatkan tarif listrik off-peak untuk perangkat besar")
-
-    recommendations.append("🔌 Cabut charger dan perangkat standby untuk hemat 5-10% energi")
-    recommendations.append("☀️ Maksimalkan pencahayaan alami di siang hari")
-    recommendations.append("❄️ Set AC pada suhu 24-25°C untuk efisiensi optimal")
-
-    return recommendations
+    recommendations = st.session_state.recommendation_engine.recommend(
+        st.session_state.devices,
+        effective_rate()
+    )
+    return [rec.message for rec in recommendations]
 
 def create_bar_chart_matplotlib(data, title, x_label, y_label):
     """Create bar chart using matplotlib"""
@@ -164,136 +202,340 @@ def create_line_chart_matplotlib(data, x_col, y_col, title, x_label, y_label, co
     plt.tight_layout()
     return fig
 
+def create_pie_chart_matplotlib(data, title):
+    """Create pie chart (energi per perangkat) using matplotlib"""
+    fig, ax = plt.subplots(figsize=(8, 8))
+    ax.pie(data['energy'], labels=data['name'], autopct='%1.1f%%')
+    ax.set_title(title)
+    return fig
+
+def create_cost_chart_matplotlib(data, x_col, title, x_label, colors=None):
+    """Create bar chart biaya (Rp) using matplotlib"""
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.bar(data[x_col], data['cost'], color=colors)
+    ax.set_ylabel('Biaya (Rp)')
+    ax.set_xlabel(x_label)
+    if title:
+        ax.set_title(title)
+    ax.tick_params(axis='x', rotation=45)
+    ax.grid(axis='y', alpha=0.3)
+
+    # Format y-axis dengan separator ribuan
+    ax.get_yaxis().set_major_formatter(
+        plt.FuncFormatter(lambda x, p: f'{x:,.0f}')
+    )
+    plt.tight_layout()
+    return fig
+
+@st.cache_resource
+def get_export_service():
+    """Cache file export per process; key versi data bersama, jadi semua session memakai file yang sama"""
+    return ExportService()
+
+@st.cache_resource
+def get_figure_cache():
+    """Cache figure chart per process, dipakai bersama oleh semua session"""
+    return FigureCache()
+
+def show_chart(kind, data, build):
+    """Tampilkan chart dari cache; `build(data)` hanya dipanggil jika data berubah"""
+    chart = get_figure_cache().get(kind, data, build)
+    if isinstance(chart, bytes):
+        st.image(chart, use_column_width=True)
+    else:
+        st.plotly_chart(chart, use_container_width=True)
+
+def export_button(label, name, version, chunks, file_stem, key):
+    """Tombol export lazy: file baru dibuat saat diminta, lalu di-cache sampai versi data berubah
+
+    `chunks()` mengembalikan iterable DataFrame dan hanya dipanggil saat tombol diklik.
+    Format (CSV/Parquet/Arrow) mengikuti pilihan di sidebar.
+    """
+    fmt = st.session_state.get("export_format", "csv")
+    _, extension, mime = EXPORT_FORMATS[fmt]
+    file_name = f"{file_stem}.{extension}"
+    exports = get_export_service()
+    data = exports.get(name, version, fmt)
+    if data is None and st.button(label, key=f"prepare_{key}", use_container_width=True):
+        data = exports.build(name, version, chunks(), fmt)
+    if data is not None:
+        st.download_button(
+            f"📥 {file_name} ({len(data) / 1024:,.0f} KB)",
+            data,
+            file_name,
+            mime,
+            key=f"download_{key}",
+            use_container_width=True
+        )
+
+def relay_key_for_pin(relay_pin):
+    return next((key for key, r in st.session_state.relays.items() if r["pin"] == relay_pin), None)
+
 def control_relay(relay_pin, status):
-    """Fungsi untuk mengontrol relay via ESP32 - REAL IMPLEMENTATION"""
-    try:
-        ip = st.session_state.esp32_ip
-        
-        # Format URL sesuai dengan ESP32
-        url = f"http://{ip}/relay?{relay_pin}={1 if status else 0}"
-        
-        response = requests.get(url, timeout=5)
-        
-        if response.status_code == 200:
-            action = "MENYALA" if status else "MATI"
-            relay_name = next((r["name"] for r in st.session_state.relays.values() if r["pin"] == relay_pin), relay_pin)
-            return True, f"✅ {relay_name} {action}"
-        else:
-            return False, f"❌ Gagal mengontrol relay: HTTP {response.status_code}"
-            
-    except requests.exceptions.RequestException as e:
-        return False, f"❌ Tidak dapat terhubung ke ESP32: {str(e)}"
-    except Exception as e:
-        return False, f"❌ Error: {str(e)}"
+    """Fungsi untuk mengontrol relay via ESP32 - lewat antrian perintah per device"""
+    relay_key = relay_key_for_pin(relay_pin)
+    relay_name = st.session_state.relays[relay_key]["name"] if relay_key else relay_pin
+    current_state = st.session_state.relays[relay_key]["status"] if relay_key else None
+
+    command = get_relay_queue().submit(
+        st.session_state.esp32_ip,
+        st.session_state.esp32_port,
+        relay_pin,
+        status,
+        current_state
+    )
+
+    if command is None:
+        # Tidak ada perubahan state, perintah tidak perlu dikirim
+        return True, f"ℹ️ {relay_name} sudah {'MENYALA' if status else 'MATI'}"
+
+    track_relay_command(command)
+    return True, f"⏳ Perintah {relay_name} {'ON' if status else 'OFF'} dikirim"
 
 def control_multiple_relays(relay_commands):
-    """Kontrol multiple relay sekaligus"""
+    """Kontrol multiple relay sekaligus - digabung jadi satu request oleh antrian"""
+    queued = 0
+    for relay_pin, status in relay_commands.items():
+        _, message = control_relay(relay_pin, status)
+        if message.startswith("⏳"):
+            queued += 1
+
+    if queued == 0:
+        return True, "ℹ️ Semua relay sudah sesuai, tidak ada perintah dikirim"
+    return True, f"⏳ {queued} perintah relay dikirim"
+
+def track_relay_command(command):
+    """Simpan perintah di session supaya konfirmasinya bisa dilaporkan"""
+    if command not in st.session_state.relay_commands:
+        st.session_state.relay_commands.append(command)
+        st.session_state.relay_commands = st.session_state.relay_commands[-10:]
+
+def sync_relay_commands():
+    """Laporkan perintah relay yang sudah dikonfirmasi/gagal/digantikan sejak rerun terakhir"""
+    for command in st.session_state.relay_commands:
+        if not command.done.is_set() or id(command) in st.session_state.relay_reported:
+            continue
+
+        st.session_state.relay_reported.add(id(command))
+        relay_key = relay_key_for_pin(command.pin)
+        if command.state == RELAY_CONFIRMED and relay_key:
+            with shared_write("relays") as state:
+                state.relays[relay_key]["status"] = command.status
+            action = "MENYALA" if command.status else "MATI"
+            st.toast(f"✅ {st.session_state.relays[relay_key]['name']} {action}")
+        elif command.state == RELAY_FAILED:
+            st.toast(command.message)
+        elif command.state == RELAY_SUPERSEDED:
+            # Toggle yang tidak jadi dikirim karena digabung dengan perintah berikutnya
+            relay_name = st.session_state.relays[relay_key]["name"] if relay_key else command.pin
+            st.toast(f"{command.message} ({relay_name})")
+
+    # Bersihkan id yang sudah tidak dilacak
+    tracked = {id(command) for command in st.session_state.relay_commands}
+    st.session_state.relay_reported &= tracked
+
+@st.cache_resource
+def get_relay_queue():
+    """Antrian perintah relay per process, dipakai bersama oleh semua session"""
+    return RelayCommandQueue()
+
+@st.cache_resource
+def get_sensor_store():
+    """Store SQLite untuk histori sensor jangka panjang (satu per process)"""
+    return SensorStore()
+
+@st.cache_resource
+def get_state_store():
+    """Journal + snapshot inventaris perangkat dan pengaturan (satu per process)"""
+    return StateStore()
+
+# Pengaturan session yang ikut disimpan (selain nama relay dan tabel perangkat)
+PERSISTED_SETTINGS = ("tariff_code", "energy_rate", "energy_target", "device_schedule",
+                      "esp32_ip", "esp32_port", "esp32_protocol", "esp32_data_interval")
+
+# Field SharedState yang dipasang ke session_state di setiap rerun (hanya dibaca)
+SHARED_FIELDS = ("devices", "sensor_data", "relays", "collector_seq", "tariff_code", "energy_rate")
+
+@st.cache_resource
+def get_shared_state():
+    """Inventaris, buffer sensor & relay yang sama untuk semua session (satu per process)
+
+    Inventaris dan nama relay dipulihkan dari state tersimpan sekali saat process mulai.
+    """
+    store = get_state_store()
+    restored = store.load()
+    relays = {key: dict(relay) for key, relay in DEFAULT_RELAYS.items()}
+    devices = None
+    initial = {}
+    if restored is not None:
+        devices, settings = restored
+        for relay_key, name in settings.get("relay_names", {}).items():
+            if relay_key in relays:
+                relays[relay_key]["name"] = name
+        initial = {key: settings[key] for key in SHARED_FIELDS if key in settings}
+    return SharedState(devices, relays, restored=restored is not None, state_store=store, **initial)
+
+def bind_shared_state():
+    """Pasang snapshot bersama terbaru ke session_state (tanpa lock, tanpa copy)"""
+    snapshot = get_shared_state().read()
+    for name in SHARED_FIELDS:
+        st.session_state[name] = getattr(snapshot, name)
+    # Rollup diisi collector dari setiap reading, session membaca salinannya.
+    # Data demo memakai rollup milik session sendiri supaya histori asli tidak tertimpa.
+    collector = get_sensor_collector()
+    demo_rollups = st.session_state.get("demo_rollups")
+    st.session_state.rollups = demo_rollups if demo_rollups is not None else collector.rollup_snapshot()
+    st.session_state.rollups_ready = demo_rollups is not None or collector.rollups_ready.is_set()
+
+@contextmanager
+def shared_write(*names, when=None):
+    """Ubah state bersama (satu penulis pada satu waktu), lalu pasang snapshot barunya ke session ini"""
+    with get_shared_state().write(*names, when=when) as state:
+        yield state
+    bind_shared_state()
+
+def save_settings(*keys):
+    """Simpan pengaturan `keys` dari session ini - dipanggil hanya saat user mengubahnya"""
+    get_state_store().update_settings({key: st.session_state[key] for key in keys})
+
+def restore_app_state():
+    """Pakai pengaturan tersimpan di session baru; False jika belum ada state yang tersimpan"""
+    shared = get_shared_state()
+    for key, value in get_state_store().settings.items():
+        if key in PERSISTED_SETTINGS and key not in SHARED_FIELDS:
+            st.session_state[key] = value
+    return shared.restored
+
+@st.cache_resource
+def get_sensor_collector():
+    """Satu collector per server process, dipakai bersama oleh semua session"""
+    collector = SensorCollector(process_sensor_data, store=get_sensor_store())
+    # Target awal dari pengaturan tersimpan; setelah itu hanya diubah lewat apply_esp32_target
+    get_shared_state()
+    settings = get_state_store().settings
+    collector.configure(
+        settings.get("esp32_ip", st.session_state.esp32_ip),
+        settings.get("esp32_port", st.session_state.esp32_port),
+        settings.get("esp32_data_interval", st.session_state.esp32_data_interval)
+    )
+    # Histori jam/hari/bulan dari SQLite dibangun di background; tab Historis menunggu rollups_ready
+    collector.seed_rollups_background()
+    collector.start()
+    return collector
+
+@st.cache_resource
+def get_ingest_server():
+    """Server push ingestion, menulis ke buffer collector yang sama dengan dashboard"""
     try:
-        ip = st.session_state.esp32_ip
-        
-        # Build URL dengan multiple parameters
-        params = []
-        for relay_pin, status in relay_commands.items():
-            params.append(f"{relay_pin}={1 if status else 0}")
-        
-        url = f"http://{ip}/relay?" + "&".join(params)
-        
-        response = requests.get(url, timeout=5)
-        
-        if response.status_code == 200:
-            return True, "✅ Semua relay berhasil dikontrol"
-        else:
-            return False, f"❌ Gagal mengontrol relay: HTTP {response.status_code}"
-            
-    except requests.exceptions.RequestException as e:
-        return False, f"❌ Tidak dapat terhubung ke ESP32: {str(e)}"
-    except Exception as e:
-        return False, f"❌ Error: {str(e)}"
+        server = IngestServer(get_sensor_collector())
+    except OSError:
+        # Port sudah dipakai (misalnya server ingestion dijalankan di process lain)
+        return None
+    server.start()
+    return server
+
+def apply_esp32_target():
+    """Arahkan collector (dipakai semua session) ke IP/port/interval session ini - hanya saat user mengubahnya"""
+    get_sensor_collector().configure(
+        st.session_state.esp32_ip,
+        st.session_state.esp32_port,
+        st.session_state.esp32_data_interval
+    )
+    save_settings("esp32_ip", "esp32_port", "esp32_data_interval")
+
+def sync_sensor_data():
+    """Ambil data terbaru dari buffer collector - tidak menunggu jaringan"""
+    collector = get_sensor_collector()
+    get_ingest_server()
+
+    # Cek tanpa lock dulu: biasanya session lain sudah memasukkan data terbaru
+    bind_shared_state()
+    if not collector.has_entries_since(st.session_state.collector_seq):
+        return
+
+    # Cek ulang di dalam lock sebelum menyalin, supaya data yang sama tidak masuk (dan disalin) dua kali
+    with shared_write("sensor_data", "relays", "collector_seq",
+                      when=lambda current: collector.has_entries_since(current.collector_seq)) as state:
+        if state is None:
+            return
+        seq, new_columns = collector.entries_since(state.collector_seq)
+        state.collector_seq = seq
+
+        # Tambah ke ring buffer sensor (kapasitas tetap, data terlama otomatis tertimpa)
+        state.sensor_data.extend_columns(new_columns)
+
+        # Update relay status berdasarkan data terakhir dari ESP32
+        state.relays["relay_1"]["status"] = bool(new_columns["relay1"][-1])
+        state.relays["relay_2"]["status"] = bool(new_columns["relay2"][-1])
+
+def live_chart_frame(views):
+    """DataFrame kecil (index waktu, kolom daya) untuk st.line_chart / add_rows"""
+    return pd.DataFrame({"Daya (W)": views["power"]}, index=to_local_datetime(views["timestamp"]))
+
+def render_live_power_chart(window=LIVE_CHART_POINTS):
+    """Chart daya native Streamlit; titik baru ditambahkan lewat add_rows, bukan kirim ulang figure"""
+    placeholder = st.empty()
+    views = st.session_state.sensor_data.window(window)
+    return {
+        "placeholder": placeholder,
+        "chart": placeholder.line_chart(live_chart_frame(views), height=400),
+        "status": st.empty(),
+        "seq": st.session_state.collector_seq,
+        "points": len(views["seq"]),
+    }
 
-def fetch_sensor_data():
-    """Ambil data sensor dari ESP32 - REAL IMPLEMENTATION"""
-    try:
-        ip = st.session_state.esp32_ip
-        url = f"http://{ip}/data"
-        
-        response = requests.get(url, timeout=5)
-        
-        if response.status_code == 200:
-            data = response.json()
-            return True, data
-        else:
-            return False, f"HTTP {response.status_code}"
-            
-    except requests.exceptions.RequestException as e:
-        return False, f"Tidak dapat terhubung: {str(e)}"
-    except Exception as e:
-        return False, f"Error: {str(e)}"
+def run_live_power_chart(live, window=LIVE_CHART_POINTS):
+    """Loop di akhir script: tambahkan data baru ke chart live setiap interval collector
 
-def process_sensor_data(esp32_data):
-    """Process data dari ESP32 dan update session state"""
-    try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-        
-        # Map data dari ESP32 ke format kita
-        sensor_entry = {
-            "timestamp": timestamp,
-            "ldr": esp32_data.get("ldr", 0),
-            "statusLDR": esp32_data.get("statusLDR", "Tidak diketahui"),
-            "suhu": esp32_data.get("suhu", 0),
-            "statusSuhu": esp32_data.get("statusSuhu", "Tidak diketahui"),
-            "relay1": esp32_data.get("relay1", 0),
-            "relay2": esp32_data.get("relay2", 0),
-            # Calculate power based on relay status (asumsi 100W per relay aktif)
-            "power": (esp32_data.get("relay1", 0) + esp32_data.get("relay2", 0)) * 100,
-            "voltage": 220,  # Asumsi tegangan tetap
-            "current": ((esp32_data.get("relay1", 0) + esp32_data.get("relay2", 0)) * 100) / 220,
-            "energy": 0  # Akan dihitung berdasarkan waktu
-        }
-        
-        # Update relay status berdasarkan data dari ESP32
-        st.session_state.relays["relay_1"]["status"] = bool(esp32_data.get("relay1", 0))
-        st.session_state.relays["relay_2"]["status"] = bool(esp32_data.get("relay2", 0))
-        
-        # Tambah ke sensor data history (keep last 100 entries)
-        st.session_state.sensor_data.append(sensor_entry)
-        if len(st.session_state.sensor_data) > 100:
-            st.session_state.sensor_data = st.session_state.sensor_data[-100:]
-            
-    except Exception as e:
-        st.error(f"Error processing sensor data: {str(e)}")
+    Loop berhenti sendiri saat user berinteraksi (Streamlit memulai rerun) atau
+    menutup halaman, karena Streamlit menghentikan script di pemanggilan st.* berikutnya.
+    """
+    while True:
+        time.sleep(st.session_state.esp32_data_interval)
+        sync_sensor_data()
+
+        new = st.session_state.sensor_data.since(live["seq"])
+        if len(new["seq"]):
+            live["seq"] = int(new["seq"][-1])
+            live["points"] += len(new["seq"])
+            if live["points"] > 2 * window:
+                # Buang titik lama: kirim ulang window terakhir sekali, lalu kembali append
+                views = st.session_state.sensor_data.window(window)
+                live["chart"] = live["placeholder"].line_chart(live_chart_frame(views), height=400)
+                live["points"] = len(views["seq"])
+            else:
+                live["chart"].add_rows(live_chart_frame(new))
+
+        # Anomali langsung muncul sebagai toast selama mode live, tanpa menunggu rerun
+        for alert in pull_anomaly_alerts():
+            st.toast(alert.message)
+
+        # Indikator kecil bahwa mode live masih berjalan, juga saat tidak ada data baru
+        live["status"].caption(f"🔴 Live - update terakhir {datetime.now().strftime('%H:%M:%S')}")
 
 # ==================== FUNGSI SMART HOME DASHBOARD ====================
 def smart_home_dashboard():
     """Dashboard sederhana untuk kontrol cepat"""
-    ESP_IP = st.session_state.esp32_ip
     
     st.title("🏠 Smart Home Dashboard")
     st.markdown("---")
     
     # ================= FETCH DATA =================
     def get_data():
-        try:
-            url = f"http://{ESP_IP}/data"
-            r = requests.get(url, timeout=3)
-            return r.json()
-        except:
-            return None
+        # Baca data terakhir dari buffer collector, bukan request langsung
+        return get_sensor_collector().latest()
 
     # ================= SEND RELAY COMMAND =================
     def set_relay(r1=None, r2=None):
-        cmd = []
+        cmd = {}
         if r1 is not None:
-            cmd.append(f"r1={r1}")
+            cmd["r1"] = bool(r1)
         if r2 is not None:
-            cmd.append(f"r2={r2}")
-        query = "&".join(cmd)
+            cmd["r2"] = bool(r2)
         
-        url = f"http://{ESP_IP}/relay?{query}"
-        try:
-            r = requests.get(url, timeout=3)
-            return r.text
-        except:
-            return "Gagal mengirim perintah"
+        # Lewat antrian relay yang sama dengan tab ESP32 IoT
+        _, message = control_multiple_relays(cmd)
+        return message
 
     # ================= UI =================
     data = get_data()
@@ -382,19 +624,26 @@ def smart_home_dashboard():
 def load_sample_data():
     """Data sample yang lebih komprehensif"""
     sample_devices = [
-        {"name": "AC Ruang Tamu", "power": 800, "hours": 8, "days": 30, "energy": 192, "cost": 288000},
-        {"name": "AC Kamar Tidur", "power": 750, "hours": 6, "days": 30, "energy": 135, "cost": 202500},
-        {"name": "Kulkas 2 Pintu", "power": 150, "hours": 24, "days": 30, "energy": 108, "cost": 162000},
-        {"name": "LED TV 55 inch", "power": 120, "hours": 6, "days": 30, "energy": 21.6, "cost": 32400},
-        {"name": "Water Heater", "power": 350, "hours": 2, "days": 30, "energy": 21, "cost": 31500},
-        {"name": "Mesin Cuci", "power": 400, "hours": 1.5, "days": 20, "energy": 12, "cost": 18000},
-        {"name": "Lampu LED (10 unit)", "power": 100, "hours": 8, "days": 30, "energy": 24, "cost": 36000},
-        {"name": "Rice Cooker", "power": 400, "hours": 2, "days": 30, "energy": 24, "cost": 36000},
-        {"name": "Laptop + Charger", "power": 65, "hours": 10, "days": 30, "energy": 19.5, "cost": 29250},
-        {"name": "Router WiFi", "power": 10, "hours": 24, "days": 30, "energy": 7.2, "cost": 10800}
+        {"name": "AC Ruang Tamu", "category": "AC & Pendingin", "power": 800, "hours": 8, "days": 30, "energy": 192, "cost": 288000},
+        {"name": "AC Kamar Tidur", "category": "AC & Pendingin", "power": 750, "hours": 6, "days": 30, "energy": 135, "cost": 202500},
+        {"name": "Kulkas 2 Pintu", "category": "AC & Pendingin", "power": 150, "hours": 24, "days": 30, "energy": 108, "cost": 162000},
+        {"name": "LED TV 55 inch", "category": "Elektronik", "power": 120, "hours": 6, "days": 30, "energy": 21.6, "cost": 32400},
+        {"name": "Water Heater", "category": "Lainnya", "power": 350, "hours": 2, "days": 30, "energy": 21, "cost": 31500},
+        {"name": "Mesin Cuci", "category": "Lainnya", "power": 400, "hours": 1.5, "days": 20, "energy": 12, "cost": 18000},
+        {"name": "Lampu LED (10 unit)", "category": "Penerangan", "power": 100, "hours": 8, "days": 30, "energy": 24, "cost": 36000},
+        {"name": "Rice Cooker", "category": "Dapur", "power": 400, "hours": 2, "days": 30, "energy": 24, "cost": 36000},
+        {"name": "Laptop + Charger", "category": "Elektronik", "power": 65, "hours": 10, "days": 30, "energy": 19.5, "cost": 29250},
+        {"name": "Router WiFi", "category": "Elektronik", "power": 10, "hours": 24, "days": 30, "energy": 7.2, "cost": 10800}
     ]
 
-    st.session_state.devices = sample_devices
+    with shared_write("devices", "sensor_data") as state:
+        load_sample_state(state, sample_devices)
+    reprice_all()
+
+def load_sample_state(state, sample_devices):
+    """Isi draft state bersama dengan perangkat, sensor 24 jam dan histori 6 bulan demo"""
+    state.devices.clear()
+    state.devices.extend(sample_devices)
 
     # Generate sensor data untuk 24 jam terakhir
     base_time = datetime.now() - timedelta(hours=24)
@@ -420,29 +669,46 @@ def load_sample_data():
         energy = power * 0.5 / 1000  # kWh untuk 30 menit
 
         sample_sensor.append({
-            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M"),
+            "timestamp": int(timestamp.timestamp() * 1000),
             "voltage": round(voltage, 1),
             "current": round(current, 2),
             "power": power,
             "energy": round(energy, 3),
-            "temp": round(26 + np.random.uniform(-2, 4), 1),
-            "humidity": round(60 + np.random.uniform(-10, 10), 0)
-        })
-
-    st.session_state.sensor_data = sample_sensor
-
-    # Generate historical data (6 bulan terakhir)
-    historical = []
-    for i in range(6, 0, -1):
-        month_ago = datetime.now() - timedelta(days=30*i)
-        total_energy = sum(d["energy"] for d in sample_devices) + np.random.uniform(-30, 30)
-        historical.append({
-            "month": month_ago.strftime("%b %Y"),
-            "energy": round(total_energy, 1),
-            "cost": round(total_energy * st.session_state.energy_rate, 0)
+            "suhu": round(26 + np.random.uniform(-2, 4), 1)
         })
 
-    st.session_state.historical_data = historical
+    state.sensor_data.clear()
+    state.sensor_data.extend(sample_sensor)
+
+    # Histori 6 bulan sebelumnya (rata-rata per jam) dengan pola harian yang sama,
+    # diskalakan ke total konsumsi perangkat dengan variasi ±10% per bulan
+    base_ms = int(base_time.timestamp() * 1000)
+    timestamps = base_ms - np.arange(180 * 24, 0, -1) * HOUR_MS
+    moments = to_local_datetime(timestamps)
+    hour = np.asarray(moments.hour)
+    profile = np.select([(hour >= 6) & (hour < 9), (hour >= 9) & (hour < 17), (hour >= 17) & (hour < 22)],
+                        [800, 500, 1200], 300)
+    month_index = np.asarray(moments.year * 12 + moments.month)
+    month_index -= month_index[0]
+    scale = state.devices.total("energy") / (profile.mean() * 24 * 30 / 1000)
+    power = (profile + np.random.randint(-100, 100, len(profile))) * scale
+    power *= np.random.uniform(0.9, 1.1, month_index[-1] + 1)[month_index]
+
+    # Rollup demo hanya untuk session ini, histori collector (dipakai semua session) tidak disentuh
+    demo_rollups = RollupEngine(current_tariff())
+    demo_rollups.add({"timestamp": timestamps, "power": power, "energy": power / 1000})
+    demo_rollups.add(state.sensor_data.window())
+    st.session_state.demo_rollups = demo_rollups
+    st.session_state.demo_rollups_id = uuid.uuid4().hex  # Bagian versi export: data demo tiap session berbeda
+
+# ==================== STATE BERSAMA ====================
+bind_shared_state()
+if 'state_restored' not in st.session_state:
+    st.session_state.state_restored = restore_app_state()
+
+# ==================== SINKRONISASI COLLECTOR ====================
+sync_sensor_data()
+sync_relay_commands()
 
 # ==================== SIDEBAR ====================
 with st.sidebar:
@@ -452,16 +718,39 @@ with st.sidebar:
 
     st.subheader("🔧 Pengaturan")
 
-    st.session_state.energy_rate = st.number_input(
+    # Tarif dipakai bersama semua session: widget selalu menampilkan tarif bersama terbaru,
+    # perubahan disimpan lewat callback sebelum rerun
+    st.session_state.tariff_name = TARIFF_NAMES[st.session_state.tariff_code]
+    st.session_state.energy_rate_input = st.session_state.energy_rate
+    st.selectbox("Golongan Tarif", list(TARIFF_NAMES.values()), key="tariff_name",
+                 on_change=update_shared_tariff)
+
+    st.number_input(
         "Tarif Listrik (Rp/kWh)",
         min_value=500,
         max_value=5000,
-        value=st.session_state.energy_rate,
         step=100,
-        help="Tarif listrik PLN per kWh"
+        key="energy_rate_input",
+        on_change=update_shared_tariff,
+        disabled=st.session_state.tariff_code != "CUSTOM",
+        help="Tarif listrik PLN per kWh (hanya untuk golongan Custom)"
     )
 
-    st.session_state.energy_target = st.number_input(
+    tariff = current_tariff()
+    if tariff.code != "CUSTOM":
+        blocks = " • ".join(f"Rp {rate:,.0f}" for rate in tariff.rates)
+        details = [f"Tarif/kWh: {blocks}"]
+        if tariff.block_limits:
+            details.append(f"Blok s.d. {', '.join(str(limit) for limit in tariff.block_limits)} kWh")
+        if tariff.peak_hours:
+            details.append(f"WBP {tariff.peak_hours[0]:02d}-{tariff.peak_hours[1]:02d} ×{tariff.peak_factor}")
+        if tariff.fixed_charge:
+            details.append(f"Abonemen Rp {tariff.fixed_charge:,.0f}/bulan")
+        if tariff.min_hours:
+            details.append(f"Minimum {tariff.minimum_kwh:,.0f} kWh/bulan")
+        st.caption(" | ".join(details))
+
+    energy_target = st.number_input(
         "Target Konsumsi (kWh/bulan)",
         min_value=50,
         max_value=1000,
@@ -469,6 +758,9 @@ with st.sidebar:
         step=50,
         help="Target maksimal konsumsi energi bulanan"
     )
+    if energy_target != st.session_state.energy_target:
+        st.session_state.energy_target = energy_target
+        save_settings("energy_target")
 
     st.markdown("---")
     st.subheader("🚀 Quick Actions")
@@ -483,9 +775,11 @@ with st.sidebar:
 
     with col2:
         if st.button("🔄 Reset", use_container_width=True, type="secondary"):
-            st.session_state.devices = []
-            st.session_state.sensor_data = []
-            st.session_state.historical_data = []
+            st.session_state.pop("demo_rollups", None)  # Kembali ke histori collector
+            st.session_state.pop("demo_rollups_id", None)
+            with shared_write("devices", "sensor_data") as state:
+                state.devices.clear()
+                state.sensor_data.clear()
             st.success("✅ Reset!")
             st.rerun()
 
@@ -493,28 +787,25 @@ with st.sidebar:
     st.markdown("---")
     st.subheader("📥 Export Data")
 
+    # Parquet/Arrow jauh lebih kecil dan cepat dibaca ulang untuk histori panjang
+    format_labels = {EXPORT_FORMATS[fmt][0]: fmt for fmt in available_formats()}
+    export_label = st.selectbox("Format", list(format_labels), key="export_format_label")
+    st.session_state.export_format = format_labels[export_label]
+
     if st.session_state.devices:
         # Export devices data
-        df_devices = pd.DataFrame(st.session_state.devices)
-        csv_devices = df_devices.to_csv(index=False)
-        st.download_button(
-            "📄 Device Report",
-            csv_devices,
-            "device_report.csv",
-            "text/csv",
-            use_container_width=True
+        export_button(
+            "📄 Device Report", "devices", st.session_state.devices.version,
+            lambda: frame_chunks(st.session_state.devices.to_frame()),
+            "device_report", "sidebar_devices"
         )
 
     if st.session_state.sensor_data:
         # Export sensor data
-        df_sensor = pd.DataFrame(st.session_state.sensor_data)
-        csv_sensor = df_sensor.to_csv(index=False)
-        st.download_button(
-            "📡 Sensor Data",
-            csv_sensor,
-            "sensor_data.csv",
-            "text/csv",
-            use_container_width=True
+        export_button(
+            "📡 Sensor Data", "sensor", st.session_state.sensor_data.version,
+            lambda: frame_chunks(st.session_state.sensor_data.to_frame()),
+            "sensor_data", "sidebar_sensor"
         )
 
     st.markdown("---")
@@ -529,6 +820,9 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
+# Biaya perangkat & histori mengikuti tarif terbaru
+reprice_all()
+
 # ==================== HEADER ====================
 col1, col2, col3 = st.columns([1, 2, 1])
 with col2:
@@ -539,14 +833,29 @@ with col2:
 check_energy_alerts()
 
 # Display alerts if any
-if st.session_state.alerts:
-    for alert in st.session_state.alerts[:3]:  # Show max 3 alerts
-        if alert["type"] == "warning":
-            st.warning(alert["message"])
-        elif alert["type"] == "info":
-            st.info(alert["message"])
-        elif alert["type"] == "danger":
-            st.error(alert["message"])
+active_alerts = st.session_state.alert_engine.active()
+for alert in active_alerts[:3]:  # Show max 3 alerts
+    col1, col2 = st.columns([12, 1])
+    with col1:
+        message = alert.message if alert.count == 1 else f"{alert.message} (×{alert.count})"
+        if alert.level == "warning":
+            st.warning(message)
+        elif alert.level == "info":
+            st.info(message)
+        elif alert.level == "danger":
+            st.error(message)
+    with col2:
+        if st.button("✓", key=f"ack_alert_{alert.id}", help="Tandai sudah dibaca"):
+            st.session_state.alert_engine.acknowledge(alert.id)
+            st.rerun()
+
+if st.session_state.alert_engine.history:
+    with st.expander(f"🔔 Riwayat Alert ({len(active_alerts)} aktif)"):
+        st.dataframe(
+            pd.DataFrame(st.session_state.alert_engine.history_rows()),
+            hide_index=True,
+            use_container_width=True
+        )
 
 # ==================== TABS ====================
 tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
@@ -564,13 +873,13 @@ with tab1:
     # ==================== DASHBOARD UTAMA ====================
     st.markdown('<div class="section-title">📊 Overview Konsumsi Energi Real-time</div>', unsafe_allow_html=True)
 
-    total_energy = sum(device["energy"] for device in st.session_state.devices)
-    total_cost = sum(device["cost"] for device in st.session_state.devices)
+    total_energy = st.session_state.devices.total("energy")
+    total_cost = st.session_state.devices.total("cost")
     device_count = len(st.session_state.devices)
     carbon_footprint = calculate_carbon_footprint(total_energy)
 
     if st.session_state.sensor_data:
-        latest_data = st.session_state.sensor_data[-1]
+        latest_data = st.session_state.sensor_data.latest()
         current_power = latest_data.get("power", 0)
         current_temp = latest_data.get("suhu", 25)
         current_voltage = latest_data.get("voltage", 220)
@@ -610,8 +919,8 @@ with tab1:
         st.markdown(f"""
         <div class="energy-card">
             <h3>⚡ Daya Real-time</h3>
-            <h2>{current_power} W</h2>
-            <p>{current_voltage} V • {current_current:.1f} A</p>
+            <h2>{current_power:.0f} W</h2>
+            <p>{current_voltage:.1f} V • {current_current:.1f} A</p>
         </div>
         """, unsafe_allow_html=True)
 
@@ -643,55 +952,59 @@ with tab1:
     with col1:
         st.markdown("#### 📈 Konsumsi Energi per Device")
         if st.session_state.devices:
-            df_devices = pd.DataFrame(st.session_state.devices)
+            df_devices = st.session_state.devices.to_frame()
             
             if PLOTLY_AVAILABLE:
                 # Gunakan Plotly jika tersedia
-                fig = px.bar(df_devices,
-                            x='name',
-                            y='energy',
-                            color='energy',
-                            color_continuous_scale='Viridis',
-                            labels={'energy': 'Energi (kWh)', 'name': 'Perangkat'})
-                fig.update_layout(height=350, showlegend=False)
-                st.plotly_chart(fig, use_container_width=True)
+                show_chart("device_energy_plotly", df_devices, lambda df: px.bar(
+                    df,
+                    x='name',
+                    y='energy',
+                    color='energy',
+                    color_continuous_scale='Viridis',
+                    labels={'energy': 'Energi (kWh)', 'name': 'Perangkat'}
+                ).update_layout(height=350, showlegend=False))
             else:
                 # Fallback ke matplotlib
-                fig = create_bar_chart_matplotlib(
-                    df_devices, 
+                show_chart("device_energy_mpl", df_devices, lambda df: create_bar_chart_matplotlib(
+                    df,
                     'Konsumsi Energi per Device',
-                    'Perangkat', 
+                    'Perangkat',
                     'Energi (kWh)'
-                )
-                st.pyplot(fig)
+                ))
 
     with col2:
         st.markdown("#### ⚡ Real-time Power Consumption")
-        if st.session_state.sensor_data and len(st.session_state.sensor_data) > 1:
-            df_sensor = pd.DataFrame(st.session_state.sensor_data[-20:])  # Last 20 readings
+        live_mode = st.toggle(
+            "🔴 Live",
+            key="live_chart",
+            help="Chart diperbarui otomatis setiap interval collector, hanya titik baru yang dikirim"
+        )
+        if live_mode:
+            live_chart = render_live_power_chart()
+        elif st.session_state.sensor_data and len(st.session_state.sensor_data) > 1:
+            df_sensor = st.session_state.sensor_data.to_frame(20)  # Last 20 readings
             
             if PLOTLY_AVAILABLE:
                 # Gunakan Plotly jika tersedia
-                fig = px.line(df_sensor,
-                             x='timestamp',
-                             y='power',
-                             markers=True,
-                             labels={'power': 'Daya (W)', 'timestamp': 'Waktu'})
-                fig.update_traces(line_color='#FF6B6B', line_width=3)
-                fig.update_layout(height=400)
-                st.plotly_chart(fig, use_container_width=True)
+                show_chart("realtime_power_plotly", df_sensor, lambda df: px.line(
+                    df,
+                    x='timestamp',
+                    y='power',
+                    markers=True,
+                    labels={'power': 'Daya (W)', 'timestamp': 'Waktu'}
+                ).update_traces(line_color='#FF6B6B', line_width=3).update_layout(height=400))
             else:
                 # Fallback ke matplotlib
-                fig = create_line_chart_matplotlib(
-                    df_sensor,
+                show_chart("realtime_power_mpl", df_sensor, lambda df: create_line_chart_matplotlib(
+                    df,
                     'timestamp',
                     'power',
                     'Real-time Power Consumption',
                     'Waktu',
                     'Daya (W)',
                     color='#FF6B6B'
-                )
-                st.pyplot(fig)
+                ))
         else:
             st.info("📡 Waiting for sensor data...")
 
@@ -718,7 +1031,7 @@ with tab1:
         st.markdown("---")
         st.markdown("#### 📊 Data Sensor ESP32 Real-time")
         
-        latest_data = st.session_state.sensor_data[-1]
+        latest_data = st.session_state.sensor_data.latest()
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -736,6 +1049,33 @@ with tab1:
             relay2_status = "ON" if latest_data.get('relay2', 0) else "OFF"
             st.metric("🔌 Relay 2", relay2_status)
 
+        # Total energi live dari integrator collector (tidak scan histori)
+        live_energy = get_sensor_collector().energy_totals(DEVICE_ID)
+
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            st.metric("⚡ Energi Jam Ini", f"{live_energy['hour']['total'] * 1000:.1f} Wh")
+
+        with col2:
+            st.metric("📅 Energi Hari Ini", f"{live_energy['day']['total']:.3f} kWh")
+
+        with col3:
+            st.metric("🗓️ Energi Bulan Ini", f"{live_energy['month']['total']:.2f} kWh")
+
+        with col4:
+            day_cost = current_tariff().incremental_cost(
+                live_energy['month']['total'] - live_energy['day']['total'],
+                live_energy['day']['total']
+            )
+            st.metric("💰 Biaya Hari Ini", f"Rp {float(day_cost):,.0f}")
+
+        st.caption(
+            f"Per relay hari ini: {st.session_state.relays['relay_1']['name']} "
+            f"{live_energy['day']['relay1']:.3f} kWh • {st.session_state.relays['relay_2']['name']} "
+            f"{live_energy['day']['relay2']:.3f} kWh"
+        )
+
 # Tab 2-7 tetap sama seperti sebelumnya...
 with tab2:
     # ==================== DEVICES ====================
@@ -744,14 +1084,14 @@ with tab2:
     if st.session_state.devices:
         # Summary statistics
         total_devices = len(st.session_state.devices)
-        total_power = sum(device["power"] for device in st.session_state.devices)
+        total_power = st.session_state.devices.total("power")
         
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
             st.metric("Total Perangkat", total_devices)
         with col2:
-            st.metric("Total Daya", f"{total_power} W")
+            st.metric("Total Daya", f"{total_power:,.0f} W")
         with col3:
             st.metric("Energi Total", f"{total_energy:.1f} kWh")
         with col4:
@@ -759,18 +1099,16 @@ with tab2:
         
         # Device table
         st.markdown("### 📋 Daftar Perangkat")
-        df_devices = pd.DataFrame(st.session_state.devices)
+        df_devices = st.session_state.devices.to_frame()
         st.dataframe(df_devices, use_container_width=True)
         
         # Device categories
         st.markdown("### 🗂️ Kategori Perangkat")
-        if 'category' in df_devices.columns:
-            category_summary = df_devices.groupby('category').agg({
-                'energy': 'sum',
-                'cost': 'sum',
-                'name': 'count'
-            }).rename(columns={'name': 'jumlah'})
-            st.dataframe(category_summary, use_container_width=True)
+        category_summary = pd.DataFrame.from_dict(
+            st.session_state.devices.category_totals(), orient='index'
+        )[['energy', 'cost', 'count']].rename(columns={'count': 'jumlah'})
+        category_summary.index.name = 'category'
+        st.dataframe(category_summary, use_container_width=True)
     else:
         st.info("📝 Belum ada perangkat yang ditambahkan. Gunakan tab 'Manage' untuk menambah perangkat atau klik 'Load Demo' di sidebar.")
 
@@ -785,54 +1123,45 @@ with tab3:
         with col1:
             st.markdown("### 📊 Distribusi Konsumsi")
             if st.session_state.devices:
-                df_devices = pd.DataFrame(st.session_state.devices)
+                df_devices = st.session_state.devices.to_frame()
                 
                 if PLOTLY_AVAILABLE:
-                    fig = px.pie(df_devices, values='energy', names='name', 
-                                title='Distribusi Konsumsi Energi per Perangkat')
-                    st.plotly_chart(fig, use_container_width=True)
+                    show_chart("energy_share_plotly", df_devices, lambda df: px.pie(
+                        df, values='energy', names='name',
+                        title='Distribusi Konsumsi Energi per Perangkat'
+                    ))
                 else:
-                    fig, ax = plt.subplots(figsize=(8, 8))
-                    ax.pie(df_devices['energy'], labels=df_devices['name'], autopct='%1.1f%%')
-                    ax.set_title('Distribusi Konsumsi Energi per Perangkat')
-                    st.pyplot(fig)
+                    show_chart("energy_share_mpl", df_devices, lambda df: create_pie_chart_matplotlib(
+                        df, 'Distribusi Konsumsi Energi per Perangkat'
+                    ))
         
         with col2:
             st.markdown("### 🔍 Perbandingan Biaya")
             if st.session_state.devices:
-                df_devices = pd.DataFrame(st.session_state.devices)
+                df_devices = st.session_state.devices.to_frame()
                 
                 if PLOTLY_AVAILABLE:
-                    fig = px.bar(df_devices, x='name', y='cost',
-                                title='Biaya per Perangkat',
-                                color='cost',
-                                color_continuous_scale='Blues')
-                    fig.update_layout(xaxis_tickangle=-45)
-                    st.plotly_chart(fig, use_container_width=True)
+                    show_chart("device_cost_plotly", df_devices, lambda df: px.bar(
+                        df, x='name', y='cost',
+                        title='Biaya per Perangkat',
+                        color='cost',
+                        color_continuous_scale='Blues'
+                    ).update_layout(xaxis_tickangle=-45))
                 else:
-                    fig, ax = plt.subplots(figsize=(10, 6))
-                    bars = ax.bar(df_devices['name'], df_devices['cost'])
-                    ax.set_ylabel('Biaya (Rp)')
-                    ax.set_xlabel('Perangkat')
-                    ax.set_title('Biaya per Perangkat')
-                    ax.tick_params(axis='x', rotation=45)
-                    
-                    # Format y-axis
-                    ax.get_yaxis().set_major_formatter(
-                        plt.FuncFormatter(lambda x, p: f'{x:,.0f}')
-                    )
-                    st.pyplot(fig)
+                    show_chart("device_cost_mpl", df_devices, lambda df: create_cost_chart_matplotlib(
+                        df, 'name', 'Biaya per Perangkat', 'Perangkat'
+                    ))
         
         # Efficiency analysis
         st.markdown("### ⚡ Analisis Efisiensi")
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            avg_power = sum(device["power"] for device in st.session_state.devices) / len(st.session_state.devices)
+            avg_power = st.session_state.devices.mean("power")
             st.metric("Rata-rata Daya", f"{avg_power:.0f} W")
         
         with col2:
-            avg_hours = sum(device["hours"] for device in st.session_state.devices) / len(st.session_state.devices)
+            avg_hours = st.session_state.devices.mean("hours")
             st.metric("Rata-rata Jam Pakai", f"{avg_hours:.1f} jam/hari")
         
         with col3:
@@ -868,12 +1197,13 @@ with tab4:
         col1, col2 = st.columns(2)
 
         with col1:
+            device_names = list(st.session_state.devices.column("name"))
             device_to_optimize = st.selectbox(
                 "Pilih Perangkat",
-                [d["name"] for d in st.session_state.devices]
+                device_names
             )
 
-            current_device = next(d for d in st.session_state.devices if d["name"] == device_to_optimize)
+            current_device = st.session_state.devices[device_names.index(device_to_optimize)]
 
             st.info(f"""
             **Konsumsi Saat Ini:**
@@ -893,15 +1223,18 @@ with tab4:
                 0.5
             )
 
-            new_energy, new_cost = calculate_energy_cost(
+            new_energy, _ = calculate_energy_cost(
                 current_device['power'],
                 new_hours,
                 current_device['days'],
-                st.session_state.energy_rate
+                effective_rate()
             )
 
             energy_saved = current_device['energy'] - new_energy
-            cost_saved = current_device['cost'] - new_cost
+            # kWh yang dihemat adalah kWh teratas tagihan bulan ini (ikut tarif blok)
+            household_energy = st.session_state.devices.total("energy")
+            cost_saved = float(current_tariff().incremental_cost(household_energy - energy_saved, energy_saved))
+            new_cost = current_device['cost'] - cost_saved
 
             st.success(f"""
             **Hasil Optimasi:**
@@ -914,6 +1247,65 @@ with tab4:
             - Per tahun: Rp {cost_saved*12:,.0f}
             """)
 
+        # Whole-household optimizer
+        st.markdown("---")
+        st.markdown("### 🏠 Optimasi Seluruh Rumah")
+        st.caption(
+            f"Cari pengurangan jam pemakaian dengan pengorbanan kenyamanan terkecil agar konsumsi "
+            f"≤ target {st.session_state.energy_target} kWh/bulan. Prioritas 1 = mudah dikurangi, 5 = sulit."
+        )
+
+        with st.expander("⚙️ Batas per perangkat"):
+            # Key ikut versi tabel supaya editor dibuat ulang saat perangkat berubah
+            constraints = st.data_editor(
+                default_constraints(st.session_state.devices),
+                column_config={
+                    "min_hours": st.column_config.NumberColumn("Jam minimum", min_value=0.0, max_value=24.0, step=0.5),
+                    "priority": st.column_config.NumberColumn("Prioritas", min_value=1, max_value=5, step=1),
+                },
+                disabled=["name", "category", "hours"],
+                hide_index=True,
+                use_container_width=True,
+                key=f"optimizer_constraints_{st.session_state.devices.version}"
+            )
+
+        household_plan = optimize_hours(
+            st.session_state.devices,
+            st.session_state.energy_target,
+            constraints["min_hours"].to_numpy(),
+            constraints["priority"].to_numpy()
+        )
+
+        if household_plan.needed_kwh == 0:
+            st.success("✅ Konsumsi saat ini sudah di bawah target, tidak perlu pengurangan.")
+        else:
+            total_energy_now = st.session_state.devices.total("energy")
+            plan_cost_saved = float(current_tariff().incremental_cost(
+                total_energy_now - household_plan.saved_kwh, household_plan.saved_kwh
+            ))
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Perlu Dihemat", f"{household_plan.needed_kwh:.1f} kWh")
+            with col2:
+                st.metric("Dihemat Rencana", f"{household_plan.saved_kwh:.1f} kWh",
+                         f"{len(household_plan.plan)} perangkat")
+            with col3:
+                st.metric("Penghematan Biaya", f"Rp {plan_cost_saved:,.0f}/bulan")
+
+            if not household_plan.feasible:
+                st.warning("⚠️ Target tidak tercapai dengan batas jam minimum saat ini. "
+                           "Ini adalah pengurangan maksimal yang diizinkan.")
+
+            st.dataframe(
+                household_plan.plan.rename(columns={
+                    "name": "Perangkat", "hours": "Jam Sekarang", "new_hours": "Jam Baru",
+                    "reduction": "Dikurangi (jam)", "energy_saved": "Hemat (kWh)"
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+
         # Carbon footprint reduction
         st.markdown("---")
         st.markdown("### 🌱 Dampak Lingkungan")
@@ -947,85 +1339,125 @@ with tab5:
     # ==================== HISTORICAL DATA ====================
     st.markdown('<div class="section-title">📅 Data Historis & Trend</div>', unsafe_allow_html=True)
 
-    if st.session_state.historical_data:
-        df_hist = pd.DataFrame(st.session_state.historical_data)
+    rollups = st.session_state.rollups
+    if not st.session_state.rollups_ready:
+        st.info("⏳ Histori jam/hari/bulan sedang dimuat dari database, coba lagi sebentar lagi.")
+    elif len(rollups):
+        history_ranges = {
+            "24 Jam": 1, "7 Hari": 7, "30 Hari": 30, "6 Bulan": 183, "12 Bulan": 365,
+        }
+        range_label = st.radio("Rentang Waktu", list(history_ranges), index=3, horizontal=True,
+                               key="history_range")
+
+        # Tier rollup dipilih dari panjang rentang: per jam, per hari atau per bulan
+        end_ms = now_ms()
+        start_ms = end_ms - history_ranges[range_label] * DAY_MS
+        tier = pick_tier(start_ms, end_ms)
+        period_label, period_format = {
+            "hour": ("Jam", "%d %b %H:00"), "day": ("Hari", "%d %b"), "month": ("Bulan", "%b %Y"),
+        }[tier]
+        df_hist = rollups.query(tier, start_ms, end_ms)
+        df_hist = df_hist.assign(period=df_hist["time"].dt.strftime(period_format))
+        df_chart = df_hist[["period", "energy", "cost"]]
+
+        if df_hist.empty:
+            st.info(f"📭 Tidak ada data pada rentang {range_label} terakhir. Pilih rentang yang lebih panjang.")
+        else:
+            # Trend charts dengan matplotlib
+            col1, col2 = st.columns(2)
 
-        # Trend charts dengan matplotlib
-        col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("#### 📈 Trend Konsumsi Energi")
+                if PLOTLY_AVAILABLE:
+                    show_chart("history_energy_plotly", df_chart, lambda df: px.line(
+                        df, x='period', y='energy',
+                        markers=True,
+                        labels={'energy': 'Energi (kWh)', 'period': period_label}
+                    ).update_traces(line_color='#667eea', line_width=3, marker_size=10).update_layout(height=350))
+                else:
+                    show_chart("history_energy_mpl", df_chart, lambda df: create_line_chart_matplotlib(
+                        df, 'period', 'energy', 'Trend Konsumsi Energi', period_label, 'Energi (kWh)', color='#667eea'
+                    ))
 
-        with col1:
-            st.markdown("#### 📈 Trend Konsumsi Energi")
-            if PLOTLY_AVAILABLE:
-                fig = px.line(df_hist, x='month', y='energy',
-                             markers=True,
-                             labels={'energy': 'Energi (kWh)', 'month': 'Bulan'})
-                fig.update_traces(line_color='#667eea', line_width=3, marker_size=10)
-                fig.update_layout(height=350)
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                fig, ax = plt.subplots(figsize=(10, 6))
-                ax.plot(df_hist['month'], df_hist['energy'], 
-                       marker='o', linewidth=3, color='#667eea', markersize=8)
-                ax.set_ylabel('Energi (kWh)')
-                ax.set_xlabel('Bulan')
-                ax.grid(True, alpha=0.3)
-                ax.tick_params(axis='x', rotation=45)
-                plt.tight_layout()
-                st.pyplot(fig)
+            with col2:
+                st.markdown("#### 💰 Trend Biaya")
+                if PLOTLY_AVAILABLE:
+                    show_chart("history_cost_plotly", df_chart, lambda df: px.bar(
+                        df, x='period', y='cost',
+                        labels={'cost': 'Biaya (Rp)', 'period': period_label},
+                        color='cost',
+                        color_continuous_scale='Blues'
+                    ).update_layout(height=350, showlegend=False))
+                else:
+                    show_chart("history_cost_mpl", df_chart, lambda df: create_cost_chart_matplotlib(
+                        df, 'period', None, period_label, colors=plt.cm.Blues(np.linspace(0.4, 1, len(df)))
+                    ))
 
-        with col2:
-            st.markdown("#### 💰 Trend Biaya")
-            if PLOTLY_AVAILABLE:
-                fig = px.bar(df_hist, x='month', y='cost',
-                            labels={'cost': 'Biaya (Rp)', 'month': 'Bulan'},
-                            color='cost',
-                            color_continuous_scale='Blues')
-                fig.update_layout(height=350, showlegend=False)
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                fig, ax = plt.subplots(figsize=(10, 6))
-                bars = ax.bar(df_hist['month'], df_hist['cost'], 
-                             color=plt.cm.Blues(np.linspace(0.4, 1, len(df_hist))))
-                ax.set_ylabel('Biaya (Rp)')
-                ax.set_xlabel('Bulan')
-                ax.tick_params(axis='x', rotation=45)
-                ax.grid(axis='y', alpha=0.3)
-                
-                # Format y-axis dengan separator ribuan
-                ax.get_yaxis().set_major_formatter(
-                    plt.FuncFormatter(lambda x, p: f'{x:,.0f}')
-                )
-                plt.tight_layout()
-                st.pyplot(fig)
+            # Statistics
+            st.markdown("---")
+            st.markdown(f"### 📊 Statistik {range_label} Terakhir (per {period_label.lower()})")
 
-        # Statistics
-        st.markdown("---")
-        st.markdown("### 📊 Statistik 6 Bulan Terakhir")
+            col1, col2, col3, col4 = st.columns(4)
 
-        col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                avg_energy = df_hist['energy'].mean()
+                st.metric("Rata-rata Energi", f"{avg_energy:.1f} kWh")
 
-        with col1:
-            avg_energy = df_hist['energy'].mean()
-            st.metric("Rata-rata Energi", f"{avg_energy:.0f} kWh")
+            with col2:
+                avg_cost = df_hist['cost'].mean()
+                st.metric("Rata-rata Biaya", f"Rp {avg_cost:,.0f}")
 
-        with col2:
-            avg_cost = df_hist['cost'].mean()
-            st.metric("Rata-rata Biaya", f"Rp {avg_cost:,.0f}")
+            with col3:
+                max_energy = df_hist['energy'].max()
+                max_period = df_hist.loc[df_hist['energy'].idxmax(), 'period']
+                st.metric("Peak Consumption", f"{max_energy:.1f} kWh", max_period)
 
-        with col3:
-            max_energy = df_hist['energy'].max()
-            max_month = df_hist.loc[df_hist['energy'].idxmax(), 'month']
-            st.metric("Peak Consumption", f"{max_energy:.0f} kWh", max_month)
+            with col4:
+                min_energy = df_hist['energy'].min()
+                min_period = df_hist.loc[df_hist['energy'].idxmin(), 'period']
+                st.metric("Lowest Consumption", f"{min_energy:.1f} kWh", min_period)
 
-        with col4:
-            min_energy = df_hist['energy'].min()
-            min_month = df_hist.loc[df_hist['energy'].idxmin(), 'month']
-            st.metric("Lowest Consumption", f"{min_energy:.0f} kWh", min_month)
+            col1, col2, col3, col4 = st.columns(4)
 
-        # Detailed table
-        st.markdown("---")
-        st.markdown("### 📋 Data Detail")
-        st.dataframe(df_hist, use_container_width=True, hide_index=True)
+            with col1:
+                st.metric("Total Energi", f"{df_hist['energy'].sum():,.1f} kWh")
+
+            with col2:
+                st.metric("Total Biaya", f"Rp {df_hist['cost'].sum():,.0f}")
+
+            with col3:
+                peak_row = df_hist.loc[df_hist['power_max'].idxmax()]
+                st.metric("Daya Puncak", f"{peak_row['power_max']:,.0f} W",
+                          peak_row['peak_time'].strftime("%d %b %H:%M"))
+
+            with col4:
+                avg_power = (df_hist['power_avg'] * df_hist['samples']).sum() / df_hist['samples'].sum()
+                st.metric("Daya Rata-rata", f"{avg_power:,.0f} W", f"{df_hist['samples'].sum():,} data")
+
+            # Detailed table
+            st.markdown("---")
+            st.markdown("### 📋 Data Detail")
+            st.dataframe(
+                df_hist[["period", "energy", "cost", "power_avg", "power_min", "power_max", "peak_time", "samples"]],
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "period": period_label,
+                    "energy": st.column_config.NumberColumn("Energi (kWh)", format="%.2f"),
+                    "cost": st.column_config.NumberColumn("Biaya (Rp)", format="%.0f"),
+                    "power_avg": st.column_config.NumberColumn("Daya Rata-rata (W)", format="%.0f"),
+                    "power_min": st.column_config.NumberColumn("Daya Min (W)", format="%.0f"),
+                    "power_max": st.column_config.NumberColumn("Daya Maks (W)", format="%.0f"),
+                    "peak_time": st.column_config.DatetimeColumn("Waktu Puncak", format="DD MMM HH:mm"),
+                    "samples": "Jumlah Data",
+                },
+            )
+            export_button(
+                "📥 Export Rollup", f"rollup_{tier}",
+                (st.session_state.get("demo_rollups_id"), rollups.version, range_label, end_ms // HOUR_MS),
+                lambda: frame_chunks(df_hist.drop(columns="period")),
+                f"rollup_{tier}_{range_label.replace(' ', '_').lower()}", "rollup"
+            )
 
     else:
         st.info("""
@@ -1035,6 +1467,67 @@ with tab5:
         Klik **"Load Demo"** di sidebar untuk melihat contoh data historis.
         """)
 
+    # Riwayat sensor yang tersimpan permanen di SQLite
+    st.markdown("---")
+    st.markdown("### 🗄️ Riwayat Sensor Tersimpan")
+
+    sensor_store = get_sensor_store()
+    stored_devices = sensor_store.devices()
+
+    if stored_devices:
+        col1, col2 = st.columns(2)
+        with col1:
+            history_device = st.selectbox(
+                "Device",
+                stored_devices,
+                index=stored_devices.index(DEVICE_ID) if DEVICE_ID in stored_devices else 0
+            )
+        with col2:
+            history_range = st.date_input(
+                "Rentang Tanggal",
+                (datetime.now().date() - timedelta(days=7), datetime.now().date())
+            )
+
+        if len(history_range) == 2:
+            start_ms = int(datetime.combine(history_range[0], datetime.min.time()).timestamp() * 1000)
+            end_ms = int(datetime.combine(history_range[1] + timedelta(days=1), datetime.min.time()).timestamp() * 1000)
+            df_stored = sensor_store.query(history_device, start_ms, end_ms)
+
+            if df_stored.empty:
+                st.info("📭 Tidak ada data pada rentang ini")
+            else:
+                df_stored["timestamp"] = to_local_datetime(df_stored["timestamp"].to_numpy())
+                st.caption(f"{len(df_stored):,} data dari {history_device}")
+                st.line_chart(df_stored, x="timestamp", y=["power", "suhu"])
+
+                # Rentang panjang dibaca ulang dari store per hari saat diekspor
+                export_button(
+                    "📥 Export Rentang Ini", "stored_sensor",
+                    (history_device, start_ms, end_ms, sensor_store.version),
+                    lambda: store_chunks(sensor_store, history_device, start_ms, end_ms),
+                    f"{history_device}_{history_range[0]}_{history_range[1]}", "stored_sensor"
+                )
+    else:
+        st.info("📭 Belum ada data sensor tersimpan. Data dari ESP32 otomatis disimpan saat terhubung.")
+
+    # Arsip hasil export (Parquet/Arrow/CSV) bisa dimasukkan kembali ke store
+    if PYARROW_AVAILABLE:
+        with st.expander("📦 Import Arsip ke Store"):
+            archive = st.file_uploader("File arsip", type=list(ARCHIVE_TYPES), key="archive_upload")
+            archive_device = st.text_input(
+                "Device ID (jika arsip tidak punya kolom device_id)", DEVICE_ID, key="archive_device"
+            )
+            # Tunggu seeding selesai supaya baris import tidak terhitung dua kali di rollup
+            collector = get_sensor_collector()
+            if archive is not None and st.button("📥 Import", key="archive_import",
+                                                 disabled=not collector.rollups_ready.is_set()):
+                try:
+                    read, written = import_archive(sensor_store, archive.getvalue(), archive.name, archive_device,
+                                                   on_written=collector.add_history)
+                    st.success(f"✅ {written:,} dari {read:,} data diimport ({read - written:,} sudah ada)")
+                except (ValueError, OSError) as e:
+                    st.error(f"❌ Import gagal: {str(e)}")
+
 with tab6:
     # ==================== MANAGE DATA ====================
     st.markdown('<div class="section-title">🔧 Kelola Data Perangkat</div>', unsafe_allow_html=True)
@@ -1070,7 +1563,7 @@ with tab6:
 
             # Preview calculation
             preview_energy, preview_cost = calculate_energy_cost(
-                power_watt, hours_per_day, days_per_month, st.session_state.energy_rate
+                power_watt, hours_per_day, days_per_month, effective_rate()
             )
 
             st.info(f"""
@@ -1093,7 +1586,7 @@ with tab6:
                     power_watt,
                     hours_per_day,
                     days_per_month,
-                    st.session_state.energy_rate
+                    effective_rate()
                 )
 
                 new_device = {
@@ -1106,23 +1599,75 @@ with tab6:
                     "cost": cost
                 }
 
-                st.session_state.devices.append(new_device)
+                with shared_write("devices") as state:
+                    state.devices.append(new_device)
                 st.success(f"✅ **{device_name}** berhasil ditambahkan!")
                 st.rerun()
             else:
                 st.error("❌ Nama perangkat tidak boleh kosong!")
 
+    # Import banyak perangkat sekaligus (satu gedung / banyak rumah)
+    with st.expander("📦 Import Perangkat Massal (CSV / JSON / Excel)"):
+        st.caption("Kolom wajib: name, power (W), hours (jam/hari). Opsional: category, days (default 30).")
+        st.download_button("📄 Template CSV", TEMPLATE_CSV, "template_perangkat.csv", "text/csv",
+                           key="inventory_template")
+        inventory_file = st.file_uploader("File inventaris", type=list(INVENTORY_TYPES), key="inventory_upload")
+
+        if inventory_file is not None:
+            # Validasi sekali per file, hasilnya dipakai ulang di rerun berikutnya
+            upload_key = (inventory_file.name, inventory_file.size)
+            if st.session_state.get("inventory_check", (None,))[0] != upload_key:
+                try:
+                    raw = read_inventory(inventory_file.getvalue(), inventory_file.name)
+                    st.session_state.inventory_check = (upload_key, *validate_inventory(raw), None)
+                except ValueError as e:
+                    st.session_state.inventory_check = (upload_key, None, None, str(e))
+            _, valid, errors, read_error = st.session_state.inventory_check
+
+            if read_error:
+                st.error(f"❌ {read_error}")
+            else:
+                new_energy = valid["energy"].sum()
+                base_energy = st.session_state.devices.total("energy")
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Baris Valid", f"{len(valid):,}")
+                col2.metric("Baris Bermasalah", f"{errors['Baris'].nunique():,}")
+                col3.metric("Tambahan Biaya/Bulan",
+                            f"Rp {float(current_tariff().incremental_cost(base_energy, new_energy)):,.0f}",
+                            f"{new_energy:,.1f} kWh")
+
+                if len(errors):
+                    st.warning("⚠️ Baris berikut tidak akan diimport:")
+                    st.dataframe(errors, use_container_width=True, hide_index=True)
+                if len(valid):
+                    st.dataframe(valid.drop(columns="cost").head(DEVICE_LIST_LIMIT), use_container_width=True,
+                                 hide_index=True)
+                    replace = st.checkbox("Ganti semua perangkat yang ada", key="inventory_replace")
+                    if st.button(f"📥 Import {len(valid):,} Perangkat", type="primary", key="inventory_import"):
+                        with shared_write("devices") as state:
+                            if replace:
+                                state.devices.clear()
+                            state.devices.extend_frame(valid)
+                        del st.session_state.inventory_check
+                        st.success(f"✅ {len(valid):,} perangkat berhasil diimport!")
+                        st.rerun()
+
     # Manage existing devices
     if st.session_state.devices:
         st.markdown("---")
         st.markdown("### 📋 Daftar Perangkat Terdaftar")
 
-        for i, device in enumerate(st.session_state.devices):
+        if len(st.session_state.devices) > DEVICE_LIST_LIMIT:
+            st.caption(f"Menampilkan {DEVICE_LIST_LIMIT} dari {len(st.session_state.devices):,} perangkat. "
+                       "Gunakan Export untuk daftar lengkap.")
+
+        for i in range(min(len(st.session_state.devices), DEVICE_LIST_LIMIT)):
+            device = st.session_state.devices[i]
             with st.expander(f"🔌 {device['name']} - {device['power']}W"):
                 col1, col2, col3 = st.columns([2, 2, 1])
 
                 with col1:
-                    st.write(f"**Kategori:** {device.get('category', 'N/A')}")
+                    st.write(f"**Kategori:** {device['category']}")
                     st.write(f"**Daya:** {device['power']} Watt")
                     st.write(f"**Penggunaan:** {device['hours']} jam/hari × {device['days']} hari/bulan")
 
@@ -1132,12 +1677,15 @@ with tab6:
 
                     # Calculate percentage of total
                     if total_energy > 0:
-                        pct = (device['energy'] / total_energy) * 100
+                        pct = st.session_state.devices.share(i) * 100
                         st.write(f"**Kontribusi:** {pct:.1f}% dari total")
 
                 with col3:
                     if st.button("🗑️ Hapus", key=f"delete_{i}", use_container_width=True):
-                        st.session_state.devices.pop(i)
+                        with shared_write("devices") as state:
+                            # Session lain bisa saja sudah mengubah daftar sejak halaman ini dirender
+                            if i < len(state.devices) and state.devices[i]["name"] == device["name"]:
+                                state.devices.pop(i)
                         st.success("✅ Perangkat dihapus!")
                         st.rerun()
 
@@ -1150,21 +1698,17 @@ with tab6:
 
         with col1:
             if st.button("🗑️ Hapus Semua", use_container_width=True, type="secondary"):
-                st.session_state.devices = []
+                with shared_write("devices") as state:
+                    state.devices.clear()
                 st.success("✅ Semua perangkat dihapus!")
                 st.rerun()
 
         with col2:
-            if st.button("📊 Export to CSV", use_container_width=True):
-                df = pd.DataFrame(st.session_state.devices)
-                csv = df.to_csv(index=False)
-                st.download_button(
-                    "📥 Download CSV",
-                    csv,
-                    "devices_export.csv",
-                    "text/csv",
-                    use_container_width=True
-                )
+            export_button(
+                "📊 Export Data", "devices", st.session_state.devices.version,
+                lambda: frame_chunks(st.session_state.devices.to_frame()),
+                "devices_export", "manage_devices"
+            )
 
         with col3:
             if st.button("🔄 Reload Demo", use_container_width=True):
@@ -1191,6 +1735,7 @@ with tab7:
         )
         if esp32_ip != st.session_state.esp32_ip:
             st.session_state.esp32_ip = esp32_ip
+            apply_esp32_target()
     
     with col2:
         esp32_port = st.number_input(
@@ -1202,35 +1747,40 @@ with tab7:
         )
         if esp32_port != st.session_state.esp32_port:
             st.session_state.esp32_port = esp32_port
+            apply_esp32_target()
     
     with col3:
         st.markdown("### 🔗 Quick Actions")
         if st.button("🔄 Connect & Fetch Data", use_container_width=True, type="primary"):
-            with st.spinner("Menghubungkan ke ESP32..."):
-                success, result = fetch_sensor_data()
-                if success:
-                    st.session_state.esp32_connected = True
-                    # Process sensor data
-                    process_sensor_data(result)
-                    st.success(f"✅ Terhubung ke {st.session_state.esp32_ip}!")
-                else:
-                    st.error(f"❌ Gagal: {result}")
+            # Collector yang melakukan polling di background, di sini hanya set target
+            apply_esp32_target()
+            get_sensor_collector().request_poll()
+            st.session_state.esp32_connected = True
             st.rerun()
     
     # Connection status display
     st.markdown("---")
     
     if st.session_state.esp32_connected:
+        collector = get_sensor_collector()
+        device_status = collector.device_status(DEVICE_ID)
+        last_update = (
+            datetime.fromtimestamp(device_status.last_success).strftime("%Y-%m-%d %H:%M:%S")
+            if device_status and device_status.last_success else "Belum ada data"
+        )
         st.success(f"""
         ## 🟢 TERHUBUNG
         
         **Connection Details:**
+        - **Device ID:** {DEVICE_ID}
         - **IP Address:** {st.session_state.esp32_ip}
         - **Port:** {st.session_state.esp32_port}
         - **Protocol:** {st.session_state.esp32_protocol}
         - **Status:** Streaming data aktif
-        - **Last Update:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        - **Last Update:** {last_update}
         """)
+        if device_status and device_status.last_error:
+            st.error(f"❌ {device_status.last_error}")
         
         # Data controls
         st.markdown("### 🎛️ Kontrol Data")
@@ -1246,19 +1796,17 @@ with tab7:
             )
             if data_interval != st.session_state.esp32_data_interval:
                 st.session_state.esp32_data_interval = data_interval
+                apply_esp32_target()
         
         with col2:
             if st.button("🔄 Refresh Data", use_container_width=True):
-                success, result = fetch_sensor_data()
-                if success:
-                    process_sensor_data(result)
-                    st.success("✅ Data updated!")
-                else:
-                    st.error(f"❌ {result}")
+                collector.request_poll()
+                st.info("🔄 Collector diminta mengambil data terbaru")
         
         with col3:
             if st.button("🗑️ Clear Data", use_container_width=True, type="secondary"):
-                st.session_state.sensor_data = []
+                with shared_write("sensor_data") as state:
+                    state.sensor_data.clear()
                 st.info("📊 Data sensor dibersihkan")
                 st.rerun()
         
@@ -1267,7 +1815,7 @@ with tab7:
         st.markdown("### 📊 Live Sensor Data dari ESP32")
         
         if st.session_state.sensor_data:
-            latest_data = st.session_state.sensor_data[-1]
+            latest_data = st.session_state.sensor_data.latest()
             
             # Sensor metrics grid
             col1, col2, col3, col4, col5, col6 = st.columns(6)
@@ -1315,7 +1863,7 @@ with tab7:
                 st.markdown(f"""
                 <div class="metric-card">
                     <h3>⚡ Daya</h3>
-                    <h2>{power} W</h2>
+                    <h2>{power:.0f} W</h2>
                     <p>Konsumsi</p>
                 </div>
                 """, unsafe_allow_html=True)
@@ -1325,7 +1873,7 @@ with tab7:
                 st.markdown(f"""
                 <div class="sensor-card">
                     <h3>🔋 Tegangan</h3>
-                    <h2>{voltage} V</h2>
+                    <h2>{voltage:.1f} V</h2>
                     <p>AC Power</p>
                 </div>
                 """, unsafe_allow_html=True)
@@ -1452,21 +2000,32 @@ with tab7:
                 usage_pct = (active_relays / total_relays) * 100
                 st.metric("Usage", f"{usage_pct:.1f}%")
             
+            # Status perintah relay dari antrian
+            if st.session_state.relay_commands:
+                st.markdown("#### 📨 Status Perintah Relay")
+                command_log = [{
+                    "Waktu": datetime.fromtimestamp(command.submitted_at).strftime("%H:%M:%S"),
+                    "Relay": command.pin,
+                    "Perintah": "ON" if command.status else "OFF",
+                    "Status": command.message
+                } for command in st.session_state.relay_commands[::-1]]
+                st.dataframe(pd.DataFrame(command_log), use_container_width=True, hide_index=True)
+            
             # Data log table
             st.markdown("---")
             st.markdown("### 📝 Recent Data Log (Last 10 Readings)")
             
             log_data = []
-            for data in st.session_state.sensor_data[-10:][::-1]:
+            for data in st.session_state.sensor_data.records(10)[::-1]:
                 log_data.append({
-                    "Timestamp": data["timestamp"],
+                    "Timestamp": format_timestamp(data["timestamp"]),
                     "Suhu": f"{data.get('suhu', 0)}°C",
                     "Status Suhu": data.get('statusSuhu', ''),
                     "LDR": data.get('ldr', 0),
                     "Status LDR": data.get('statusLDR', ''),
                     "Relay 1": "ON" if data.get('relay1', 0) else "OFF",
                     "Relay 2": "ON" if data.get('relay2', 0) else "OFF",
-                    "Daya": f"{data.get('power', 0)} W"
+                    "Daya": f"{data.get('power', 0):.0f} W"
                 })
             
             df_log = pd.DataFrame(log_data)
@@ -1479,24 +2038,20 @@ with tab7:
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                csv_data = pd.DataFrame(st.session_state.sensor_data).to_csv(index=False)
-                st.download_button(
-                    "📥 Download All Data (CSV)",
-                    csv_data,
-                    "esp32_sensor_data_full.csv",
-                    "text/csv",
-                    use_container_width=True
+                export_button(
+                    "📥 Download All Data", "sensor", st.session_state.sensor_data.version,
+                    lambda: frame_chunks(st.session_state.sensor_data.to_frame()),
+                    "esp32_sensor_data_full", "esp32_all"
                 )
             
             with col2:
-                recent_data = st.session_state.sensor_data[-60:]
-                csv_recent = pd.DataFrame(recent_data).to_csv(index=False)
-                st.download_button(
-                    "📥 Download Last Hour (CSV)",
-                    csv_recent,
-                    "esp32_recent_data.csv",
-                    "text/csv",
-                    use_container_width=True
+                # Jendela 1 jam bergeser seiring waktu: versi ikut berganti setiap menit
+                one_hour_ago = now_ms() - 3600 * 1000
+                export_button(
+                    "📥 Download Last Hour", "sensor_last_hour",
+                    (st.session_state.sensor_data.version, one_hour_ago // 60000),
+                    lambda: frame_chunks(st.session_state.sensor_data.to_frame(start_ms=one_hour_ago)),
+                    "esp32_recent_data", "esp32_recent"
                 )
             
             with col3:
@@ -1506,16 +2061,13 @@ with tab7:
                     "port": st.session_state.esp32_port,
                     "protocol": st.session_state.esp32_protocol,
                     "data_interval": st.session_state.esp32_data_interval,
-                    "last_connected": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 }
-                config_df = pd.DataFrame([config_data])
-                config_csv = config_df.to_csv(index=False)
-                st.download_button(
-                    "📄 Connection Config",
-                    config_csv,
-                    "esp32_connection_config.csv",
-                    "text/csv",
-                    use_container_width=True
+                export_button(
+                    "📄 Connection Config", "esp32_config", tuple(config_data.values()),
+                    lambda: [pd.DataFrame([dict(
+                        config_data, last_connected=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    )])],
+                    "esp32_connection_config", "esp32_config"
                 )
         
         else:
@@ -1559,6 +2111,7 @@ with tab7:
             if st.button("🏢 Campus ESP32", use_container_width=True):
                 st.session_state.esp32_ip = "10.203.15.109"
                 st.session_state.esp32_port = 80
+                apply_esp32_target()
                 st.success("✅ Campus ESP32 configuration loaded!")
                 st.rerun()
         
@@ -1566,6 +2119,7 @@ with tab7:
             if st.button("🏠 Home Network", use_container_width=True):
                 st.session_state.esp32_ip = "192.168.1.100"
                 st.session_state.esp32_port = 80
+                apply_esp32_target()
                 st.info("✅ Home Network loaded")
                 st.rerun()
         
@@ -1573,9 +2127,62 @@ with tab7:
             if st.button("📱 Hotspot", use_container_width=True):
                 st.session_state.esp32_ip = "192.168.4.1"
                 st.session_state.esp32_port = 80
+                apply_esp32_target()
                 st.info("✅ Hotspot loaded")
                 st.rerun()
 
+    # Fleet ESP32 - semua board yang dipoll oleh collector
+    st.markdown("---")
+    st.markdown("### 🛰️ Fleet ESP32")
+
+    fleet_registry = get_sensor_collector().registry
+    fleet_devices = fleet_registry.all()
+    online_count = sum(1 for device in fleet_devices if device.online)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Total Node", len(fleet_devices))
+    with col2:
+        st.metric("Node Online", f"{online_count}/{len(fleet_devices)}")
+
+    if get_ingest_server() is not None:
+        st.caption(f"📥 Push ingestion aktif: `POST {INGEST_BIND_HOST}:{INGEST_PORT}{INGEST_PATH}` "
+                   f"(object, list, atau batch `readings`{', wajib token' if INGEST_TOKEN else ''})")
+    else:
+        st.caption(f"⚠️ Push ingestion tidak aktif: port {INGEST_PORT} sudah dipakai")
+
+    if fleet_devices:
+        fleet_table = pd.DataFrame([{
+            "Device ID": device.device_id,
+            "Lokasi": device.location,
+            "Alamat": f"{device.ip}:{device.port}",
+            "Status": "🟢 Online" if device.online else ("🔴 Offline" if device.failures else "⏳ Menunggu"),
+            "Gagal Berturut": device.failures,
+            "Error Terakhir": device.last_error or "-"
+        } for device in fleet_devices])
+        st.dataframe(fleet_table, use_container_width=True, hide_index=True)
+
+    with st.form("tambah_esp32_form"):
+        st.markdown("#### ➕ Tambah / Update Node")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            new_device_id = st.text_input("Device ID", placeholder="ESP32_SmartHome_002")
+        with col2:
+            new_device_ip = st.text_input("IP Address", placeholder="192.168.1.101")
+        with col3:
+            new_device_port = st.number_input("Port", min_value=1, max_value=65535, value=80)
+        with col4:
+            new_device_location = st.text_input("Lokasi", placeholder="Kamar_Tidur")
+
+        if st.form_submit_button("💾 Simpan Node", use_container_width=True):
+            if new_device_id.strip() and new_device_ip.strip():
+                fleet_registry.upsert(new_device_id.strip(), new_device_ip.strip(),
+                                      int(new_device_port), new_device_location.strip())
+                st.success(f"✅ Node **{new_device_id}** ditambahkan ke fleet!")
+                st.rerun()
+            else:
+                st.error("❌ Device ID dan IP Address wajib diisi!")
+
 with tab8:
     # ==================== SMART HOME DASHBOARD ====================
     smart_home_dashboard()
@@ -1703,5 +2310,11 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ==================== AUTO-LOAD & INITIALIZATION ====================
-if not st.session_state.devices and not st.session_state.sensor_data:
+# Data demo hanya untuk instalasi baru; setelah itu inventaris dipulihkan dari state tersimpan
+if not st.session_state.state_restored and not st.session_state.devices and not st.session_state.sensor_data:
     load_sample_data()
+
+# ==================== LIVE CHART ====================
+# Harus paling akhir: loop ini terus berjalan sampai rerun berikutnya
+if st.session_state.get("live_chart"):
+    run_live_power_chart(live_chart)
@@ -11,3 +11,95 @@ LOCATION = "Ruang_Tamu"
 LDR_DARK_THRESHOLD = 50      # Nilai LDR untuk kondisi gelap
 TEMP_HOT_THRESHOLD = 30      # Suhu untuk menyalakan kipas
 VOLTAGE_LOW_THRESHOLD = 200  # Tegangan rendah untuk alarm
+
+# Konfigurasi Koneksi ESP32
+ESP32_REQUEST_TIMEOUT = 5    # Timeout request HTTP ke ESP32 (detik)
+SENSOR_HISTORY_SIZE = 100    # Jumlah data sensor per device di buffer collector
+SENSOR_BUFFER_CAPACITY = 3600  # Kapasitas ring buffer sensor di dashboard (1 jam @ 1 Hz)
+
+# Registry perangkat ESP32 (satu entry per board)
+ESP32_DEVICES = [
+    {"device_id": DEVICE_ID, "ip": "10.203.15.109", "port": 80, "location": LOCATION},
+]
+FLEET_MAX_CONCURRENCY = 64   # Maksimal request /data yang berjalan bersamaan
+FLEET_BACKOFF_MAX = 300      # Backoff maksimal untuk node mati (detik)
+ESP32_POOL_MAXSIZE = 2       # Maksimal koneksi keep-alive terbuka per board
+ESP32_POOL_MAX_DEVICES = 512 # Maksimal board yang koneksinya disimpan di pool
+RELAY_COALESCE_WINDOW = 0.3  # Jeda penggabungan perintah relay beruntun (detik)
+RELAY_WORKER_IDLE_S = 60     # Worker relay per device berhenti setelah sekian detik tanpa perintah
+
+# Konfigurasi Server Ingestion (menerima data push di SERVER_URL)
+INGEST_BIND_HOST = "127.0.0.1"  # Ganti ke "0.0.0.0" (dan isi INGEST_TOKEN) supaya ESP32 di LAN bisa push
+INGEST_TOKEN = None            # Jika diisi, POST wajib membawa header "Authorization: Bearer <token>"
+INGEST_MAX_BODY = 1024 * 1024  # Ukuran maksimal satu batch POST (byte)
+INGEST_MAX_AGE_S = 7 * 24 * 3600  # Reading dengan ts lebih lama dari ini ditolak (detik)
+INGEST_MAX_FUTURE_S = 300      # Toleransi jam board yang lebih cepat dari server (detik)
+
+# Penyimpanan Data Sensor (SQLite)
+SENSOR_DB_PATH = "sensor_data.db"
+STORE_RAW_RETENTION_DAYS = 7            # Data raw disimpan 7 hari
+STORE_DOWNSAMPLED_RETENTION_DAYS = 365  # Data hasil downsampling disimpan 1 tahun
+STORE_DOWNSAMPLE_BUCKET_MS = 60 * 1000  # Resolusi downsampling (1 menit)
+STORE_RETENTION_INTERVAL = 3600         # Jalankan retensi setiap 1 jam (detik)
+
+# Perhitungan Energi
+RELAY_POWER_W = 100                     # Asumsi daya beban per relay aktif (Watt)
+ENERGY_MAX_GAP_MS = 5 * 60 * 1000       # Jeda data lebih lama dari ini tidak diintegrasikan
+ENERGY_HOURLY_RETENTION_HOURS = 48      # Total per jam yang disimpan di memori
+
+# Chart
+CHART_CACHE_SIZE = 32                   # Figure yang di-cache (LRU, dipakai bersama semua session)
+LIVE_CHART_POINTS = 120                 # Titik yang ditampilkan chart daya mode live
+
+# Rekomendasi
+REC_TOP_K = 3                           # Konsumen terbesar per kategori yang dievaluasi
+REC_LIMIT = 8                           # Jumlah rekomendasi yang ditampilkan
+REC_ALWAYS_ON_HOURS = 20                # Jam/hari dianggap selalu menyala
+REC_ALWAYS_ON_EXEMPT = ("kulkas", "freezer", "lemari es")  # Memang harus selalu menyala
+REC_AC_COMFORT_HOURS = 8                # Jam AC/hari di atas ini dianggap berlebih
+REC_STANDBY_POWER_W = 2                 # Perkiraan daya standby per perangkat elektronik (Watt)
+REC_HIGH_TOTAL_KWH = 200                # Total bulanan di atas ini memicu saran upgrade
+
+# Optimasi Rumah Tangga
+OPT_MIN_HOURS_RATIO = 0.5               # Default jam minimum = 50% jam pemakaian sekarang
+OPT_DEFAULT_PRIORITY = 2                # Prioritas kenyamanan 1 (mudah dikurangi) - 5 (sulit)
+OPT_CATEGORY_PRIORITY = {"AC & Pendingin": 4, "Dapur": 3, "Penerangan": 3, "Elektronik": 2, "Lainnya": 2}
+
+# Alert
+ALERT_VOLTAGE_MIN = 210                 # Tegangan di bawah ini memicu alert (V)
+ALERT_VOLTAGE_MAX = 230                 # Tegangan di atas ini memicu alert (V)
+ALERT_VOLTAGE_HYSTERESIS = 2            # Alert tegangan selesai setelah kembali 2 V ke dalam batas
+ALERT_DEVICE_KWH = 100                  # Konsumsi bulanan per perangkat yang dianggap tinggi
+ALERT_COOLDOWN_S = 300                  # Alert yang baru selesai tidak berbunyi lagi selama ini
+ALERT_DEDUP_S = 600                     # Kejadian berulang dalam jendela ini digabung ke satu alert
+ALERT_HISTORY_SIZE = 200                # Jumlah alert yang disimpan di histori
+
+# Deteksi Anomali
+ANOMALY_ALPHA = 0.1                     # Bobot EWMA untuk sample baru
+ANOMALY_WARMUP = 10                     # Sample pertama per stream hanya untuk baseline
+ANOMALY_Z_THRESHOLD = 4.0               # |z| di atas ini dianggap spike
+ANOMALY_CUSUM_DRIFT = 0.5               # Slack CUSUM (dalam satuan std)
+ANOMALY_CUSUM_LIMIT = 8.0               # CUSUM di atas ini dianggap perubahan level
+ANOMALY_MIN_STD = {"voltage": 1.0, "power": RELAY_POWER_W, "suhu": 0.5}  # Std minimum per channel
+ANOMALY_MAX_STREAMS = 10000             # Batas jumlah (device, channel) yang dilacak
+ANOMALY_EVENT_HISTORY = 1000            # Event terakhir yang disimpan
+
+# Rollup Historis
+ROLLUP_HOUR_RETENTION_DAYS = 400        # Bucket per jam yang disimpan (dasar hitung ulang biaya)
+ROLLUP_HOUR_MAX_DAYS = 3                # Rentang sampai 3 hari ditampilkan per jam
+ROLLUP_DAY_MAX_DAYS = 92                # Rentang sampai 92 hari per hari, lebih panjang per bulan
+ROLLUP_SEED_CHUNK_DAYS = 7              # Rollup dibangun ulang dari store per 7 hari saat startup
+
+# Export
+EXPORT_CHUNK_ROWS = 50000               # Baris per chunk saat menulis CSV
+EXPORT_CHUNK_MS = 24 * 3600 * 1000      # Jendela baca dari SensorStore per chunk (1 hari)
+EXPORT_COMPRESSION = "zstd"             # Kompresi Parquet/Arrow
+
+# Import Perangkat
+IMPORT_MAX_POWER_W = 50000              # Daya maksimal per perangkat yang diterima saat import
+DEVICE_LIST_LIMIT = 100                 # Perangkat yang ditampilkan sebagai expander di tab Manage
+
+# Persistensi State
+STATE_SNAPSHOT_PATH = "app_state.snapshot"  # Snapshot biner inventaris & pengaturan
+STATE_JOURNAL_PATH = "app_state.journal"    # Journal perubahan sejak snapshot terakhir
+STATE_COMPACT_EVERY = 500                   # Tulis snapshot baru setelah sekian perubahan
@@ -0,0 +1,131 @@
+"""Import inventaris perangkat massal (CSV / JSON / Excel) dengan validasi vectorized
+
+Seluruh file divalidasi per kolom dalam satu pass (tanpa loop per baris).
+Baris yang valid dihitung energinya sekaligus, baris yang salah dilaporkan
+per baris dan per kolom supaya bisa diperbaiki di file sumbernya.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from config import IMPORT_MAX_POWER_W
+from device_table import DEFAULT_CATEGORY
+
+INVENTORY_TYPES = ("csv", "json", "xlsx", "xls")
+REQUIRED_COLUMNS = ("name", "power", "hours")
+
+# Nama kolom alternatif (header bahasa Indonesia / dari form) -> nama kolom DeviceTable
+COLUMN_ALIASES = {
+    "nama": "name", "nama perangkat": "name", "perangkat": "name",
+    "kategori": "category",
+    "daya": "power", "daya (watt)": "power", "watt": "power",
+    "jam": "hours", "jam per hari": "hours", "jam/hari": "hours",
+    "hari": "days", "hari per bulan": "days", "hari/bulan": "days",
+}
+
+# kolom -> (min, maks, pesan); batas min eksklusif untuk daya, inklusif untuk lainnya
+NUMERIC_RULES = {
+    "power": (0, IMPORT_MAX_POWER_W, f"daya harus > 0 dan <= {IMPORT_MAX_POWER_W} W"),
+    "hours": (0, 24, "jam per hari harus 0-24"),
+    "days": (1, 31, "hari per bulan harus 1-31"),
+}
+
+TEMPLATE_CSV = (
+    "name,category,power,hours,days\n"
+    "AC 1 PK,AC & Pendingin,900,8,30\n"
+    "Kulkas,Dapur,150,24,30\n"
+)
+
+
+def read_inventory(data, file_name):
+    """Baca file inventaris menjadi DataFrame mentah
+
+    File yang rusak atau isinya tidak sesuai ekstensi (mis. .xlsx yang
+    di-rename) dilaporkan sebagai ValueError, apa pun error dari parser-nya.
+    """
+    extension = file_name.rsplit(".", 1)[-1].lower()
+    if extension not in INVENTORY_TYPES:
+        raise ValueError(f"Format file tidak dikenal: {file_name}")
+    source = io.BytesIO(data)
+    try:
+        if extension == "csv":
+            return pd.read_csv(source, dtype=str, keep_default_na=False)
+        if extension == "json":
+            return pd.read_json(source, orient="records", dtype=False)
+        return pd.read_excel(source, dtype=str)
+    except ImportError as e:
+        raise ValueError(f"Membaca Excel membutuhkan package tambahan: {str(e)}") from e
+    except Exception as e:
+        # zipfile.BadZipFile / KeyError dari openpyxl, ParserError dari CSV, dst.
+        raise ValueError(f"File {file_name} tidak bisa dibaca (rusak atau bukan {extension.upper()}): {str(e)}") from e
+
+
+def validate_inventory(raw):
+    """Validasi semua baris sekaligus
+
+    Return (valid, errors): `valid` berisi kolom DeviceTable untuk baris yang
+    lolos (energy sudah dihitung, cost diisi saat reprice), `errors` berisi
+    satu baris per masalah (Baris, Kolom, Nilai, Masalah). Nomor baris 1-based.
+    """
+    frame = raw.rename(columns=lambda column: COLUMN_ALIASES.get(str(column).strip().lower(),
+                                                                  str(column).strip().lower()))
+    duplicated = frame.columns[frame.columns.duplicated()].unique()
+    if len(duplicated):
+        # Mis. "nama" dan "name", atau "daya" dan "watt": kolom mana yang dipakai jadi ambigu
+        sources = pd.Series(raw.columns.astype(str), index=frame.columns)
+        collisions = [f"{column} ({', '.join(sources[column])})" for column in duplicated]
+        raise ValueError(f"Beberapa kolom berarti sama: {'; '.join(collisions)}")
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Kolom wajib tidak ada: {', '.join(missing)}")
+
+    rows = np.arange(1, len(frame) + 1)
+    problems = []
+
+    def report(mask, column, message):
+        if mask.any():
+            original = raw.iloc[np.flatnonzero(mask), frame.columns.get_loc(column)]
+            problems.append(pd.DataFrame({
+                "Baris": rows[mask],
+                "Kolom": column,
+                "Nilai": original.fillna("").astype(str).to_numpy(),
+                "Masalah": message,
+            }))
+
+    names = frame["name"].fillna("").astype(str).str.strip()
+    report(names.eq("").to_numpy(), "name", "nama perangkat kosong")
+
+    if "category" in frame.columns:
+        categories = frame["category"].fillna("").astype(str).str.strip()
+        categories = categories.mask(categories.eq(""), DEFAULT_CATEGORY)
+    else:
+        categories = pd.Series(DEFAULT_CATEGORY, index=frame.index)
+
+    values = {}
+    for column, (low, high, message) in NUMERIC_RULES.items():
+        if column not in frame.columns:
+            values[column] = np.full(len(frame), 30.0)  # Hanya "days" yang opsional
+            continue
+        text = frame[column].astype(str).str.strip().str.replace(",", ".", regex=False)
+        number = pd.to_numeric(text, errors="coerce").to_numpy(dtype=np.float64)
+        not_number = np.isnan(number)
+        report(not_number, column, "bukan angka")
+        out_of_range = ~not_number & ((number <= low if column == "power" else number < low) | (number > high))
+        report(out_of_range, column, message)
+        values[column] = number
+
+    errors = (pd.concat(problems, ignore_index=True).sort_values("Baris", kind="stable")
+              if problems else pd.DataFrame(columns=["Baris", "Kolom", "Nilai", "Masalah"]))
+    ok = ~np.isin(rows, errors["Baris"].to_numpy())
+
+    valid = pd.DataFrame({
+        "name": names.to_numpy()[ok],
+        "category": categories.to_numpy()[ok],
+        "power": values["power"][ok],
+        "hours": values["hours"][ok],
+        "days": values["days"][ok],
+    })
+    valid["energy"] = valid["power"] * valid["hours"] * valid["days"] / 1000
+    valid["cost"] = 0.0
+    return valid, errors.reset_index(drop=True)
@@ -0,0 +1,216 @@
+"""Tabel perangkat kolumnar dengan agregat (total, rata-rata, per kategori) yang di-cache"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+NUMERIC_FIELDS = ("power", "hours", "days", "energy", "cost")
+TEXT_FIELDS = ("name", "category")
+DEFAULT_CATEGORY = "Lainnya"
+
+
+def _plain(value):
+    """Nilai numpy -> angka Python biasa (int jika bulat) supaya tampilan tetap rapi"""
+    value = value.item()
+    return int(value) if float(value).is_integer() else value
+
+
+class DeviceTable:
+    """Inventaris perangkat, satu array per kolom
+
+    Agregat di-update inkremental saat perangkat ditambah, diubah atau dihapus,
+    sehingga total/rata-rata/per kategori bisa dibaca O(1) di setiap rerun.
+    """
+
+    def __init__(self, devices=(), capacity=16):
+        self.version = 0  # Naik setiap kali isi tabel berubah
+        self.on_change = None  # callback(op, args) setelah setiap perubahan (untuk journal persistensi)
+        self._frame = None  # (version, DataFrame) hasil to_frame terakhir
+        self._size = 0
+        self._columns = {field: np.zeros(capacity, dtype=np.float64) for field in NUMERIC_FIELDS}
+        self._columns.update({field: np.empty(capacity, dtype=object) for field in TEXT_FIELDS})
+        self._reset_aggregates()
+        self.extend(devices)
+
+    # ---------- agregat ----------
+    def _reset_aggregates(self):
+        self._sums = dict.fromkeys(NUMERIC_FIELDS, 0.0)
+        self._category_sums = {}  # category -> {"count": n, field: total}
+
+    def _add_to_aggregates(self, row, sign):
+        category_sums = self._category_sums.setdefault(
+            row["category"], dict(dict.fromkeys(NUMERIC_FIELDS, 0.0), count=0)
+        )
+        category_sums["count"] += sign
+        for field in NUMERIC_FIELDS:
+            self._sums[field] += sign * row[field]
+            category_sums[field] += sign * row[field]
+        if category_sums["count"] == 0:
+            del self._category_sums[row["category"]]
+
+    def total(self, field):
+        return self._sums[field]
+
+    def mean(self, field):
+        return self._sums[field] / self._size if self._size else 0.0
+
+    def category_totals(self):
+        """Dict kategori -> {"count", "power", "hours", "days", "energy", "cost"}"""
+        return {category: dict(sums) for category, sums in self._category_sums.items()}
+
+    def share(self, index, field="energy"):
+        """Porsi satu perangkat terhadap total (0-1)"""
+        total = self._sums[field]
+        return self._columns[field][index] / total if total > 0 else 0.0
+
+    # ---------- perubahan data ----------
+    def _normalize(self, device):
+        row = {field: float(device.get(field, 0) or 0) for field in NUMERIC_FIELDS}
+        row["name"] = str(device.get("name", ""))
+        row["category"] = device.get("category") or DEFAULT_CATEGORY
+        return row
+
+    def _grow(self, needed):
+        capacity = len(self._columns["power"])
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for field, column in self._columns.items():
+            grown = np.empty(new_capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[field] = grown
+
+    def _write(self, index, row):
+        for field in NUMERIC_FIELDS + TEXT_FIELDS:
+            self._columns[field][index] = row[field]
+
+    def append(self, device):
+        row = self._normalize(device)
+        self._grow(self._size + 1)
+        self._write(self._size, row)
+        self._size += 1
+        self._add_to_aggregates(row, +1)
+        self.version += 1
+        self._changed("append", row)
+
+    def extend(self, devices):
+        for device in devices:
+            self.append(device)
+
+    def extend_frame(self, frame):
+        """Tambah banyak perangkat sekaligus dari DataFrame berkolom tabel ini (mis. hasil import)"""
+        count = len(frame)
+        if not count:
+            return
+        self._grow(self._size + count)
+        for field in NUMERIC_FIELDS:
+            self._columns[field][self._size:self._size + count] = frame[field].to_numpy(dtype=np.float64)
+        for field in TEXT_FIELDS:
+            self._columns[field][self._size:self._size + count] = frame[field].astype(str).to_numpy()
+        self._size += count
+        self._rebuild_aggregates()
+        self.version += 1
+        self._changed("extend", count)
+
+    def update(self, index, changes):
+        """Ubah sebagian field satu perangkat"""
+        old_row = self._row(index)
+        new_row = self._normalize(dict(old_row, **changes))
+        self._add_to_aggregates(old_row, -1)
+        self._write(index, new_row)
+        self._add_to_aggregates(new_row, +1)
+        self.version += 1
+        self._changed("update", index, new_row)
+
+    def set_column(self, field, values):
+        """Ganti satu kolom angka sekaligus (mis. reprice semua biaya), agregat dihitung ulang vectorized"""
+        self._columns[field][:self._size] = values
+        self._rebuild_aggregates()
+        self.version += 1
+        self._changed("set_column", field)
+
+    def _rebuild_aggregates(self):
+        self._reset_aggregates()
+        if not self._size:
+            return
+        categories, inverse = np.unique(self.column("category").astype(str), return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(categories))
+        for field in NUMERIC_FIELDS:
+            values = self.column(field)
+            self._sums[field] = float(values.sum())
+            per_category = np.bincount(inverse, weights=values, minlength=len(categories))
+            for category, total in zip(categories, per_category):
+                self._category_sums.setdefault(category, {"count": 0})[field] = float(total)
+        for category, count in zip(categories, counts):
+            self._category_sums[category]["count"] = int(count)
+
+    def pop(self, index):
+        row = self[index]
+        index %= self._size
+        old_row = self._row(index)
+        for column in self._columns.values():
+            column[index:self._size - 1] = column[index + 1:self._size]
+        self._size -= 1
+        self._add_to_aggregates(old_row, -1)
+        if self._size == 0:
+            self._reset_aggregates()  # Hindari sisa pembulatan float
+        self.version += 1
+        self._changed("pop", index)
+        return row
+
+    def clear(self):
+        self._size = 0
+        self._reset_aggregates()
+        self.version += 1
+        self._changed("clear")
+
+    def copy(self):
+        """Salinan independen untuk copy-on-write (callback on_change tidak ikut disalin)"""
+        clone = copy.copy(self)
+        clone.on_change = None
+        clone._columns = {field: values.copy() for field, values in self._columns.items()}
+        clone._sums = dict(self._sums)
+        clone._category_sums = {category: dict(sums) for category, sums in self._category_sums.items()}
+        return clone
+
+    def _changed(self, op, *args):
+        if self.on_change is not None:
+            self.on_change(op, args)
+
+    # ---------- akses data ----------
+    def __len__(self):
+        return self._size
+
+    def _row(self, index):
+        return {field: self._columns[field][index] for field in NUMERIC_FIELDS + TEXT_FIELDS}
+
+    def __getitem__(self, index):
+        if not -self._size <= index < self._size:
+            raise IndexError("device index out of range")
+        index %= self._size
+        row = {field: self._columns[field][index] for field in TEXT_FIELDS}
+        row.update({field: _plain(self._columns[field][index]) for field in NUMERIC_FIELDS})
+        return row
+
+    def __iter__(self):
+        for index in range(self._size):
+            yield self[index]
+
+    def column(self, field):
+        """View read-only satu kolom"""
+        view = self._columns[field][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def to_frame(self):
+        """DataFrame perangkat, dibangun sekali per versi dan dipakai bersama semua tab
+
+        Frame yang dikembalikan di-share, jangan diubah in-place.
+        """
+        if self._frame is None or self._frame[0] != self.version:
+            frame = pd.DataFrame({
+                field: self.column(field)
+                for field in ("name", "category", "power", "hours", "days", "energy", "cost")
+            })
+            self._frame = (self.version, frame)
+        return self._frame[1]
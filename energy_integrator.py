@@ -0,0 +1,162 @@
+"""Integrasi energi inkremental (trapezoid) dari data daya live"""
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+from config import ENERGY_HOURLY_RETENTION_HOURS, ENERGY_MAX_GAP_MS, RELAY_POWER_W
+from sensor_buffer import to_local_datetime
+
+HOUR_MS = 3600 * 1000
+PERIOD_FORMATS = {
+    "hour": "%Y-%m-%d %H:00",
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m",
+}
+CHANNELS = ("total", "relay1", "relay2")
+PERIODS_KEPT = 2  # Total hari/bulan yang disimpan per device: periode berjalan + sebelumnya
+
+
+def period_keys(timestamp_ms):
+    """Key jam/hari/bulan (waktu lokal) untuk satu timestamp"""
+    moment = datetime.fromtimestamp(timestamp_ms / 1000)
+    return {period: moment.strftime(fmt) for period, fmt in PERIOD_FORMATS.items()}
+
+
+def period_starts(timestamp_ms):
+    """Awal hari dan bulan berjalan (epoch milidetik) untuk satu timestamp"""
+    moment = datetime.fromtimestamp(timestamp_ms / 1000)
+    day_start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_start = day_start.replace(day=1)
+    return {
+        "day": int(day_start.timestamp() * 1000),
+        "month": int(month_start.timestamp() * 1000),
+    }
+
+
+class EnergyIntegrator:
+    """Ubah daya berurutan menjadi kWh, O(1) per sample
+
+    Total berjalan disimpan per device, per channel (total/relay1/relay2) dan
+    per periode (jam/hari/bulan). Jeda lebih dari `max_gap_ms` tidak
+    diintegrasikan karena daya selama jeda tidak diketahui.
+    """
+
+    def __init__(self, max_gap_ms=ENERGY_MAX_GAP_MS):
+        self.max_gap_ms = max_gap_ms
+        self._last = {}    # device_id -> (timestamp_ms, {channel: watt})
+        self._totals = {}  # (device_id, period, key) -> {channel: kWh}
+        self._hour_keys = deque()  # (timestamp_ms, device_id, key) untuk membuang data jam lama
+        self._period_keys = {}     # (device_id, "day"/"month") -> key yang masih disimpan, urut
+
+    @staticmethod
+    def channel_power(entry):
+        return {
+            "total": entry.get("power", 0),
+            "relay1": entry.get("relay1", 0) * RELAY_POWER_W,
+            "relay2": entry.get("relay2", 0) * RELAY_POWER_W,
+        }
+
+    def add(self, entry):
+        """Integrasikan satu entry dan isi `entry["energy"]` dengan kWh sejak entry sebelumnya"""
+        device_id = entry["device_id"]
+        timestamp = entry["timestamp"]
+        power = self.channel_power(entry)
+        previous = self._last.get(device_id)
+
+        energy = 0.0
+        if previous is not None:
+            prev_timestamp, prev_power = previous
+            if timestamp <= prev_timestamp:
+                # Data terlambat/duplikat: abaikan, jangan mundurkan titik integrasi
+                entry["energy"] = 0.0
+                return 0.0
+            if timestamp - prev_timestamp <= self.max_gap_ms:
+                energy = self._integrate(device_id, prev_timestamp, prev_power, timestamp, power)
+
+        self._last[device_id] = (timestamp, power)
+        entry["energy"] = energy
+        return energy
+
+    def _integrate(self, device_id, t0, p0, t1, p1):
+        # Pecah interval di batas jam (maksimal satu kali karena max_gap <= 1 jam)
+        boundary = (t0 // HOUR_MS + 1) * HOUR_MS
+        if boundary < t1:
+            ratio = (boundary - t0) / (t1 - t0)
+            p_mid = {channel: p0[channel] + (p1[channel] - p0[channel]) * ratio for channel in CHANNELS}
+            return (self._accumulate(device_id, t0, p0, boundary, p_mid)
+                    + self._accumulate(device_id, boundary, p_mid, t1, p1))
+        return self._accumulate(device_id, t0, p0, t1, p1)
+
+    def _accumulate(self, device_id, t0, p0, t1, p1):
+        hours = (t1 - t0) / HOUR_MS
+        kwh = {channel: (p0[channel] + p1[channel]) / 2 * hours / 1000 for channel in CHANNELS}
+
+        for period, key in period_keys(t0).items():
+            bucket = self._totals.get((device_id, period, key))
+            if bucket is None:
+                bucket = self._totals[(device_id, period, key)] = dict.fromkeys(CHANNELS, 0.0)
+                if period == "hour":
+                    self._track_hour(t0, device_id, key)
+                else:
+                    self._track_period(device_id, period, key)
+            for channel in CHANNELS:
+                bucket[channel] += kwh[channel]
+
+        return kwh["total"]
+
+    def _track_hour(self, timestamp, device_id, key):
+        self._hour_keys.append((timestamp, device_id, key))
+        cutoff = timestamp - ENERGY_HOURLY_RETENTION_HOURS * HOUR_MS
+        while self._hour_keys and self._hour_keys[0][0] < cutoff:
+            _, old_device, old_key = self._hour_keys.popleft()
+            self._totals.pop((old_device, "hour", old_key), None)
+
+    def _track_period(self, device_id, period, key):
+        # Key hari/bulan bisa diurutkan sebagai string; yang paling lama dibuang lebih dulu
+        keys = self._period_keys.setdefault((device_id, period), [])
+        keys.append(key)
+        keys.sort()
+        while len(keys) > PERIODS_KEPT:
+            self._totals.pop((device_id, period, keys.pop(0)), None)
+
+    def seed(self, device_id, period, key, kwh):
+        """Isi total awal (mis. dari store setelah restart) untuk channel total"""
+        bucket = self._totals.get((device_id, period, key))
+        if bucket is None:
+            bucket = self._totals[(device_id, period, key)] = dict.fromkeys(CHANNELS, 0.0)
+            if period != "hour":
+                self._track_period(device_id, period, key)
+        bucket["total"] += kwh
+
+    def add_history(self, device_id, timestamps_ms, kwh):
+        """Tambahkan kWh reading lama (mis. arsip yang diimport) ke total periode yang sedang disimpan
+
+        Periode yang tidak disimpan dilewati: yang lebih tua sudah dibuang
+        retensi, dan total hari/bulan device yang belum pernah mengirim data
+        diambil dari store saat reading pertamanya masuk.
+        """
+        if not len(timestamps_ms):
+            return
+        # Satu kali period_keys per jam lokal, bukan per reading
+        frame = pd.DataFrame({"timestamp": timestamps_ms, "kwh": kwh})
+        hours = to_local_datetime(frame["timestamp"].to_numpy()).floor("h")
+        hourly = frame.groupby(hours).agg(timestamp=("timestamp", "first"), kwh=("kwh", "sum"))
+        for timestamp, kwh_hour in hourly.itertuples(index=False):
+            for period, key in period_keys(int(timestamp)).items():
+                bucket = self._totals.get((device_id, period, key))
+                if bucket is not None:
+                    bucket["total"] += kwh_hour
+
+    def knows(self, device_id):
+        return device_id in self._last
+
+    def totals(self, device_id, period, key):
+        return dict(self._totals.get((device_id, period, key), dict.fromkeys(CHANNELS, 0.0)))
+
+    def current(self, device_id, timestamp_ms):
+        """Total jam/hari/bulan yang berjalan untuk `timestamp_ms`"""
+        return {
+            period: self.totals(device_id, period, key)
+            for period, key in period_keys(timestamp_ms).items()
+        }
@@ -0,0 +1,67 @@
+"""HTTP client bersama untuk semua request ke ESP32 (connection pool + keep-alive)"""
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import ESP32_POOL_MAX_DEVICES, ESP32_POOL_MAXSIZE, ESP32_REQUEST_TIMEOUT
+
+
+class ESP32Client:
+    """Satu requests.Session per device supaya koneksi TCP dipakai ulang"""
+
+    def __init__(self, pool_maxsize=ESP32_POOL_MAXSIZE, max_devices=ESP32_POOL_MAX_DEVICES):
+        self.pool_maxsize = pool_maxsize
+        self.max_devices = max_devices
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # base_url -> Session (LRU)
+
+    def _new_session(self):
+        session = requests.Session()
+        # pool_block=True: request menunggu koneksi bebas, tidak membuka socket baru ke board
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize,
+                              pool_block=True, max_retries=0)
+        session.mount("http://", adapter)
+        session.headers["Connection"] = "keep-alive"
+        return session
+
+    def _session(self, base_url):
+        with self._lock:
+            session = self._sessions.get(base_url)
+            if session is None:
+                session = self._sessions[base_url] = self._new_session()
+                # Batasi jumlah device yang koneksinya disimpan
+                while len(self._sessions) > self.max_devices:
+                    _, evicted = self._sessions.popitem(last=False)
+                    evicted.close()
+            else:
+                self._sessions.move_to_end(base_url)
+            return session
+
+    def get(self, base_url, path, params=None, timeout=ESP32_REQUEST_TIMEOUT):
+        return self._session(base_url).get(f"{base_url}{path}", params=params, timeout=timeout)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Client per process - dipakai ulang lintas rerun dan session Streamlit"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ESP32Client()
+        return _client
+
+
+def esp32_get(ip, port, path, params=None, timeout=ESP32_REQUEST_TIMEOUT):
+    """Shortcut GET ke http://ip:port/path melalui client bersama"""
+    return get_client().get(f"http://{ip}:{port}", path, params=params, timeout=timeout)
@@ -0,0 +1,267 @@
+"""Simulator ESP32 lokal (/data dan /relay) dan load generator untuk benchmark
+
+Contoh:
+    python esp32_simulator.py --devices 1 --base-port 8080 --serve
+    python esp32_simulator.py --devices 2000 --latency 20 --jitter 10 --failure-rate 0.01 --bench 30
+
+Ribuan node berarti ribuan socket; naikkan `ulimit -n` jika muncul "Too many open files".
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from config import LDR_DARK_THRESHOLD, TEMP_HOT_THRESHOLD
+
+REASONS = {200: "OK", 404: "Not Found", 500: "Internal Server Error"}
+
+
+class SimulatedNode:
+    """Satu board ESP32 palsu dengan API yang sama: /data dan /relay?r1=&r2="""
+
+    def __init__(self, device_id, port, latency_ms=0, jitter_ms=0, failure_rate=0.0, seed=None):
+        self.device_id = device_id
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+
+        self.ldr = self.rng.randint(0, 1023)
+        self.suhu = round(self.rng.uniform(24, 32), 1)
+        self.relay1 = 0
+        self.relay2 = 0
+        self.requests = 0
+        self.writers = set()  # Koneksi yang sedang terbuka, ditutup saat simulator berhenti
+
+    def sensor_payload(self):
+        # Random walk supaya data terlihat hidup
+        self.ldr = min(1023, max(0, self.ldr + self.rng.randint(-20, 20)))
+        self.suhu = round(min(40.0, max(18.0, self.suhu + self.rng.uniform(-0.2, 0.2))), 1)
+        return {
+            "ldr": self.ldr,
+            "statusLDR": "Gelap" if self.ldr < LDR_DARK_THRESHOLD else "Terang",
+            "suhu": self.suhu,
+            "statusSuhu": "Panas" if self.suhu >= TEMP_HOT_THRESHOLD else "Normal",
+            "relay1": self.relay1,
+            "relay2": self.relay2,
+        }
+
+    def route(self, target):
+        url = urlsplit(target)
+        if url.path == "/data":
+            return 200, "application/json", json.dumps(self.sensor_payload()).encode()
+        if url.path == "/relay":
+            query = parse_qs(url.query)
+            if "r1" in query:
+                self.relay1 = 1 if query["r1"][0] == "1" else 0
+            if "r2" in query:
+                self.relay2 = 1 if query["r2"][0] == "1" else 0
+            return 200, "text/plain", f"Relay1: {self.relay1}, Relay2: {self.relay2}".encode()
+        return 404, "text/plain", b"Not Found"
+
+    async def handle(self, reader, writer):
+        self.writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                _, target, version = request_line.decode("latin-1").split()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                self.requests += 1
+
+                delay = self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+                if delay > 0:
+                    await asyncio.sleep(delay / 1000)
+
+                if self.rng.random() < self.failure_rate:
+                    # Setengah kegagalan berupa koneksi putus, setengah HTTP 500
+                    if self.rng.random() < 0.5:
+                        break
+                    status, content_type, body = 500, "text/plain", b"Internal Server Error"
+                else:
+                    status, content_type, body = self.route(target)
+
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+
+class ESP32Simulator:
+    """Sekumpulan SimulatedNode, satu port per node, dalam satu event loop"""
+
+    def __init__(self, count, base_port=20000, host="127.0.0.1", latency_ms=0,
+                 jitter_ms=0, failure_rate=0.0):
+        self.host = host
+        self.nodes = [
+            SimulatedNode(f"SIM_{i:05d}", base_port + i, latency_ms, jitter_ms, failure_rate, seed=i)
+            for i in range(count)
+        ]
+        self._servers = []
+        self._loop = None
+
+    async def start(self):
+        for node in self.nodes:
+            server = await asyncio.start_server(node.handle, self.host, node.port, backlog=64)
+            self._servers.append(server)
+
+    def run_in_thread(self):
+        """Jalankan simulator di thread background, return setelah semua port siap"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="esp32-simulator", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    async def _shutdown(self):
+        for server in self._servers:
+            server.close()
+        # Tutup juga koneksi keep-alive yang masih terbuka, handler akan selesai sendiri
+        for node in self.nodes:
+            for writer in list(node.writers):
+                writer.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=5)
+
+    def stop(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+
+    def devices(self):
+        """Entry registry (format ESP32_DEVICES) untuk semua node"""
+        return [
+            {"device_id": node.device_id, "ip": self.host, "port": node.port, "location": "Simulator"}
+            for node in self.nodes
+        ]
+
+
+def bench_polling(simulator, duration, concurrency):
+    """Throughput ingestion: berapa reading/detik yang diterima collector dari semua node"""
+    from fleet_poller import DeviceRegistry
+    from sensor_collector import SensorCollector
+
+    registry = DeviceRegistry(simulator.devices())
+    collector = SensorCollector(registry=registry, concurrency=concurrency)
+    collector.interval = 1
+    collector.start()
+
+    start = time.perf_counter()
+    time.sleep(duration)
+    readings = collector.entries_since(0)[0]
+    elapsed = time.perf_counter() - start
+    collector.stop()
+
+    offline = sum(1 for device in registry.all() if device.failures)
+    print(f"Polling  : {readings:,} reading dalam {elapsed:.1f} s = {readings / elapsed:,.0f} reading/s "
+          f"({len(registry)} node, {offline} sedang backoff)")
+
+
+def bench_relay(simulator, count):
+    """Latency round-trip perintah relay melalui client ESP32 bersama"""
+    import numpy as np
+
+    from esp32_client import esp32_get
+
+    rng = random.Random(0)
+    latencies = []
+    failures = 0
+    for _ in range(count):
+        node = rng.choice(simulator.nodes)
+        start = time.perf_counter()
+        try:
+            response = esp32_get(simulator.host, node.port, "/relay", {"r1": rng.randint(0, 1)})
+            if response.status_code != 200:
+                failures += 1
+                continue
+        except Exception:
+            failures += 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"Relay RTT: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms "
+              f"({len(latencies)} sukses, {failures} gagal)")
+    else:
+        print(f"Relay RTT: semua {failures} perintah gagal")
+
+
+def raise_open_file_limit():
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulator ESP32 dan load generator")
+    parser.add_argument("--devices", type=int, default=1, help="Jumlah node simulasi")
+    parser.add_argument("--base-port", type=int, default=20000, help="Port node pertama")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--latency", type=float, default=0, help="Latency rata-rata (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="Jitter latency +/- (ms)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Peluang request gagal (0-1)")
+    parser.add_argument("--serve", action="store_true", help="Hanya jalankan simulator")
+    parser.add_argument("--bench", type=float, default=10, help="Durasi benchmark polling (detik)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Batas request concurrent poller")
+    parser.add_argument("--relay-commands", type=int, default=500, help="Jumlah perintah relay untuk benchmark")
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+    simulator = ESP32Simulator(args.devices, args.base_port, args.host, args.latency,
+                               args.jitter, args.failure_rate)
+
+    if args.serve:
+        print(f"🛰️ {args.devices} node simulasi di {args.host}:{args.base_port}-{args.base_port + args.devices - 1}")
+        asyncio.run(_serve_forever(simulator))
+        return
+
+    simulator.run_in_thread()
+    print(f"🛰️ {args.devices} node siap (latency {args.latency}±{args.jitter} ms, gagal {args.failure_rate:.1%})")
+    bench_polling(simulator, args.bench, args.concurrency)
+    bench_relay(simulator, args.relay_commands)
+    simulator.stop()
+
+
+async def _serve_forever(simulator):
+    await simulator.start()
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
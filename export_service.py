@@ -0,0 +1,193 @@
+"""Export lazy (CSV, Parquet, Arrow IPC): file hanya dibuat saat diminta, per chunk, dan di-cache per versi data
+
+Arsip Parquet/Arrow juga bisa diimport kembali ke SensorStore per record batch.
+"""
+import io
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import DEVICE_ID, EXPORT_CHUNK_MS, EXPORT_CHUNK_ROWS, EXPORT_COMPRESSION
+from sensor_buffer import LOCAL_TZ, to_local_datetime
+from sensor_store import READING_COLUMNS
+
+# pyarrow ikut terinstall bersama streamlit, tapi format kolumnar tetap opsional
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# format -> (label, ekstensi, MIME)
+EXPORT_FORMATS = {
+    "csv": ("CSV", "csv", "text/csv"),
+    "parquet": ("Parquet", "parquet", "application/vnd.apache.parquet"),
+    "arrow": ("Arrow IPC", "arrow", "application/vnd.apache.arrow.file"),
+}
+ARCHIVE_TYPES = ("parquet", "arrow", "feather", "csv")
+
+
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt == "csv" or PYARROW_AVAILABLE]
+
+
+def frame_chunks(frame, rows=EXPORT_CHUNK_ROWS):
+    """Potong DataFrame menjadi beberapa chunk baris"""
+    for start in range(0, max(len(frame), 1), rows):
+        yield frame.iloc[start:start + rows]
+
+
+def store_chunks(store, device_id, start_ms, end_ms, chunk_ms=EXPORT_CHUNK_MS):
+    """Baca reading dari SensorStore per jendela waktu, supaya rentang panjang tidak dimuat sekaligus
+
+    Setiap chunk punya kolom yang sama (READING_COLUMNS tanpa device_id), karena
+    writer mengambil header/schema dari chunk pertama.
+    """
+    columns = list(READING_COLUMNS[1:])
+    for window_start in range(start_ms, end_ms, chunk_ms):
+        chunk = store.query(device_id, window_start, min(window_start + chunk_ms, end_ms))
+        if not chunk.empty:
+            chunk = chunk.reindex(columns=columns, fill_value="")
+            chunk["timestamp"] = to_local_datetime(chunk["timestamp"].to_numpy())
+            yield chunk
+
+
+def write_csv(chunks):
+    """Tulis chunk DataFrame berurutan ke satu CSV (header dari chunk pertama)"""
+    buffer = io.BytesIO()
+    text = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+    for index, chunk in enumerate(chunks):
+        chunk.to_csv(text, header=index == 0, index=False)
+    text.flush()
+    text.detach()
+    return buffer.getvalue()
+
+
+def _record_batches(chunks):
+    """Chunk DataFrame -> RecordBatch dengan schema dari chunk pertama"""
+    schema = None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+        schema = table.schema
+        yield from table.to_batches()
+
+
+def write_parquet(chunks):
+    """Parquet terkompresi, satu row group per chunk"""
+    buffer = io.BytesIO()
+    writer = None
+    for batch in _record_batches(chunks):
+        if writer is None:
+            writer = pq.ParquetWriter(buffer, batch.schema, compression=EXPORT_COMPRESSION)
+        writer.write_batch(batch)
+    if writer is not None:
+        writer.close()
+    return buffer.getvalue()
+
+
+def write_arrow(chunks):
+    """Arrow IPC file (Feather v2) terkompresi, bisa dibaca ulang tanpa parsing"""
+    sink = pa.BufferOutputStream()
+    writer = None
+    options = pa.ipc.IpcWriteOptions(compression=EXPORT_COMPRESSION)
+    for batch in _record_batches(chunks):
+        if writer is None:
+            writer = pa.ipc.new_file(sink, batch.schema, options=options)
+        writer.write_batch(batch)
+    if writer is not None:
+        writer.close()
+    return sink.getvalue().to_pybytes()
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet, "arrow": write_arrow}
+
+
+def read_archive(data, file_name):
+    """Record batch dari arsip Parquet / Arrow IPC / CSV, dibaca langsung dari buffer upload"""
+    source = pa.BufferReader(data)  # Tanpa copy: batch Arrow menunjuk ke buffer yang sama
+    extension = file_name.rsplit(".", 1)[-1].lower()
+    if extension == "parquet":
+        yield from pq.ParquetFile(source).iter_batches(batch_size=EXPORT_CHUNK_ROWS)
+    elif extension in ("arrow", "feather"):
+        reader = pa.ipc.open_file(source)
+        for index in range(reader.num_record_batches):
+            yield reader.get_batch(index)
+    elif extension == "csv":
+        yield from pa_csv.open_csv(source)
+    else:
+        raise ValueError(f"Format arsip tidak dikenal: {file_name}")
+
+
+def _epoch_ms(column):
+    """Kolom timestamp Arrow (epoch ms, atau datetime lokal/UTC hasil export) -> int64 epoch ms"""
+    if pa.types.is_timestamp(column.type):
+        moments = pd.DatetimeIndex(column.to_pandas())
+        if moments.tz is None:
+            moments = moments.tz_localize(LOCAL_TZ)  # Export memakai waktu lokal tanpa timezone
+        return moments.as_unit("ms").asi8
+    return column.to_numpy(zero_copy_only=False).astype(np.int64, copy=False)
+
+
+def batch_columns(batch, device_id=DEVICE_ID):
+    """RecordBatch -> kolom NumPy sesuai READING_COLUMNS (kolom angka tanpa null dibaca tanpa copy)"""
+    names = set(batch.schema.names)
+    if "timestamp" not in names:
+        raise ValueError("Arsip tidak memiliki kolom timestamp")
+    columns = {}
+    for column_name in READING_COLUMNS:
+        if column_name == "timestamp":
+            columns[column_name] = _epoch_ms(batch.column("timestamp"))
+        elif column_name in names:
+            columns[column_name] = batch.column(column_name).to_numpy(zero_copy_only=False)
+    if "device_id" not in columns:
+        columns["device_id"] = np.full(batch.num_rows, device_id, dtype=object)
+    return columns
+
+
+def import_archive(store, data, file_name, device_id=DEVICE_ID, on_written=None):
+    """Import arsip ke SensorStore per batch; return (baris dibaca, baris baru ditulis)
+
+    `on_written` dipanggil dengan DataFrame baris baru setiap batch (mis.
+    SensorCollector.add_history supaya rollup dan total energi ikut terisi).
+    """
+    read = written = 0
+    for batch in read_archive(data, file_name):
+        read += batch.num_rows
+        rows = store.import_columns(batch_columns(batch, device_id))
+        written += len(rows)
+        if on_written is not None and len(rows):
+            on_written(rows)
+    return read, written
+
+
+class ExportService:
+    """Cache hasil export per nama; dibuat ulang hanya jika versi datanya berubah
+
+    Dipakai bersama semua session, jadi `version` harus menunjuk data yang
+    sama untuk siapa pun yang memintanya.
+    """
+
+    def __init__(self):
+        self._exports = {}  # (nama, format) -> (versi, bytes)
+        self._lock = threading.Lock()
+
+    def get(self, name, version, fmt="csv"):
+        with self._lock:
+            cached = self._exports.get((name, fmt))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        return None
+
+    def build(self, name, version, chunks, fmt="csv"):
+        # Build di luar lock; jika dua session build bersamaan, hasil terakhir yang disimpan
+        data = WRITERS[fmt](chunks)
+        with self._lock:
+            self._exports[(name, fmt)] = (version, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._exports.clear()
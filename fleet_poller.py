@@ -0,0 +1,162 @@
+"""Registry perangkat ESP32 dan poller async untuk banyak node sekaligus"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+
+from config import (
+    ESP32_DEVICES,
+    ESP32_REQUEST_TIMEOUT,
+    FLEET_BACKOFF_MAX,
+    FLEET_MAX_CONCURRENCY,
+)
+from esp32_client import get_client
+
+
+@dataclass
+class ESP32Device:
+    device_id: str
+    ip: str
+    port: int = 80
+    location: str = ""
+
+    # Status runtime polling
+    failures: int = 0
+    next_poll: float = 0.0
+    last_success: Optional[float] = None
+    last_error: Optional[str] = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.ip}:{self.port}"
+
+    @property
+    def online(self):
+        return self.failures == 0 and self.last_success is not None
+
+
+class DeviceRegistry:
+    """Daftar semua board ESP32 beserta status backoff masing-masing"""
+
+    def __init__(self, devices=ESP32_DEVICES):
+        self._lock = threading.Lock()
+        self._devices = {}
+        for device in devices:
+            self.upsert(**device)
+
+    def upsert(self, device_id, ip, port=80, location=""):
+        with self._lock:
+            device = self._devices.get(device_id)
+            if device is None:
+                self._devices[device_id] = ESP32Device(device_id, ip, port, location)
+            elif (device.ip, device.port) != (ip, port):
+                # Alamat berubah: reset status supaya langsung dipoll ulang
+                self._devices[device_id] = ESP32Device(device_id, ip, port, location or device.location)
+            elif location:
+                device.location = location
+
+    def remove(self, device_id):
+        with self._lock:
+            self._devices.pop(device_id, None)
+
+    def get(self, device_id):
+        with self._lock:
+            return self._devices.get(device_id)
+
+    def all(self):
+        with self._lock:
+            return list(self._devices.values())
+
+    def reset_schedule(self, device_id=None):
+        """Jadwalkan ulang polling segera (abaikan backoff)"""
+        with self._lock:
+            devices = [self._devices.get(device_id)] if device_id else self._devices.values()
+            for device in devices:
+                if device is not None:
+                    device.next_poll = 0.0
+
+    def due(self, now):
+        """Device yang sudah waktunya dipoll (melewati jadwal/backoff)"""
+        with self._lock:
+            return [d for d in self._devices.values() if d.next_poll <= now]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._devices)
+
+    def record_success(self, device, interval):
+        now = time.time()
+        with self._lock:
+            device.failures = 0
+            device.last_success = now
+            device.last_error = None
+            device.next_poll = now + interval
+
+    def record_failure(self, device, interval, error):
+        """Exponential backoff: interval * 2^failures, dibatasi FLEET_BACKOFF_MAX"""
+        with self._lock:
+            device.failures += 1
+            device.last_error = error
+            delay = min(interval * (2 ** device.failures), FLEET_BACKOFF_MAX)
+            device.next_poll = time.time() + delay
+
+
+class FleetPoller:
+    """Fetch /data dari banyak node secara concurrent dengan batas koneksi"""
+
+    def __init__(self, registry, on_reading, concurrency=FLEET_MAX_CONCURRENCY,
+                 timeout=ESP32_REQUEST_TIMEOUT):
+        self.registry = registry
+        self.on_reading = on_reading
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="esp32-fleet")
+
+    def _fetch(self, device):
+        response = get_client().get(device.base_url, "/data", timeout=self.timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return response.json()
+
+    async def _poll_device(self, device, semaphore, interval):
+        loop = asyncio.get_running_loop()
+        async with semaphore:
+            try:
+                esp32_data = await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, self._fetch, device),
+                    timeout=self.timeout + 1
+                )
+            except requests.exceptions.RequestException as e:
+                self.registry.record_failure(device, interval, f"Tidak dapat terhubung: {str(e)}")
+                return
+            except asyncio.TimeoutError:
+                self.registry.record_failure(device, interval, "Timeout")
+                return
+            except Exception as e:
+                self.registry.record_failure(device, interval, f"Error: {str(e)}")
+                return
+
+        # Tag reading dengan device ID sebelum diproses
+        esp32_data["device_id"] = device.device_id
+        try:
+            self.on_reading(esp32_data)
+        except Exception as e:
+            self.registry.record_failure(device, interval, f"Error processing sensor data: {str(e)}")
+            return
+        self.registry.record_success(device, interval)
+
+    async def poll_once(self, interval):
+        """Poll semua device yang sudah jatuh tempo, maksimal `concurrency` sekaligus"""
+        devices = self.registry.due(time.time())
+        if not devices:
+            return 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._poll_device(d, semaphore, interval) for d in devices))
+        return len(devices)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
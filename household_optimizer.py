@@ -0,0 +1,92 @@
+"""Optimasi seluruh rumah: pilih pengurangan jam pemakaian untuk mencapai target kWh
+
+Masalahnya adalah fractional knapsack: setiap perangkat punya kapasitas
+pengurangan (jam sekarang - jam minimum) dengan "biaya kenyamanan" per kWh
+(prioritas / kWh per jam). Greedy dari rasio termurah optimal untuk kasus
+linear ini dan seluruhnya dihitung vectorized (argsort + cumsum), O(n log n).
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from config import OPT_CATEGORY_PRIORITY, OPT_DEFAULT_PRIORITY, OPT_MIN_HOURS_RATIO, REC_ALWAYS_ON_EXEMPT
+
+
+@dataclass
+class OptimizationPlan:
+    feasible: bool
+    needed_kwh: float      # kWh/bulan yang harus dihemat untuk mencapai target
+    saved_kwh: float       # kWh/bulan yang dihemat oleh rencana
+    comfort_cost: float    # Total jam x prioritas yang dikorbankan
+    plan: pd.DataFrame     # Perangkat yang dikurangi jamnya, urut dari yang paling "murah"
+
+
+def default_constraints(table):
+    """Batas default per perangkat: jam minimum dan prioritas kenyamanan (1-5)"""
+    names = table.column("name")
+    hours = table.column("hours")
+    min_hours = np.round(hours * OPT_MIN_HOURS_RATIO * 2) / 2
+    for index, name in enumerate(names):
+        if any(keyword in name.lower() for keyword in REC_ALWAYS_ON_EXEMPT):
+            min_hours[index] = hours[index]  # Kulkas dsb. tidak boleh dikurangi
+    priority = np.array([
+        OPT_CATEGORY_PRIORITY.get(category, OPT_DEFAULT_PRIORITY) for category in table.column("category")
+    ])
+    return pd.DataFrame({
+        "name": names,
+        "category": table.column("category"),
+        "hours": hours,
+        "min_hours": min_hours,
+        "priority": priority,
+    })
+
+
+def optimize_hours(table, target_kwh, min_hours=None, priority=None, step=0.5):
+    """Rencana pengurangan jam/hari dengan biaya kenyamanan terkecil agar total <= target
+
+    `min_hours` dan `priority` berupa array sepanjang tabel (default dari
+    `default_constraints`). Pengurangan dibulatkan ke atas ke kelipatan `step` jam.
+    """
+    needed = max(table.total("energy") - target_kwh, 0.0)
+    if needed == 0:
+        empty = pd.DataFrame(columns=["name", "hours", "new_hours", "reduction", "energy_saved"])
+        return OptimizationPlan(True, 0.0, 0.0, 0.0, empty)
+
+    if min_hours is None or priority is None:
+        defaults = default_constraints(table)
+        min_hours = defaults["min_hours"].to_numpy() if min_hours is None else min_hours
+        priority = defaults["priority"].to_numpy() if priority is None else priority
+
+    hours = table.column("hours")
+    kwh_per_hour = table.column("power") * table.column("days") / 1000  # kWh/bulan per 1 jam/hari
+    capacity_hours = np.clip(hours - np.minimum(np.asarray(min_hours, dtype=np.float64), hours), 0, None)
+
+    usable = np.flatnonzero((capacity_hours > 0) & (kwh_per_hour > 0))
+    ratio = np.asarray(priority, dtype=np.float64)[usable] / kwh_per_hour[usable]
+    order = usable[np.argsort(ratio, kind="stable")]
+
+    capacity_kwh = capacity_hours[order] * kwh_per_hour[order]
+    cumulative = np.cumsum(capacity_kwh)
+    last = int(np.searchsorted(cumulative, needed))  # Perangkat terakhir yang perlu dipakai
+    feasible = last < len(order)
+    last = min(last, len(order) - 1)
+
+    reduction = capacity_hours[order[:last + 1]].copy()
+    if feasible:
+        # Perangkat terakhir hanya dikurangi secukupnya (dibulatkan ke atas ke `step`)
+        remaining = needed - (cumulative[last - 1] if last > 0 else 0.0)
+        partial = np.ceil(remaining / kwh_per_hour[order[last]] / step) * step
+        reduction[-1] = min(partial, capacity_hours[order[last]])
+
+    chosen = order[:last + 1]
+    energy_saved = reduction * kwh_per_hour[chosen]
+    plan = pd.DataFrame({
+        "name": table.column("name")[chosen],
+        "hours": hours[chosen],
+        "new_hours": hours[chosen] - reduction,
+        "reduction": reduction,
+        "energy_saved": energy_saved,
+    })
+    comfort_cost = float((reduction * np.asarray(priority, dtype=np.float64)[chosen]).sum())
+    return OptimizationPlan(feasible, needed, float(energy_saved.sum()), comfort_cost, plan)
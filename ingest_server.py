@@ -0,0 +1,158 @@
+"""Server HTTP ringan untuk menerima data push dari ESP32 di path SERVER_URL"""
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+from config import INGEST_BIND_HOST, INGEST_MAX_AGE_S, INGEST_MAX_BODY, INGEST_MAX_FUTURE_S, INGEST_TOKEN, SERVER_URL
+
+INGEST_PATH = urlparse(SERVER_URL).path or "/"
+INGEST_PORT = urlparse(SERVER_URL).port or 80
+
+NUMERIC_FIELDS = ("ldr", "suhu", "relay1", "relay2", "ts")
+NUMERIC_TYPES = (int, float)  # bool sengaja tidak termasuk (type(True) adalah bool, bukan int)
+
+
+def _reject_constant(name):
+    # json.loads menerima NaN/Infinity, yang tidak bisa masuk kolom integer buffer
+    raise ValueError(f"Konstanta JSON tidak valid: {name}")
+
+
+def parse_payload(body):
+    """Decode body JSON; NaN/Infinity ditolak seperti JSON tidak valid"""
+    return json.loads(body, parse_constant=_reject_constant)
+
+
+def validate_readings(payload, now=None):
+    """Validasi batch sekaligus - return (readings valid, daftar error per index)
+
+    Format yang diterima: satu object, list of object, atau
+    {"device_id": "...", "readings": [...]} dengan device_id untuk seluruh batch.
+    Seluruh batch dijadikan satu DataFrame lalu dicek per kolom; setiap index
+    mendapat paling banyak satu error (pengecekan pertama yang gagal).
+    `ts` (epoch detik) harus berada di antara INGEST_MAX_AGE_S yang lalu dan
+    INGEST_MAX_FUTURE_S ke depan dari `now`.
+    """
+    batch_device_id = None
+    if isinstance(payload, dict) and "readings" in payload:
+        batch_device_id = payload.get("device_id")
+        payload = payload["readings"]
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list):
+        return [], [{"index": None, "error": "Payload harus object atau list"}]
+    if not payload:
+        return [], []
+
+    now = time.time() if now is None else now
+    is_object = np.fromiter((isinstance(reading, dict) for reading in payload), dtype=bool, count=len(payload))
+    frame = pd.DataFrame([reading if ok else {} for reading, ok in zip(payload, is_object)], dtype=object)
+    frame = frame.reindex(columns=["device_id", *NUMERIC_FIELDS])  # Field yang tidak ada -> NaN
+
+    errors = pd.Series(None, index=frame.index, dtype=object)
+
+    def report(mask, message):
+        # Hanya index yang belum punya error, supaya urutan pengecekan menentukan pesannya
+        target = mask & errors.isna()
+        errors[target] = message if isinstance(message, str) else message[target]
+
+    report(pd.Series(~is_object, index=frame.index), "Reading harus object")
+
+    device_ids = frame["device_id"].fillna(batch_device_id) if batch_device_id else frame["device_id"]
+    report(device_ids.isna() | device_ids.eq("") | device_ids.eq(0), "device_id wajib diisi")
+
+    # Field yang tidak ada berupa NaN (float, lolos); null, string, bool -> salah tipe.
+    # NaN dari JSON sendiri sudah ditolak parse_payload.
+    numeric = frame[list(NUMERIC_FIELDS)]
+    bad_type = ~numeric.apply(lambda column: column.map(type).isin(NUMERIC_TYPES))
+    bad_rows = bad_type.any(axis=1)
+    if bad_rows.any():
+        names = bad_type[bad_rows].apply(lambda row: ", ".join(row.index[row]), axis=1)
+        report(bad_rows, ("Field harus numerik: " + names).reindex(frame.index))
+
+    ts = pd.to_numeric(frame["ts"].where(~bad_type["ts"]), errors="coerce")
+    report(ts.notna() & ((ts < now - INGEST_MAX_AGE_S) | (ts > now + INGEST_MAX_FUTURE_S)),
+           f"ts di luar rentang ({INGEST_MAX_AGE_S} detik lalu - {INGEST_MAX_FUTURE_S} detik ke depan)")
+
+    valid = [
+        payload[index] if payload[index].get("device_id") else dict(payload[index], device_id=batch_device_id)
+        for index in np.flatnonzero(errors.isna().to_numpy())
+    ]
+    rejected = [{"index": int(index), "error": message} for index, message in errors.dropna().items()]
+    return valid, rejected
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive supaya board bisa kirim batch berikutnya di koneksi yang sama
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self):
+        if not INGEST_TOKEN:
+            return True
+        expected = f"Bearer {INGEST_TOKEN}"
+        return hmac.compare_digest(self.headers.get("Authorization", "").encode(), expected.encode())
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > INGEST_MAX_BODY:
+            self.close_connection = True
+            self._send_json(413, {"error": "Payload terlalu besar"})
+            return
+
+        # Body selalu dibaca dulu supaya koneksi keep-alive tetap sinkron
+        body = self.rfile.read(length)
+        if urlparse(self.path).path != INGEST_PATH:
+            self._send_json(404, {"error": "Not found"})
+            return
+        if not self._authorized():
+            self._send_json(401, {"error": "Token tidak valid"})
+            return
+
+        try:
+            payload = parse_payload(body)
+        except (ValueError, UnicodeDecodeError):
+            self._send_json(400, {"error": "JSON tidak valid"})
+            return
+
+        readings, errors = validate_readings(payload)
+        if readings:
+            try:
+                self.server.collector.submit_many(readings)
+            except Exception as e:
+                # Mis. disk penuh saat menulis SensorStore - board boleh mengirim ulang batch ini
+                self._send_json(500, {"error": f"Gagal menyimpan data: {str(e)}"})
+                return
+
+        self._send_json(200 if readings or not errors else 400, {
+            "accepted": len(readings),
+            "rejected": errors
+        })
+
+    def log_message(self, format, *args):
+        # Jangan log setiap request - terlalu ramai untuk ribuan reading per detik
+        pass
+
+
+class IngestServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, collector, host=INGEST_BIND_HOST, port=INGEST_PORT):
+        super().__init__((host, port), IngestHandler)
+        self.collector = collector
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name="esp32-ingest", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,177 @@
+"""Mesin rekomendasi hemat energi: top-k per kategori (heap) + aturan berbasis data"""
+import heapq
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+from config import (
+    REC_AC_COMFORT_HOURS,
+    REC_ALWAYS_ON_EXEMPT,
+    REC_ALWAYS_ON_HOURS,
+    REC_HIGH_TOTAL_KWH,
+    REC_LIMIT,
+    REC_STANDBY_POWER_W,
+    REC_TOP_K,
+)
+
+AC_CATEGORY = "AC & Pendingin"
+STANDBY_CATEGORIES = ("Elektronik",)
+AC_NAME = re.compile(r"\bac\b", re.IGNORECASE)  # "AC 1 PK", "ac kamar", "Ac Daikin" - bukan "Kulkas" atau "Vacuum"
+
+GENERAL_TIPS = (
+    "🔌 Cabut charger dan perangkat standby untuk hemat 5-10% energi",
+    "☀️ Maksimalkan pencahayaan alami di siang hari",
+    "❄️ Set AC pada suhu 24-25°C untuk efisiensi optimal",
+)
+
+
+@dataclass
+class Recommendation:
+    message: str
+    saving: float = 0.0  # Perkiraan penghematan (Rp/bulan), dipakai untuk ranking
+    rule: str = ""
+
+
+def top_k_by_category(table, k=REC_TOP_K, field="energy"):
+    """Index k perangkat terbesar per kategori, satu pass dengan min-heap ukuran k
+
+    O(n log k); hasil per kategori urut dari yang terbesar.
+    """
+    heaps = {}
+    values = table.column(field).tolist()
+    categories = table.column("category").tolist()
+    for index, (value, category) in enumerate(zip(values, categories)):
+        heap = heaps.setdefault(category, [])
+        item = (value, -index)  # Nilai sama: perangkat yang lebih dulu menang
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+    return {
+        category: [-neg_index for _, neg_index in sorted(heap, reverse=True)]
+        for category, heap in heaps.items()
+    }
+
+
+def _hour_reduction_saving(table, hours, rate):
+    """Rp/bulan per perangkat jika pemakaian dikurangi `hours` jam/hari (vectorized)"""
+    hours = np.minimum(hours, table.column("hours"))
+    return table.column("power") * hours * table.column("days") / 1000 * rate
+
+
+def _best(mask, saving, k):
+    """Index perangkat di `mask` dengan penghematan terbesar, paling banyak `k`"""
+    indexes = np.flatnonzero(mask)
+    if len(indexes) > k:
+        indexes = indexes[np.argpartition(-saving[indexes], k - 1)[:k]]
+    return indexes
+
+
+# ---------- aturan: (table, tarif, k) -> list Recommendation, paling banyak k per aturan ----------
+def rule_top_consumers(table, rate, k):
+    names = table.column("name")
+    energies = table.column("energy")
+    saving = _hour_reduction_saving(table, 2, rate)
+    return [
+        Recommendation(
+            f"🎯 **{names[index]}** termasuk konsumen terbesar di kategori {category} "
+            f"({energies[index]:.1f} kWh). Mengurangi penggunaan 2 jam/hari dapat menghemat "
+            f"Rp {saving[index]:,.0f}/bulan",
+            float(saving[index]), "top_consumer"
+        )
+        for category, indexes in top_k_by_category(table, k=k).items()
+        for index in indexes
+        if energies[index] > 0
+    ]
+
+
+def rule_always_on(table, rate, k):
+    """Beban yang menyala hampir 24 jam (kecuali yang memang harus selalu menyala)"""
+    names = table.column("name")
+    # AC ditangani rule_long_ac_hours; cek nama hanya untuk kandidat yang lolos filter angka
+    mask = (table.column("hours") >= REC_ALWAYS_ON_HOURS) & (table.column("category") != AC_CATEGORY)
+    for index in np.flatnonzero(mask):
+        name = names[index].lower()
+        if any(keyword in name for keyword in REC_ALWAYS_ON_EXEMPT):
+            mask[index] = False
+
+    # Asumsi bisa dimatikan dengan timer 6 jam/hari (mis. saat tidur)
+    saving = _hour_reduction_saving(table, 6, rate)
+    return [
+        Recommendation(
+            f"⏰ **{names[index]}** menyala {table.column('hours')[index]:.0f} jam/hari. "
+            f"Pasang timer/smart plug untuk mematikannya 6 jam/hari, hemat Rp {saving[index]:,.0f}/bulan",
+            float(saving[index]), "always_on"
+        )
+        for index in _best(mask, saving, k)
+    ]
+
+
+def rule_long_ac_hours(table, rate, k):
+    """AC yang dipakai lebih lama dari jam kenyamanan"""
+    names = table.column("name")
+    hours = table.column("hours")
+    mask = (table.column("category") == AC_CATEGORY) & (hours > REC_AC_COMFORT_HOURS)
+    for index in np.flatnonzero(mask):
+        mask[index] = AC_NAME.search(names[index]) is not None  # Kulkas/freezer juga masuk kategori ini
+
+    saving = _hour_reduction_saving(table, np.maximum(hours - REC_AC_COMFORT_HOURS, 0), rate)
+    return [
+        Recommendation(
+            f"❄️ **{names[index]}** dipakai {hours[index]:g} jam/hari. Batasi ke "
+            f"{REC_AC_COMFORT_HOURS} jam dan set suhu 24-25°C, hemat Rp {saving[index]:,.0f}/bulan",
+            float(saving[index]), "long_ac"
+        )
+        for index in _best(mask, saving, k)
+    ]
+
+
+def rule_standby(table, rate, k):
+    """Perangkat elektronik yang tidak dicabut saat tidak dipakai tetap menarik daya standby"""
+    mask = np.isin(table.column("category"), STANDBY_CATEGORIES) & (table.column("hours") < 24)
+    if not mask.any():
+        return []
+    idle_hours = 24 - table.column("hours")[mask]
+    waste_kwh = float((idle_hours * REC_STANDBY_POWER_W * table.column("days")[mask]).sum() / 1000)
+    saving = waste_kwh * rate
+    return [Recommendation(
+        f"🔌 {int(mask.sum())} perangkat elektronik diperkirakan membuang {waste_kwh:.1f} kWh/bulan "
+        f"saat standby. Cabut atau gunakan stop kontak ber-saklar, hemat Rp {saving:,.0f}/bulan",
+        saving, "standby"
+    )]
+
+
+def rule_high_total(table, rate, k):
+    if table.total("energy") <= REC_HIGH_TOTAL_KWH:
+        return []
+    return [
+        Recommendation("💡 Pertimbangkan upgrade ke perangkat hemat energi (label A++)", rule="high_total"),
+        Recommendation("🌙 Manfaatkan tarif listrik off-peak untuk perangkat besar", rule="high_total"),
+    ]
+
+
+RULES = (rule_top_consumers, rule_always_on, rule_long_ac_hours, rule_standby, rule_high_total)
+
+
+class RecommendationEngine:
+    """Evaluasi semua aturan terhadap DeviceTable, hasil di-cache per versi tabel dan tarif"""
+
+    def __init__(self, rules=RULES, limit=REC_LIMIT, per_rule=REC_TOP_K):
+        self.rules = rules
+        self.limit = limit
+        self.per_rule = per_rule
+        self._cache = None  # ((id tabel, versi, tarif), hasil)
+
+    def recommend(self, table, rate):
+        key = (id(table), table.version, rate)
+        if self._cache is not None and self._cache[0] == key:
+            return self._cache[1]
+
+        candidates = [rec for rule in self.rules for rec in rule(table, rate, self.per_rule)]
+        ranked = heapq.nlargest(self.limit, candidates, key=lambda rec: rec.saving)
+        for tip in GENERAL_TIPS[:max(0, self.limit - len(ranked))]:
+            ranked.append(Recommendation(tip, rule="general"))
+
+        self._cache = (key, ranked)
+        return ranked
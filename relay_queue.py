@@ -0,0 +1,117 @@
+"""Antrian perintah relay per device - menggabungkan perintah beruntun jadi satu request"""
+import threading
+import time
+
+import requests
+
+from config import RELAY_COALESCE_WINDOW, RELAY_WORKER_IDLE_S
+from esp32_client import esp32_get
+
+PENDING = "pending"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+SUPERSEDED = "superseded"
+
+
+class RelayCommand:
+    """Satu perintah relay; `done` di-set saat ESP32 mengkonfirmasi atau gagal"""
+
+    def __init__(self, device, pin, status):
+        self.device = device
+        self.pin = pin
+        self.status = status
+        self.state = PENDING
+        self.message = "⏳ Menunggu dikirim"
+        self.submitted_at = time.time()
+        self.done = threading.Event()
+
+    def resolve(self, state, message):
+        self.state = state
+        self.message = message
+        self.done.set()
+
+
+class RelayCommandQueue:
+    """Satu worker per device; perintah dalam `window` detik dikirim sebagai satu /relay?r1=&r2=
+
+    Worker berhenti sendiri setelah `idle_s` detik tanpa perintah dan dibuat
+    lagi saat ada perintah baru untuk device tersebut.
+    """
+
+    def __init__(self, window=RELAY_COALESCE_WINDOW, idle_s=RELAY_WORKER_IDLE_S):
+        self.window = window
+        self.idle_s = idle_s
+        self._lock = threading.Lock()
+        self._pending = {}  # (ip, port) -> {pin: RelayCommand}
+        self._wakeups = {}  # (ip, port) -> threading.Event
+
+    def submit(self, ip, port, pin, status, current_state=None):
+        """Antrikan perintah; return None jika tidak mengubah state relay"""
+        device = (ip, port)
+        with self._lock:
+            pending = self._pending.setdefault(device, {})
+            previous = pending.get(pin)
+
+            if previous is not None and previous.status == status:
+                # Klik ganda: perintah yang sama sudah ada di antrian
+                return previous
+
+            if status == current_state:
+                if previous is not None:
+                    # Perintah baru membatalkan perintah yang belum terkirim
+                    del pending[pin]
+                    previous.resolve(SUPERSEDED, "↩️ Dibatalkan oleh perintah berikutnya")
+                return None
+
+            if previous is not None:
+                previous.resolve(SUPERSEDED, "↩️ Digantikan oleh perintah berikutnya")
+
+            command = pending[pin] = RelayCommand(device, pin, status)
+            self._ensure_worker(device)
+            self._wakeups[device].set()
+            return command
+
+    def _ensure_worker(self, device):
+        if device not in self._wakeups:
+            self._wakeups[device] = threading.Event()
+            worker = threading.Thread(target=self._run, args=(device,),
+                                      name=f"relay-{device[0]}", daemon=True)
+            worker.start()
+
+    def _run(self, device):
+        wakeup = self._wakeups[device]
+        while True:
+            if not wakeup.wait(self.idle_s):
+                with self._lock:
+                    # Cek ulang di dalam lock: submit bisa saja baru masuk
+                    if not wakeup.is_set() and not self._pending.get(device):
+                        del self._wakeups[device]
+                        self._pending.pop(device, None)
+                        return
+                continue
+            # Tunggu sebentar supaya klik beruntun ikut tergabung
+            time.sleep(self.window)
+            with self._lock:
+                wakeup.clear()
+                batch = self._pending.pop(device, {})
+            if batch:
+                self._send(device, batch)
+
+    def _send(self, device, batch):
+        ip, port = device
+        params = {pin: 1 if command.status else 0 for pin, command in batch.items()}
+        try:
+            response = esp32_get(ip, port, "/relay", params)
+            if response.status_code == 200:
+                for command in batch.values():
+                    action = "MENYALA" if command.status else "MATI"
+                    command.resolve(CONFIRMED, f"✅ {command.pin} {action}")
+                return
+            message = f"❌ Gagal mengontrol relay: HTTP {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            message = f"❌ Tidak dapat terhubung ke ESP32: {str(e)}"
+        except Exception as e:
+            message = f"❌ Error: {str(e)}"
+
+        for command in batch.values():
+            command.resolve(FAILED, message)
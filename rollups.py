@@ -0,0 +1,209 @@
+"""Rollup multi-resolusi (per jam, hari, bulan) yang di-update inkremental dari reading
+
+Setiap bucket menyimpan agregat yang bisa digabung: energi, biaya, jumlah
+sample, jumlah/min/maks daya dan waktu puncak daya. Batch reading baru
+digabung vectorized (reduceat per bucket), sehingga query rentang panjang
+hanya membaca ratusan bucket, bukan jutaan reading mentah.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+from config import ROLLUP_DAY_MAX_DAYS, ROLLUP_HOUR_MAX_DAYS, ROLLUP_HOUR_RETENTION_DAYS
+from sensor_buffer import to_local_datetime
+
+HOUR_MS = 3600 * 1000
+DAY_MS = 24 * HOUR_MS
+TIERS = ("hour", "day", "month")
+
+# Posisi field di list bucket
+ENERGY, COST, SAMPLES, POWER_SUM, POWER_MIN, POWER_MAX, PEAK_MS = range(7)
+
+
+def bucket_starts(timestamps_ms):
+    """Awal bucket jam/hari/bulan (epoch milidetik, batas waktu lokal) untuk array timestamp"""
+    timestamps_ms = np.asarray(timestamps_ms, dtype=np.int64)
+    local = to_local_datetime(timestamps_ms).values
+    local_ms = local.astype("datetime64[ms]").astype(np.int64)
+    offset = local_ms - timestamps_ms  # Selisih waktu lokal terhadap UTC per baris
+    return {
+        "hour": local_ms - local_ms % HOUR_MS - offset,
+        "day": local_ms - local_ms % DAY_MS - offset,
+        "month": local.astype("datetime64[M]").astype("datetime64[ms]").astype(np.int64) - offset,
+    }
+
+
+def pick_tier(start_ms, end_ms):
+    """Tier paling kasar yang masih cukup detail untuk rentang yang ditampilkan"""
+    span = end_ms - start_ms
+    if span <= ROLLUP_HOUR_MAX_DAYS * DAY_MS:
+        return "hour"
+    if span <= ROLLUP_DAY_MAX_DAYS * DAY_MS:
+        return "day"
+    return "month"
+
+
+class RollupEngine:
+    """Agregat per jam/hari/bulan untuk satu deret reading (satu device)
+
+    Biaya dihitung dengan tarif aktif saat reading masuk (blok tarif mengikuti
+    kWh kumulatif bulan berjalan). Saat tarif berubah, biaya dihitung ulang dari
+    bucket per jam; bucket hari/bulan yang lebih tua dari retensi jam tetap
+    memakai biaya lamanya.
+    """
+
+    def __init__(self, tariff=None, hour_retention_days=ROLLUP_HOUR_RETENTION_DAYS):
+        self.tariff = tariff
+        self.hour_retention_ms = hour_retention_days * DAY_MS
+        self.version = 0
+        self.samples = 0
+        self._buckets = {tier: {} for tier in TIERS}  # tier -> {awal bucket: [field...]}
+        self._complete_from = 0  # Bucket jam sebelum waktu ini sudah dibuang retensi
+        self._frames = {}        # tier -> (version, DataFrame)
+
+    def __len__(self):
+        return self.samples
+
+    def clear(self):
+        self._buckets = {tier: {} for tier in TIERS}
+        self._complete_from = 0
+        self.samples = 0
+        self.version += 1
+
+    def copy(self):
+        """Salinan independen untuk copy-on-write"""
+        clone = copy.copy(self)
+        clone._buckets = {tier: {key: list(values) for key, values in buckets.items()}
+                          for tier, buckets in self._buckets.items()}
+        clone._frames = dict(self._frames)
+        return clone
+
+    # ---------- update ----------
+    def add(self, columns, tariff=None):
+        """Gabungkan batch reading (dict kolom / DataFrame dengan timestamp, power, energy)"""
+        if tariff is not None:
+            self.set_tariff(tariff)
+        timestamps = np.asarray(columns["timestamp"], dtype=np.int64)
+        if not len(timestamps):
+            return
+        power = np.asarray(columns["power"], dtype=np.float64)
+        kwh = np.asarray(columns["energy"], dtype=np.float64)
+        if np.any(timestamps[1:] < timestamps[:-1]):
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, power, kwh = timestamps[order], power[order], kwh[order]
+
+        starts = bucket_starts(timestamps)
+        cost = self._batch_costs(timestamps, kwh, starts["month"])
+        for tier in TIERS:
+            self._merge(self._buckets[tier], starts[tier], timestamps, power, kwh, cost)
+
+        self.samples += len(timestamps)
+        self._apply_retention()
+        self.version += 1
+
+    def _batch_costs(self, timestamps, kwh, month_starts):
+        if self.tariff is None:
+            return np.zeros_like(kwh)
+        # kWh bulan yang sudah masuk sebelumnya, supaya blok tarif batch ini tetap benar
+        months = self._buckets["month"]
+        keys, inverse = np.unique(month_starts, return_inverse=True)
+        start_kwh = np.array([months[key][ENERGY] if key in months else 0.0 for key in keys.tolist()])
+        return self.tariff.interval_costs(timestamps, kwh, start_kwh[inverse])
+
+    @staticmethod
+    def _merge(buckets, starts, timestamps, power, kwh, cost):
+        # Data sudah urut waktu, jadi setiap bucket adalah satu potongan kontigu (cukup reduceat)
+        first = np.append(0, np.flatnonzero(np.diff(starts)) + 1)
+        keys = starts[first]
+        energy = np.add.reduceat(kwh, first)
+        costs = np.add.reduceat(cost, first)
+        samples = np.diff(np.append(first, len(starts)))
+        power_sum = np.add.reduceat(power, first)
+        power_min = np.minimum.reduceat(power, first)
+        power_max = np.maximum.reduceat(power, first)
+        # Waktu puncak: baris terakhir di bucket yang dayanya sama dengan maksimum bucket
+        is_peak = power == np.repeat(power_max, samples)
+        peak_ms = timestamps[np.maximum.reduceat(np.where(is_peak, np.arange(len(power)), -1), first)]
+
+        rows = zip(keys.tolist(), energy.tolist(), costs.tolist(), samples.tolist(), power_sum.tolist(),
+                   power_min.tolist(), power_max.tolist(), peak_ms.tolist())
+        for key, *values in rows:
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = values
+                continue
+            bucket[ENERGY] += values[ENERGY]
+            bucket[COST] += values[COST]
+            bucket[SAMPLES] += values[SAMPLES]
+            bucket[POWER_SUM] += values[POWER_SUM]
+            bucket[POWER_MIN] = min(bucket[POWER_MIN], values[POWER_MIN])
+            if values[POWER_MAX] >= bucket[POWER_MAX]:
+                bucket[POWER_MAX] = values[POWER_MAX]
+                bucket[PEAK_MS] = values[PEAK_MS]
+
+    def _apply_retention(self):
+        hours = self._buckets["hour"]
+        if len(hours) * HOUR_MS <= self.hour_retention_ms:
+            return
+        cutoff = max(hours) - self.hour_retention_ms
+        for key in [key for key in hours if key < cutoff]:
+            del hours[key]
+        self._complete_from = max(self._complete_from, cutoff)
+
+    def set_tariff(self, tariff):
+        """Ganti tarif dan hitung ulang biaya semua bucket dari bucket per jam"""
+        if tariff == self.tariff:
+            return
+        self.tariff = tariff
+        hours = self._buckets["hour"]
+        if hours:
+            keys = np.array(sorted(hours), dtype=np.int64)
+            energy = np.array([hours[key][ENERGY] for key in keys.tolist()])
+            costs = tariff.interval_costs(keys, energy)
+            for key, cost in zip(keys.tolist(), costs.tolist()):
+                hours[key][COST] = cost
+
+            starts = bucket_starts(keys)
+            for tier in ("day", "month"):
+                tier_keys, inverse = np.unique(starts[tier], return_inverse=True)
+                totals = np.bincount(inverse, costs, len(tier_keys))
+                buckets = self._buckets[tier]
+                for key, cost in zip(tier_keys.tolist(), totals.tolist()):
+                    # Bucket yang sebagian jamnya sudah dibuang tidak bisa dihitung ulang
+                    if key >= self._complete_from and key in buckets:
+                        buckets[key][COST] = cost
+        self.version += 1
+
+    # ---------- query ----------
+    def frame(self, tier):
+        """Semua bucket satu tier sebagai DataFrame urut waktu (di-cache per versi)"""
+        cached = self._frames.get(tier)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+
+        buckets = self._buckets[tier]
+        keys = np.array(sorted(buckets), dtype=np.int64)
+        values = np.array([buckets[key] for key in keys.tolist()], dtype=np.float64).reshape(-1, 7)
+        samples = values[:, SAMPLES]
+        frame = pd.DataFrame({
+            "start": keys,
+            "time": to_local_datetime(keys),
+            "energy": values[:, ENERGY],
+            "cost": values[:, COST],
+            "samples": samples.astype(np.int64),
+            "power_avg": np.divide(values[:, POWER_SUM], samples, out=np.zeros(len(keys)), where=samples > 0),
+            "power_min": values[:, POWER_MIN],
+            "power_max": values[:, POWER_MAX],
+            "peak_time": to_local_datetime(values[:, PEAK_MS].astype(np.int64)),
+        })
+        self._frames[tier] = (self.version, frame)
+        return frame
+
+    def query(self, tier, start_ms, end_ms):
+        """Bucket tier `tier` yang beririsan dengan [start_ms, end_ms)"""
+        frame = self.frame(tier)
+        start_ms = int(bucket_starts([start_ms])[tier][0])
+        starts = frame["start"].to_numpy()
+        lo, hi = np.searchsorted(starts, [start_ms, end_ms])
+        return frame.iloc[lo:hi]
@@ -0,0 +1,173 @@
+"""Ring buffer kolumnar berbasis NumPy untuk histori data sensor"""
+import copy
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Timezone lokal server, dipakai saat epoch milidetik diformat untuk tampilan
+LOCAL_TZ = datetime.now().astimezone().tzinfo
+
+# Satu array per field: (dtype, nilai default jika field tidak ada di entry)
+SENSOR_FIELDS = {
+    "seq": (np.int64, 0),
+    "timestamp": (np.int64, 0),  # Epoch milidetik
+    "ldr": (np.int32, 0),
+    "statusLDR": (object, ""),
+    "suhu": (np.float64, 0),
+    "statusSuhu": (object, ""),
+    "relay1": (np.int8, 0),
+    "relay2": (np.int8, 0),
+    "power": (np.float64, 0),
+    "voltage": (np.float64, 220),
+    "current": (np.float64, 0),
+    "energy": (np.float64, 0),
+}
+
+
+def now_ms():
+    return int(datetime.now().timestamp() * 1000)
+
+
+def format_timestamp(timestamp_ms, fmt="%Y-%m-%d %H:%M:%S"):
+    """Format satu epoch milidetik ke string waktu lokal"""
+    return datetime.fromtimestamp(timestamp_ms / 1000).strftime(fmt)
+
+
+def to_local_datetime(timestamps_ms):
+    """Konversi array epoch milidetik ke datetime lokal (vectorized, untuk chart/export)"""
+    return pd.to_datetime(timestamps_ms, unit="ms", utc=True).tz_convert(LOCAL_TZ).tz_localize(None)
+
+
+class SensorRingBuffer:
+    """Buffer kapasitas tetap dengan append O(1) dan window N data terakhir tanpa copy
+
+    Setiap nilai ditulis dua kali (posisi i dan i + capacity), sehingga N data
+    terakhir selalu berupa slice kontigu dari array, berapapun posisi head-nya.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.version = 0  # Naik setiap kali isi buffer berubah
+        self._frames = {}  # n -> DataFrame, hanya valid untuk `_frames_version`
+        self._frames_version = 0
+        self._head = 0    # Posisi tulis berikutnya (0..capacity-1)
+        self._size = 0
+        self._columns = {
+            field: np.full(2 * capacity, default, dtype=dtype)
+            for field, (dtype, default) in SENSOR_FIELDS.items()
+        }
+
+    def __len__(self):
+        return self._size
+
+    def append(self, entry, seq=0):
+        head, capacity = self._head, self.capacity
+        for field, (_, default) in SENSOR_FIELDS.items():
+            value = seq if field == "seq" else entry.get(field, default)
+            column = self._columns[field]
+            column[head] = value
+            column[head + capacity] = value
+        self._head = (head + 1) % capacity
+        self._size = min(self._size + 1, capacity)
+        self.version += 1
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def extend_columns(self, columns):
+        """Tambah banyak data sekaligus dari dict array (mis. hasil `window`/`since` buffer lain)"""
+        count = len(next(iter(columns.values()), ()))
+        if count == 0:
+            return
+        if count > self.capacity:
+            columns = {field: values[-self.capacity:] for field, values in columns.items()}
+            count = self.capacity
+
+        index = (self._head + np.arange(count)) % self.capacity
+        for field, (_, default) in SENSOR_FIELDS.items():
+            values = columns.get(field, default)
+            column = self._columns[field]
+            column[index] = values
+            column[index + self.capacity] = values
+        self._head = (self._head + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+        self.version += 1
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+        self.version += 1
+
+    def copy(self):
+        """Salinan independen untuk copy-on-write"""
+        clone = copy.copy(self)
+        clone._columns = {field: values.copy() for field, values in self._columns.items()}
+        clone._frames = dict(self._frames)
+        return clone
+
+    def window(self, n=None):
+        """View read-only dari N data terakhir (default: semua), urut dari terlama"""
+        n = self._size if n is None else min(n, self._size)
+        end = self._head + self.capacity
+        views = {}
+        for field, column in self._columns.items():
+            view = column[end - n:end]
+            view.flags.writeable = False
+            views[field] = view
+        return views
+
+    def since(self, seq):
+        """View data dengan nomor urut > `seq` (kolom seq selalu naik)"""
+        views = self.window()
+        start = np.searchsorted(views["seq"], seq, side="right")
+        return {field: view[start:] for field, view in views.items()}
+
+    def window_since(self, start_ms):
+        """View data dengan timestamp >= `start_ms` (mis. 1 jam terakhir)"""
+        views = self.window()
+        start = np.searchsorted(views["timestamp"], start_ms, side="left")
+        return {field: view[start:] for field, view in views.items()}
+
+    def latest(self):
+        """Data terakhir sebagai dict biasa, atau None jika buffer kosong"""
+        if self._size == 0:
+            return None
+        index = (self._head - 1) % self.capacity
+        return {
+            field: column[index].item() if hasattr(column[index], "item") else column[index]
+            for field, column in self._columns.items() if field != "seq"
+        }
+
+    def records(self, n=None):
+        """N data terakhir sebagai list of dict (untuk tabel log kecil)"""
+        views = self.window(n)
+        return [
+            {field: views[field][i] for field in SENSOR_FIELDS if field != "seq"}
+            for i in range(len(views["seq"]))
+        ]
+
+    def to_frame(self, n=None, start_ms=None):
+        """DataFrame N data terakhir (atau sejak `start_ms`), timestamp sebagai datetime lokal
+
+        Frame N terakhir di-cache per versi buffer dan di-share, jangan diubah in-place.
+        Frame `start_ms` selalu dibangun ulang karena batasnya berubah setiap rerun.
+        """
+        if start_ms is not None:
+            return self._build_frame(self.window_since(start_ms))
+
+        if self._frames_version != self.version:
+            self._frames.clear()
+            self._frames_version = self.version
+        frame = self._frames.get(n)
+        if frame is None:
+            frame = self._frames[n] = self._build_frame(self.window(n))
+        return frame
+
+    @staticmethod
+    def _build_frame(views):
+        views.pop("seq")
+        frame = pd.DataFrame(views)
+        frame["timestamp"] = to_local_datetime(views["timestamp"])
+        return frame
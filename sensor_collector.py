@@ -0,0 +1,263 @@
+"""Background collector data sensor ESP32 - berjalan terpisah dari rerun Streamlit"""
+import asyncio
+import threading
+import time
+
+from anomaly_detector import AnomalyDetector
+from config import (
+    DEVICE_ID,
+    FLEET_MAX_CONCURRENCY,
+    LOCATION,
+    RELAY_POWER_W,
+    ROLLUP_HOUR_RETENTION_DAYS,
+    ROLLUP_SEED_CHUNK_DAYS,
+    SENSOR_HISTORY_SIZE,
+)
+from energy_integrator import EnergyIntegrator, period_keys, period_starts
+from fleet_poller import DeviceRegistry, FleetPoller
+from rollups import DAY_MS, RollupEngine
+from sensor_buffer import SensorRingBuffer
+
+ROLLUP_FIELDS = ("timestamp", "power", "energy")
+
+
+def process_sensor_data(esp32_data):
+    """Mapping data mentah dari ESP32 ke format sensor entry kita"""
+    relay1 = esp32_data.get("relay1", 0)
+    relay2 = esp32_data.get("relay2", 0)
+
+    # Data push boleh membawa waktu baca sendiri (epoch detik), polling pakai waktu sekarang
+    read_time = esp32_data["ts"] if "ts" in esp32_data else time.time()
+
+    return {
+        "device_id": esp32_data.get("device_id", DEVICE_ID),
+        "timestamp": int(read_time * 1000),  # Epoch milidetik, diformat hanya saat ditampilkan
+        "ldr": esp32_data.get("ldr", 0),
+        "statusLDR": esp32_data.get("statusLDR", "Tidak diketahui"),
+        "suhu": esp32_data.get("suhu", 0),
+        "statusSuhu": esp32_data.get("statusSuhu", "Tidak diketahui"),
+        "relay1": relay1,
+        "relay2": relay2,
+        # Calculate power based on relay status (asumsi RELAY_POWER_W per relay aktif)
+        "power": (relay1 + relay2) * RELAY_POWER_W,
+        "voltage": 220,  # Asumsi tegangan tetap
+        "current": ((relay1 + relay2) * RELAY_POWER_W) / 220,
+        "energy": 0  # Diisi oleh EnergyIntegrator (kWh sejak reading sebelumnya)
+    }
+
+
+class SensorCollector:
+    """Thread polling /data semua ESP32 di registry setiap `interval` detik, hasilnya disimpan di buffer"""
+
+    def __init__(self, processor=process_sensor_data, history_size=SENSOR_HISTORY_SIZE,
+                 registry=None, store=None, concurrency=FLEET_MAX_CONCURRENCY):
+        self.processor = processor
+        self.history_size = history_size
+        self.store = store
+        self.integrator = EnergyIntegrator()
+        self.anomalies = AnomalyDetector()
+        self.tariff = None  # Tarif untuk biaya rollup (di-set dashboard)
+        self.interval = 5
+        self.registry = registry if registry is not None else DeviceRegistry()
+        self.poller = FleetPoller(self.registry, self.submit, concurrency=concurrency)
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._buffers = {}  # device_id -> SensorRingBuffer
+        self._rollups = {}  # device_id -> RollupEngine, diisi dari setiap reading yang masuk
+        self._rollup_views = {}  # device_id -> salinan RollupEngine untuk dibaca session
+        self.rollups_ready = threading.Event()  # Di-set setelah seed_rollups selesai
+        self._last_timestamps = {}  # device_id -> timestamp terakhir; reading yang lebih lama di-clamp ke sini
+        self._seq = 0
+        self._thread = threading.Thread(target=self._run, name="esp32-collector", daemon=True)
+
+    def start(self):
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def configure(self, ip, port=80, interval=5, device_id=DEVICE_ID):
+        """Set alamat satu device dan interval polling (dipakai bersama oleh semua session)"""
+        device = self.registry.get(device_id)
+        changed = device is None or (device.ip, device.port) != (ip, port) or interval != self.interval
+        if ip:
+            self.registry.upsert(device_id, ip, port, device.location if device else LOCATION)
+        else:
+            self.registry.remove(device_id)
+        self.interval = max(1, interval)
+        if changed:
+            self._wake.set()
+
+    def request_poll(self, device_id=None):
+        """Minta polling segera tanpa menunggu interval/backoff berikutnya"""
+        self.registry.reset_schedule(device_id)
+        self._wake.set()
+
+    def submit(self, esp32_data):
+        """Masukkan satu bacaan mentah ke buffer device-nya melalui processor"""
+        return self.submit_many([esp32_data])[0]
+
+    def submit_many(self, readings):
+        """Versi batch dari submit - satu kali lock untuk seluruh batch
+
+        Timestamp yang mundur dari reading sebelumnya di device yang sama
+        (push terlambat / tidak berurutan) di-clamp ke timestamp terakhir.
+        """
+        entries = [self.processor(esp32_data) for esp32_data in readings]
+        with self._lock:
+            for entry in entries:
+                # Jaga urutan waktu per device: window buffer dicari dengan bisect atas timestamp
+                last_timestamp = self._last_timestamps.get(entry["device_id"])
+                if last_timestamp is not None and entry["timestamp"] < last_timestamp:
+                    entry["timestamp"] = last_timestamp
+                self._last_timestamps[entry["device_id"]] = entry["timestamp"]
+                if not self.integrator.knows(entry["device_id"]):
+                    self._seed_energy(entry["device_id"], entry["timestamp"])
+                self.integrator.add(entry)
+                self.anomalies.update(entry)
+                self._seq += 1
+                buffer = self._buffers.get(entry["device_id"])
+                if buffer is None:
+                    buffer = self._buffers[entry["device_id"]] = SensorRingBuffer(self.history_size)
+                buffer.append(entry, self._seq)
+
+            by_device = {}
+            for entry in entries:
+                by_device.setdefault(entry["device_id"], []).append(entry)
+            for device_id, device_entries in by_device.items():
+                self._rollup(device_id).add(
+                    {field: [entry[field] for entry in device_entries] for field in ROLLUP_FIELDS}
+                )
+
+        # Simpan permanen di luar lock supaya pembaca buffer tidak menunggu disk
+        if self.store is not None:
+            self.store.append_many(entries)
+        return entries
+
+    def _seed_energy(self, device_id, timestamp):
+        """Lanjutkan total hari/bulan dari store setelah restart (sekali per device)"""
+        if self.store is None:
+            return
+        keys = period_keys(timestamp)
+        for period, start_ms in period_starts(timestamp).items():
+            self.integrator.seed(device_id, period, keys[period],
+                                 self.store.energy_sum(device_id, start_ms, timestamp))
+
+    def _rollup(self, device_id):
+        rollup = self._rollups.get(device_id)
+        if rollup is None:
+            rollup = self._rollups[device_id] = RollupEngine(self.tariff)
+        return rollup
+
+    def seed_rollups(self, now_ms=None):
+        """Bangun ulang rollup dari SensorStore (raw + downsampled) setelah restart
+
+        Hanya reading sebelum `now_ms` yang dibaca; reading setelahnya masuk
+        lewat submit_many, jadi seeding boleh berjalan bersamaan dengan polling.
+        """
+        try:
+            if self.store is None:
+                return
+            end_ms = int(time.time() * 1000) if now_ms is None else now_ms
+            start_ms = end_ms - ROLLUP_HOUR_RETENTION_DAYS * DAY_MS
+            chunk_ms = ROLLUP_SEED_CHUNK_DAYS * DAY_MS
+            for device_id in self.store.devices():
+                for window_start in range(start_ms, end_ms, chunk_ms):
+                    rows = self.store.query(device_id, window_start, min(window_start + chunk_ms, end_ms))
+                    if not rows.empty:
+                        with self._lock:
+                            self._rollup(device_id).add(rows[list(ROLLUP_FIELDS)].fillna(0))
+        finally:
+            self.rollups_ready.set()
+
+    def seed_rollups_background(self):
+        """Jalankan seed_rollups di thread sendiri (scan histori bisa lama), waktu akhirnya diambil sekarang"""
+        thread = threading.Thread(target=self.seed_rollups, args=(int(time.time() * 1000),),
+                                  name="rollup-seed", daemon=True)
+        thread.start()
+        return thread
+
+    def add_history(self, rows):
+        """Masukkan reading lama yang baru ditulis ke store (mis. import arsip) ke rollup dan total energi
+
+        `rows` berisi kolom device_id, timestamp, power, energy. Buffer live tidak
+        disentuh karena reading ini bukan data terbaru.
+        """
+        with self._lock:
+            for device_id, group in rows.groupby("device_id", sort=False):
+                group = group[list(ROLLUP_FIELDS)].fillna(0)
+                self._rollup(device_id).add(group)
+                if self.integrator.knows(device_id):
+                    self.integrator.add_history(device_id, group["timestamp"].to_numpy(), group["energy"].to_numpy())
+
+    def set_tariff(self, tariff):
+        """Tarif baru untuk biaya rollup semua device (biaya lama dihitung ulang)"""
+        with self._lock:
+            self.tariff = tariff
+            for rollup in self._rollups.values():
+                rollup.set_tariff(tariff)
+
+    def rollup_snapshot(self, device_id=DEVICE_ID):
+        """Salinan rollup satu device untuk dibaca (copy-on-write, disalin ulang hanya saat versinya berubah)"""
+        with self._lock:
+            rollup = self._rollup(device_id)
+            view = self._rollup_views.get(device_id)
+            if view is None or view.version != rollup.version:
+                view = self._rollup_views[device_id] = rollup.copy()
+            return view
+
+    def energy_totals(self, device_id=DEVICE_ID, timestamp_ms=None):
+        """Total kWh jam/hari/bulan berjalan per channel - tanpa scan histori"""
+        timestamp_ms = int(time.time() * 1000) if timestamp_ms is None else timestamp_ms
+        with self._lock:
+            return self.integrator.current(device_id, timestamp_ms)
+
+    def anomalies_since(self, seq):
+        """Event anomali (semua device) dengan nomor urut > `seq`"""
+        with self._lock:
+            return self.anomalies.events_since(seq)
+
+    def entries_since(self, seq, device_id=DEVICE_ID):
+        """Kolom data baru setelah nomor urut `seq` - tidak pernah menyentuh jaringan"""
+        with self._lock:
+            buffer = self._buffers.get(device_id)
+            if buffer is None:
+                return self._seq, {}
+            # Copy di dalam lock supaya tidak tertimpa thread collector
+            columns = {field: values.copy() for field, values in buffer.since(seq).items()}
+            return self._seq, columns
+
+    def has_entries_since(self, seq, device_id=DEVICE_ID):
+        """True jika device punya data dengan nomor urut > `seq` (tanpa menyalin data)"""
+        with self._lock:
+            buffer = self._buffers.get(device_id)
+            return buffer is not None and len(buffer) > 0 and int(buffer.window(1)["seq"][-1]) > seq
+
+    def latest(self, device_id=DEVICE_ID):
+        with self._lock:
+            buffer = self._buffers.get(device_id)
+            return buffer.latest() if buffer else None
+
+    def device_status(self, device_id=DEVICE_ID):
+        return self.registry.get(device_id)
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        try:
+            while not self._stopped.is_set():
+                self._wake.clear()
+                loop.run_until_complete(self.poller.poll_once(self.interval))
+                if self.store is not None:
+                    self.store.maybe_apply_retention()
+
+                # Bangun lagi saat ada device jatuh tempo, maksimal setiap `interval` detik
+                devices = self.registry.all()
+                next_poll = min((d.next_poll for d in devices), default=time.time() + self.interval)
+                self._wake.wait(min(max(next_poll - time.time(), 0.1), self.interval))
+        finally:
+            self.poller.shutdown()
+            loop.close()
@@ -0,0 +1,233 @@
+"""Penyimpanan time-series data sensor di SQLite (WAL) dengan retensi & downsampling"""
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from config import (
+    SENSOR_DB_PATH,
+    STORE_DOWNSAMPLE_BUCKET_MS,
+    STORE_DOWNSAMPLED_RETENTION_DAYS,
+    STORE_RAW_RETENTION_DAYS,
+    STORE_RETENTION_INTERVAL,
+)
+
+DAY_MS = 24 * 3600 * 1000
+
+READING_COLUMNS = (
+    "device_id", "timestamp", "ldr", "statusLDR", "suhu", "statusSuhu",
+    "relay1", "relay2", "power", "voltage", "current", "energy",
+)
+
+IMPORTED_COLUMNS = ("device_id", "timestamp", "power", "energy")  # Hasil import_columns (untuk rollup)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    device_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    ldr INTEGER,
+    statusLDR TEXT,
+    suhu REAL,
+    statusSuhu TEXT,
+    relay1 INTEGER,
+    relay2 INTEGER,
+    power REAL,
+    voltage REAL,
+    current REAL,
+    energy REAL
+);
+CREATE INDEX IF NOT EXISTS idx_readings_device_ts ON readings (device_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS readings_downsampled (
+    device_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    ldr REAL,
+    suhu REAL,
+    relay1 REAL,
+    relay2 REAL,
+    power REAL,
+    power_min REAL,
+    power_max REAL,
+    voltage REAL,
+    current REAL,
+    energy REAL,
+    PRIMARY KEY (device_id, timestamp)
+) WITHOUT ROWID;
+"""
+
+
+class SensorStore:
+    """Append-only store; satu koneksi per thread supaya pembaca tidak memblok penulis"""
+
+    def __init__(self, path=SENSOR_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._last_retention = 0.0
+        self.last_error = None
+        self.version = 0  # Naik setiap kali isi store berubah (untuk cache export)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append_many(self, entries):
+        """Tulis satu batch reading dalam satu transaksi"""
+        rows = [tuple(entry.get(column) for column in READING_COLUMNS) for entry in entries]
+        if not rows:
+            return
+        placeholders = ", ".join("?" for _ in READING_COLUMNS)
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    f"INSERT INTO readings ({', '.join(READING_COLUMNS)}) VALUES ({placeholders})", rows
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self.version += 1
+
+    def append_columns(self, columns):
+        """Import satu batch kolom (mis. dari arsip) dalam satu transaksi; return jumlah baris baru"""
+        return len(self.import_columns(columns))
+
+    def import_columns(self, columns):
+        """Seperti append_columns, tapi return DataFrame baris yang benar-benar ditulis
+
+        Reading dengan device_id dan timestamp yang sudah ada dilewati, begitu
+        juga reading lama yang bucket-nya sudah ada di readings_downsampled
+        (supaya tidak di-downsample dua kali), sehingga arsip yang sama aman
+        diimport ulang. Kolom hasil: IMPORTED_COLUMNS.
+        """
+        size = len(columns["timestamp"])
+        if not size:
+            return pd.DataFrame(columns=list(IMPORTED_COLUMNS))
+        values = [
+            columns[column].tolist() if column in columns else [None] * size
+            for column in READING_COLUMNS
+        ]
+        names = ", ".join(READING_COLUMNS)
+        placeholders = ", ".join("?" for _ in READING_COLUMNS)
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute("BEGIN")
+            try:
+                conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS import_readings AS SELECT {names} FROM readings WHERE 0")
+                conn.execute("DELETE FROM import_readings")
+                conn.executemany(f"INSERT INTO import_readings ({names}) VALUES ({placeholders})", zip(*values))
+                # Buang dulu yang sudah ada, sisanya persis baris yang ditulis
+                conn.execute(
+                    "DELETE FROM import_readings AS i "
+                    "WHERE EXISTS (SELECT 1 FROM readings AS r "
+                    "WHERE r.device_id = i.device_id AND r.timestamp = i.timestamp) "
+                    "OR EXISTS (SELECT 1 FROM readings_downsampled AS d "
+                    "WHERE d.device_id = i.device_id AND d.timestamp = (i.timestamp / ?) * ?)",
+                    (STORE_DOWNSAMPLE_BUCKET_MS, STORE_DOWNSAMPLE_BUCKET_MS)
+                )
+                conn.execute(f"INSERT INTO readings ({names}) SELECT {names} FROM import_readings")
+                written = pd.read_sql_query(
+                    f"SELECT {', '.join(IMPORTED_COLUMNS)} FROM import_readings ORDER BY device_id, timestamp", conn
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self.version += 1
+        return written
+
+    def query(self, device_id, start_ms, end_ms):
+        """Reading satu device pada rentang waktu [start_ms, end_ms), raw + hasil downsampling
+
+        Kolom selalu READING_COLUMNS[1:] dengan urutan tetap; baris downsampled
+        tidak punya status, jadi statusLDR/statusSuhu-nya berisi string kosong.
+        """
+        conn = self._connection()
+        raw = pd.read_sql_query(
+            f"SELECT {', '.join(READING_COLUMNS[1:])} FROM readings "
+            "WHERE device_id = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+            conn, params=(device_id, start_ms, end_ms)
+        )
+        downsampled = pd.read_sql_query(
+            "SELECT timestamp, ldr, suhu, relay1, relay2, power, voltage, current, energy "
+            "FROM readings_downsampled "
+            "WHERE device_id = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+            conn, params=(device_id, start_ms, end_ms)
+        )
+        if downsampled.empty:
+            return raw
+        downsampled = downsampled.reindex(columns=list(READING_COLUMNS[1:]), fill_value="")
+        if raw.empty:
+            return downsampled
+        # Data downsampled selalu lebih tua dari data raw
+        return pd.concat([downsampled, raw], ignore_index=True)
+
+    def energy_sum(self, device_id, start_ms, end_ms):
+        """Total kWh satu device pada rentang waktu, dari data raw + downsampled"""
+        conn = self._connection()
+        total = 0.0
+        for table in ("readings", "readings_downsampled"):
+            row = conn.execute(
+                f"SELECT SUM(energy) FROM {table} WHERE device_id = ? AND timestamp >= ? AND timestamp < ?",
+                (device_id, start_ms, end_ms)
+            ).fetchone()
+            total += row[0] or 0.0
+        return total
+
+    def devices(self):
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT DISTINCT device_id FROM readings UNION SELECT DISTINCT device_id FROM readings_downsampled"
+        ).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def apply_retention(self, now_ms=None):
+        """Downsample raw yang lebih tua dari retensi raw, lalu hapus data yang kadaluarsa"""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        raw_cutoff = now_ms - STORE_RAW_RETENTION_DAYS * DAY_MS
+        # Potong di batas bucket supaya satu bucket tidak terbagi dua
+        raw_cutoff -= raw_cutoff % STORE_DOWNSAMPLE_BUCKET_MS
+        downsampled_cutoff = now_ms - STORE_DOWNSAMPLED_RETENTION_DAYS * DAY_MS
+        bucket = STORE_DOWNSAMPLE_BUCKET_MS
+
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute("BEGIN")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO readings_downsampled "
+                    "SELECT device_id, (timestamp / ?) * ? AS bucket, COUNT(*), AVG(ldr), AVG(suhu), "
+                    "AVG(relay1), AVG(relay2), AVG(power), MIN(power), MAX(power), AVG(voltage), "
+                    "AVG(current), SUM(energy) "
+                    "FROM readings WHERE timestamp < ? GROUP BY device_id, bucket",
+                    (bucket, bucket, raw_cutoff)
+                )
+                conn.execute("DELETE FROM readings WHERE timestamp < ?", (raw_cutoff,))
+                conn.execute("DELETE FROM readings_downsampled WHERE timestamp < ?", (downsampled_cutoff,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self.version += 1
+        self._last_retention = time.time()
+
+    def maybe_apply_retention(self):
+        """Jalankan retensi paling sering sekali setiap STORE_RETENTION_INTERVAL detik"""
+        if time.time() - self._last_retention >= STORE_RETENTION_INTERVAL:
+            try:
+                self.apply_retention()
+                self.last_error = None
+            except sqlite3.Error as e:
+                # Jangan hentikan collector, coba lagi di interval berikutnya
+                self.last_error = f"Retensi gagal: {str(e)}"
+                self._last_retention = time.time()
@@ -0,0 +1,89 @@
+"""State dashboard bersama semua session Streamlit dalam satu process
+
+Satu penulis pada satu waktu, banyak pembaca tanpa lock: penulis mengubah
+salinan field yang diminta lalu menerbitkan snapshot baru (copy-on-write),
+sehingga session yang sedang render tetap memegang snapshot lama yang utuh.
+"""
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, fields, replace
+from types import SimpleNamespace
+
+from config import SENSOR_BUFFER_CAPACITY
+from device_table import DeviceTable
+from sensor_buffer import SensorRingBuffer
+
+
+@dataclass(frozen=True)
+class SharedSnapshot:
+    version: int
+    devices: DeviceTable
+    sensor_data: SensorRingBuffer
+    relays: dict             # relay_key -> {"name", "status", "pin"}
+    collector_seq: int = 0   # Nomor urut collector terakhir yang sudah masuk ke sensor_data
+    tariff_code: str = "CUSTOM"  # Golongan tarif yang berlaku untuk semua session
+    energy_rate: float = 1500    # Rp/kWh untuk golongan CUSTOM
+    priced_key: tuple = None  # (tarif, versi tabel) terakhir yang dipakai menghitung biaya
+
+
+def _copy(name, value):
+    if name == "relays":
+        return {key: dict(relay) for key, relay in value.items()}
+    return value.copy() if hasattr(value, "copy") else value
+
+
+class SharedState:
+    """Pemegang snapshot terbaru
+
+    `read()` tidak pernah menunggu penulis. `write(*names)` menyalin field
+    `names`, memberi salinan itu ke blok `with`, lalu mengganti snapshot
+    sekaligus saat blok selesai; jika blok gagal, snapshot lama tetap dipakai.
+    `when` dicek di dalam lock sebelum menyalin, supaya penulis yang datanya
+    sudah didahului session lain tidak menyalin apa pun.
+    """
+
+    def __init__(self, devices=None, relays=None, restored=False,
+                 sensor_capacity=SENSOR_BUFFER_CAPACITY, state_store=None, **initial):
+        self.restored = restored        # True jika inventaris dipulihkan dari disk
+        self.state_store = state_store  # StateStore yang men-journal perubahan tabel perangkat
+        self._write_lock = threading.Lock()
+        self._snapshot = SharedSnapshot(
+            version=0,
+            devices=devices if devices is not None else DeviceTable(),
+            sensor_data=SensorRingBuffer(sensor_capacity),
+            relays=relays or {},
+            **initial,  # Nilai awal field lain (mis. tarif tersimpan)
+        )
+        if self.state_store is not None:
+            self.state_store.attach(self._snapshot.devices)
+
+    def read(self):
+        """Snapshot terbaru - hanya untuk dibaca, perubahan lewat `write`"""
+        return self._snapshot
+
+    @contextmanager
+    def write(self, *names, when=None):
+        """Ubah field `names` pada salinan snapshot; field lain di draft hanya untuk dibaca
+
+        Jika `when(snapshot)` False, blok menerima None dan tidak ada snapshot baru.
+        """
+        with self._write_lock:
+            current = self._snapshot
+            if when is not None and not when(current):
+                yield None
+                return
+            draft = SimpleNamespace(**{field.name: getattr(current, field.name) for field in fields(current)})
+            for name in names:
+                setattr(draft, name, _copy(name, getattr(current, name)))
+            journaled = "devices" in names and self.state_store is not None
+            if journaled:
+                self.state_store.attach(draft.devices)
+            try:
+                yield draft
+            except BaseException:
+                if journaled:
+                    # Perubahan draft mungkin sudah masuk journal: samakan lagi disk dengan tabel lama
+                    self.state_store.resync(current.devices)
+                raise
+            self._snapshot = replace(current, version=current.version + 1,
+                                     **{name: getattr(draft, name) for name in names})
@@ -0,0 +1,161 @@
+"""Persistensi state aplikasi: journal perubahan (JSON lines) + snapshot biner berkala
+
+Restore = baca snapshot (pickle berisi array kolom DeviceTable) lalu replay
+baris journal setelahnya, sehingga session baru siap dalam hitungan milidetik.
+"""
+import json
+import os
+import pickle
+import threading
+
+import pandas as pd
+
+from config import STATE_COMPACT_EVERY, STATE_JOURNAL_PATH, STATE_SNAPSHOT_PATH
+from device_table import NUMERIC_FIELDS, TEXT_FIELDS, DeviceTable
+
+SNAPSHOT_FORMAT = 1
+DERIVED_OPS = ("set_column",)  # Kolom turunan (biaya) dihitung ulang dari tarif setelah restore
+
+
+def _json_default(value):
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class StateStore:
+    """Simpan inventaris perangkat dan pengaturan ke disk
+
+    Setiap perubahan ditulis sebagai satu baris journal bernomor urut. Setelah
+    `compact_every` baris atau saat perubahan massal, state lengkap ditulis ke
+    snapshot dan journal dikosongkan.
+    Snapshot menyimpan nomor urut terakhir yang sudah termasuk, jadi crash di
+    tengah kompaksi tidak membuat perubahan diterapkan dua kali.
+    """
+
+    def __init__(self, snapshot_path=STATE_SNAPSHOT_PATH, journal_path=STATE_JOURNAL_PATH,
+                 compact_every=STATE_COMPACT_EVERY):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._seq = 0          # Nomor urut baris journal terakhir
+        self._pending = 0      # Baris journal sejak snapshot terakhir
+        self._table = None     # DeviceTable terbaru yang perubahannya di-journal
+        self._settings = {}    # Pengaturan terakhir yang tersimpan
+
+    # ---------- restore ----------
+    def load(self):
+        """Return (DeviceTable, settings) dari disk, atau None jika belum pernah ada yang disimpan"""
+        with self._lock:
+            table = DeviceTable()
+            settings = {}
+            snapshot_seq = 0
+            found = os.path.exists(self.snapshot_path)
+            if found:
+                with open(self.snapshot_path, "rb") as f:
+                    snapshot = pickle.load(f)
+                table.extend_frame(pd.DataFrame(snapshot["devices"]))
+                settings = snapshot["settings"]
+                snapshot_seq = snapshot["seq"]
+
+            self._seq = snapshot_seq
+            self._pending = 0
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            break  # Baris terakhir terpotong (crash saat menulis)
+                        if entry["seq"] <= snapshot_seq:
+                            continue  # Sudah termasuk di snapshot
+                        self._apply(table, settings, entry["op"], entry["args"])
+                        self._seq = entry["seq"]
+                        self._pending += 1
+                        found = True
+
+            if not found:
+                return None
+            self._settings = dict(settings)
+            return table, settings
+
+    @property
+    def settings(self):
+        """Pengaturan terakhir yang tersimpan"""
+        return dict(self._settings)
+
+    @staticmethod
+    def _apply(table, settings, op, args):
+        if op == "append":
+            table.append(args[0])
+        elif op == "update":
+            table.update(args[0], args[1])
+        elif op == "pop":
+            table.pop(args[0])
+        elif op == "clear":
+            table.clear()
+        elif op == "settings":
+            settings.clear()
+            settings.update(args[0])
+
+    # ---------- penyimpanan ----------
+    def attach(self, table):
+        """Journal setiap perubahan `table` mulai sekarang
+
+        Tabel yang di-attach sebelumnya dianggap sudah tidak diubah lagi
+        (digantikan salinan copy-on-write ini).
+        """
+        self._table = table
+        table.on_change = lambda op, args: self._record(table, op, args)
+
+    def resync(self, table):
+        """Attach `table` dan tulis ulang snapshot dari isinya (mis. setelah perubahan dibatalkan)"""
+        self.attach(table)
+        with self._lock:
+            self._compact(table)
+
+    def _record(self, table, op, args):
+        if op in DERIVED_OPS:
+            return
+        with self._lock:
+            # Perubahan sudah diterapkan ke tabel, jadi snapshot langsung mencakupnya
+            if op == "extend" or self._pending >= self.compact_every:
+                self._compact(table)
+            else:
+                self._append_journal(op, args)
+
+    def update_settings(self, changes):
+        """Gabungkan `changes` ke pengaturan tersimpan; tidak menulis apa pun jika nilainya sama
+
+        Hanya key yang diberikan yang ditimpa, jadi session yang mengubah satu
+        pengaturan tidak menimpa pengaturan lain dengan nilai session-nya.
+        """
+        with self._lock:
+            settings = dict(self._settings, **changes)
+            if settings == self._settings:
+                return
+            self._settings = settings
+            if self._table is not None and self._pending >= self.compact_every:
+                self._compact(self._table)
+            else:
+                self._append_journal("settings", (settings,))
+
+    def _append_journal(self, op, args):
+        self._seq += 1
+        line = json.dumps({"seq": self._seq, "op": op, "args": list(args)}, default=_json_default)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        self._pending += 1
+
+    def _compact(self, table):
+        snapshot = {
+            "format": SNAPSHOT_FORMAT,
+            "seq": self._seq,
+            "devices": {field: table.column(field).copy() for field in TEXT_FIELDS + NUMERIC_FIELDS},
+            "settings": self._settings,
+        }
+        temporary = self.snapshot_path + ".tmp"
+        with open(temporary, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.snapshot_path)  # Atomic: snapshot lama tetap utuh jika gagal
+        open(self.journal_path, "w").close()
+        self._pending = 0
@@ -0,0 +1,140 @@
+"""Mesin tarif listrik: golongan PLN, tarif blok, waktu beban puncak (TOU), biaya tetap
+
+Semua fungsi menerima skalar maupun array NumPy, sehingga ribuan meter/perangkat
+atau ribuan interval per jam dihitung dalam satu panggilan vectorized.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from sensor_buffer import to_local_datetime
+
+
+@dataclass(frozen=True)
+class Tariff:
+    code: str
+    name: str
+    rates: tuple                # Rp/kWh per blok, blok terakhir tanpa batas atas
+    block_limits: tuple = ()    # Batas atas kWh/bulan tiap blok kecuali blok terakhir
+    peak_hours: tuple = None    # (jam mulai, jam selesai) WBP, waktu lokal
+    peak_factor: float = 1.0    # Pengali tarif saat WBP
+    fixed_charge: float = 0.0   # Abonemen (Rp/bulan)
+    min_hours: float = 0.0      # Rekening minimum: jam nyala x kVA
+    va: int = 0
+
+    @classmethod
+    def flat(cls, rate):
+        return cls("CUSTOM", f"Custom (Rp {rate:,.0f}/kWh)", (float(rate),))
+
+    # ---------- komponen dasar ----------
+    def _blocks(self):
+        lower = np.array((0.0,) + tuple(self.block_limits))
+        width = np.diff(np.append(lower, np.inf))
+        return lower, width, np.asarray(self.rates, dtype=np.float64)
+
+    def energy_charge(self, kwh):
+        """Biaya energi bulanan (tarif blok) untuk array kWh, tanpa pengali TOU"""
+        kwh = np.asarray(kwh, dtype=np.float64)
+        lower, width, rates = self._blocks()
+        tiers = np.clip(kwh[..., None] - lower, 0.0, width)
+        return tiers @ rates
+
+    def peak_mask(self, hours):
+        """True untuk jam lokal (0-23) yang termasuk WBP"""
+        hours = np.asarray(hours)
+        if self.peak_hours is None:
+            return np.zeros(hours.shape, dtype=bool)
+        start, end = self.peak_hours
+        return (hours >= start) & (hours < end)
+
+    @property
+    def uniform_factor(self):
+        """Rata-rata pengali TOU jika pemakaian tersebar rata 24 jam (untuk data tanpa jam)"""
+        if self.peak_hours is None:
+            return 1.0
+        peak = self.peak_hours[1] - self.peak_hours[0]
+        return (peak * self.peak_factor + (24 - peak)) / 24
+
+    @property
+    def minimum_kwh(self):
+        return self.min_hours * self.va / 1000
+
+    # ---------- API batch ----------
+    def energy_cost(self, kwh, peak_kwh=None):
+        """Biaya energi bulanan per meter (tanpa abonemen), termasuk rekening minimum
+
+        `peak_kwh` (opsional) adalah bagian kWh yang dipakai saat WBP; tanpa itu
+        pemakaian dianggap tersebar rata sepanjang hari.
+        """
+        kwh = np.asarray(kwh, dtype=np.float64)
+        if peak_kwh is None:
+            cost = self.energy_charge(kwh) * self.uniform_factor
+        else:
+            peak_kwh = np.minimum(np.asarray(peak_kwh, dtype=np.float64), kwh)
+            # Blok dihitung dari total; porsi WBP mendapat pengali tambahan dari tarif rata-ratanya
+            average = np.divide(self.energy_charge(kwh), kwh, out=np.zeros_like(kwh), where=kwh > 0)
+            cost = self.energy_charge(kwh) + peak_kwh * average * (self.peak_factor - 1)
+        if self.min_hours:
+            cost = np.maximum(cost, self.energy_charge(self.minimum_kwh) * self.uniform_factor)
+        return cost
+
+    def monthly_bill(self, kwh, peak_kwh=None):
+        """Total tagihan bulanan per meter: energi + abonemen"""
+        return self.energy_cost(kwh, peak_kwh) + self.fixed_charge
+
+    def incremental_cost(self, base_kwh, kwh):
+        """Biaya tambahan `kwh` di atas `base_kwh` yang sudah terpakai bulan ini (ikut tarif blok)"""
+        base_kwh = np.asarray(base_kwh, dtype=np.float64)
+        return (self.energy_charge(base_kwh + kwh) - self.energy_charge(base_kwh)) * self.uniform_factor
+
+    def marginal_rate(self, kwh):
+        """Rp/kWh untuk kWh berikutnya pada pemakaian bulanan `kwh` (untuk estimasi penghematan)"""
+        lower, _, rates = self._blocks()
+        block = np.searchsorted(lower, np.asarray(kwh, dtype=np.float64), side="right") - 1
+        return rates[np.maximum(block, 0)] * self.uniform_factor
+
+    def allocate(self, device_kwh):
+        """Bagi biaya energi rumah tangga ke tiap perangkat sesuai porsi kWh-nya"""
+        device_kwh = np.asarray(device_kwh, dtype=np.float64)
+        total = device_kwh.sum()
+        if total <= 0:
+            return np.zeros_like(device_kwh)
+        return device_kwh * (float(self.energy_cost(total)) / total)
+
+    def interval_costs(self, timestamps_ms, kwh, start_kwh=0.0):
+        """Biaya tiap interval (mis. per jam) dari data meter ber-timestamp
+
+        Tarif blok diterapkan pada kWh kumulatif per bulan kalender, pengali WBP
+        mengikuti jam lokal tiap interval. Data harus urut waktu. `start_kwh`
+        (skalar atau per baris) adalah kWh bulan tersebut yang sudah dihitung sebelumnya.
+        """
+        kwh = np.asarray(kwh, dtype=np.float64)
+        moments = to_local_datetime(np.asarray(timestamps_ms, dtype=np.int64))
+        months = moments.year * 12 + moments.month
+        cumulative = pd.Series(kwh).groupby(np.asarray(months)).cumsum().to_numpy() + start_kwh
+        cost = self.energy_charge(cumulative) - self.energy_charge(cumulative - kwh)
+        return cost * np.where(self.peak_mask(np.asarray(moments.hour)), self.peak_factor, 1.0)
+
+
+# Tarif indikatif (Rp/kWh), sesuaikan dengan penetapan tarif PLN yang berlaku
+PLN_TARIFFS = {
+    tariff.code: tariff for tariff in (
+        Tariff("R1-450", "R-1/TR 450 VA (subsidi)", (169.0, 360.0, 495.0), (30, 60),
+               fixed_charge=11000, va=450),
+        Tariff("R1-900", "R-1/TR 900 VA (subsidi)", (275.0, 445.0, 495.0), (20, 60),
+               fixed_charge=20000, va=900),
+        Tariff("R1-900-RTM", "R-1/TR 900 VA (RTM)", (1352.0,), min_hours=40, va=900),
+        Tariff("R1-1300", "R-1/TR 1.300 VA", (1444.70,), min_hours=40, va=1300),
+        Tariff("R1-2200", "R-1/TR 2.200 VA", (1444.70,), min_hours=40, va=2200),
+        Tariff("R2", "R-2/TR 3.500-5.500 VA", (1699.53,), min_hours=40, va=3500),
+        Tariff("R3", "R-3/TR 6.600 VA ke atas", (1699.53,), min_hours=40, va=6600),
+        Tariff("B3", "B-3/TM bisnis (WBP 17-22)", (1114.74,), peak_hours=(17, 22),
+               peak_factor=1.4, min_hours=40, va=200000),
+    )
+}
+
+
+def get_tariff(code, custom_rate):
+    """Tariff untuk kode golongan, atau tarif flat `custom_rate` untuk "CUSTOM" """
+    return PLN_TARIFFS.get(code) or Tariff.flat(custom_rate)
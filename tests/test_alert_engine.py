@@ -0,0 +1,80 @@
+"""Hysteresis, dedup dan cooldown AlertEngine"""
+
+from alert_engine import HOUSEHOLD, READING, AlertEngine, AlertRule
+from device_table import DeviceTable
+from sensor_buffer import SensorRingBuffer
+
+LOW_VOLTAGE = AlertRule("voltage_low", READING, "voltage", "below", 200, 205, "danger",
+                        "Tegangan {value:.0f} V", cooldown_s=60, dedup_s=30)
+OVER_TARGET = AlertRule("household_over_target", HOUSEHOLD, "energy", "above", 0, 0, "warning",
+                        "{value:.0f} > {trigger:.0f} kWh")
+
+
+def voltages(*points):
+    """Buffer dari pasangan (detik, volt)"""
+    buffer = SensorRingBuffer(64)
+    for seq, (second, voltage) in enumerate(points, 1):
+        buffer.append({"timestamp": second * 1000, "voltage": voltage}, seq=seq)
+    return buffer
+
+
+def test_hysteresis_keeps_alert_open_between_trigger_and_clear():
+    engine = AlertEngine(rules=(LOW_VOLTAGE,))
+    engine.evaluate_readings(voltages((0, 220), (10, 195), (20, 198), (30, 203), (40, 199)))
+    (alert,) = engine.active()
+    assert alert.count == 3          # 195, 198, 199 digabung (dedup)
+    assert alert.cleared_ms is None  # 203 belum melewati batas clear 205
+
+    engine.evaluate_readings(voltages((50, 206)))
+    assert engine.active() == []
+    assert alert.cleared_ms == 50_000
+
+
+def test_cooldown_suppresses_immediate_retrigger():
+    engine = AlertEngine(rules=(LOW_VOLTAGE,))
+    engine.evaluate_readings(voltages((10, 195), (50, 206), (60, 195), (70, 210)))
+    assert len(engine.history) == 1  # 60 s: masih dalam cooldown 60 s sejak clear di 50 s
+
+    engine.evaluate_readings(voltages((120, 190)))  # 70 s sejak clear
+    assert len(engine.history) == 2
+    assert engine.active()[0].raised_ms == 120_000
+
+
+def test_stale_open_alert_is_replaced_after_dedup_window():
+    engine = AlertEngine(rules=(LOW_VOLTAGE,))
+    engine.evaluate_readings(voltages((10, 195), (20, 202), (100, 195)))
+    first, second = engine.history
+    assert first.cleared_ms == 10_000  # Ditutup pada waktu terakhir terlihat
+    assert second.raised_ms == 100_000 and second.cleared_ms is None
+
+
+def test_readings_are_evaluated_once():
+    engine = AlertEngine(rules=(LOW_VOLTAGE,))
+    buffer = voltages((10, 195))
+    engine.evaluate_readings(buffer)
+    engine.evaluate_readings(buffer)
+    assert engine.active()[0].count == 1
+
+
+def test_household_target_clears_below_95_percent():
+    engine = AlertEngine(rules=(OVER_TARGET,))
+    table = DeviceTable([{"name": "AC", "category": "AC & Pendingin", "power": 1000, "hours": 10,
+                          "days": 30, "energy": 300, "cost": 0}])
+    engine.evaluate_devices(table, 250)
+    assert len(engine.active()) == 1
+
+    engine.evaluate_devices(table, 290)  # 300 > 290: masih di atas target
+    assert len(engine.active()) == 1
+    engine.evaluate_devices(table, 310)  # 300 <= 310 tapi > 95% (294.5): belum selesai
+    assert len(engine.active()) == 1
+    engine.evaluate_devices(table, 320)  # 300 <= 95% x 320 = 304
+    assert engine.active() == []
+
+
+def test_acknowledge_hides_alert():
+    engine = AlertEngine(rules=(LOW_VOLTAGE,))
+    engine.evaluate_readings(voltages((10, 195)))
+    alert_id = engine.active()[0].id
+    assert engine.acknowledge(alert_id)
+    assert engine.active() == []
+    assert not engine.acknowledge(alert_id + 100)
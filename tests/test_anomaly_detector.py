@@ -0,0 +1,48 @@
+"""Deteksi spike (z-score EWMA), perubahan level (CUSUM) dan batas absolut"""
+from anomaly_detector import CHANGE, LIMIT, SPIKE, AnomalyDetector
+from config import ANOMALY_WARMUP, TEMP_HOT_THRESHOLD, VOLTAGE_LOW_THRESHOLD
+
+
+def feed(detector, values, channel="power", device_id="ESP32", start=0):
+    events = []
+    for i, value in enumerate(values):
+        events += detector.update({"device_id": device_id, "timestamp": (start + i) * 1000, channel: value})
+    return events
+
+
+def test_no_events_on_steady_stream():
+    detector = AnomalyDetector(channels=("power",))
+    assert feed(detector, [500, 520, 480] * 20) == []
+
+
+def test_spike_reported_and_kept_out_of_baseline():
+    detector = AnomalyDetector(channels=("power",))
+    feed(detector, [500] * (ANOMALY_WARMUP + 5))
+    (event,) = feed(detector, [1000], start=100)
+    assert event.kind == SPIKE and event.expected == 500 and event.z > 4
+    assert feed(detector, [500, 500], start=101) == []  # Baseline tidak ikut bergeser ke 1000
+
+
+def test_level_shift_becomes_change_then_new_baseline():
+    detector = AnomalyDetector(channels=("power",))
+    feed(detector, [500] * (ANOMALY_WARMUP + 5))
+    events = feed(detector, [800] * 10, start=100)
+    assert [event.kind for event in events] == [CHANGE]
+    assert events[0].expected < 800
+    assert feed(detector, [800] * 10, start=200) == []
+
+
+def test_absolute_limits():
+    detector = AnomalyDetector(channels=("voltage", "suhu"))
+    events = detector.update({"device_id": "ESP32", "timestamp": 0,
+                              "voltage": VOLTAGE_LOW_THRESHOLD - 1, "suhu": TEMP_HOT_THRESHOLD})
+    assert [(event.channel, event.kind) for event in events] == [("voltage", LIMIT), ("suhu", LIMIT)]
+
+
+def test_events_since_and_stream_limit():
+    detector = AnomalyDetector(channels=("voltage",), max_streams=2)
+    for device_id in ("A", "B", "C"):
+        detector.update({"device_id": device_id, "timestamp": 0, "voltage": 100})
+    assert len(detector._streams) == 2
+    assert [event.device_id for event in detector.events_since(1)] == ["B", "C"]
+    assert detector.events_since(3) == []
@@ -0,0 +1,48 @@
+"""File inventaris yang rusak dilaporkan sebagai ValueError, bukan crash"""
+import io
+import zipfile
+
+import pytest
+
+from device_import import read_inventory, validate_inventory
+
+
+def empty_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("readme.txt", "bukan workbook")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("data, file_name", [
+    (b"name,power,hours\nLampu,10,5\n", "inventaris.xlsx"),  # CSV yang di-rename
+    (empty_zip(), "inventaris.xlsx"),                         # Zip tanpa isi workbook
+    (b"[{\"name\": ", "inventaris.json"),
+], ids=["csv-renamed-xlsx", "zip-without-workbook", "truncated-json"])
+def test_corrupt_file_raises_value_error(data, file_name):
+    if file_name.endswith(".xlsx"):
+        pytest.importorskip("openpyxl")
+    with pytest.raises(ValueError, match="tidak bisa dibaca"):
+        read_inventory(data, file_name)
+
+
+def test_unknown_extension():
+    with pytest.raises(ValueError, match="Format file tidak dikenal"):
+        read_inventory(b"", "inventaris.txt")
+
+
+def test_csv_still_read():
+    frame = read_inventory(b"name,power,hours\nLampu,10,5\n", "inventaris.csv")
+    assert list(frame.columns) == ["name", "power", "hours"]
+
+
+@pytest.mark.parametrize("header, collision", [
+    ("nama,name,power,hours", "name (nama, name)"),
+    ("name,daya,watt,hours", "power (daya, watt)"),
+    ("Name,name ,power,hours", "name (Name, name )"),
+], ids=["nama-name", "daya-watt", "case-whitespace"])
+def test_aliased_duplicate_columns_raise_value_error(header, collision):
+    raw = read_inventory(f"{header}\nLampu,Lampu,10,5\n".encode(), "inventaris.csv")
+    with pytest.raises(ValueError, match="Beberapa kolom berarti sama") as error:
+        validate_inventory(raw)
+    assert collision in str(error.value)
@@ -0,0 +1,76 @@
+"""Integrasi trapesium per jam/hari/bulan, termasuk interval yang melewati batas jam"""
+from datetime import datetime
+
+import pytest
+
+from config import ENERGY_MAX_GAP_MS, RELAY_POWER_W
+from energy_integrator import EnergyIntegrator
+
+MINUTE_MS = 60 * 1000
+
+
+def local_ms(*args):
+    return int(datetime(*args).timestamp() * 1000)
+
+
+def reading(timestamp, power, relay1=0, relay2=0):
+    return {"device_id": "ESP32", "timestamp": timestamp, "power": power, "relay1": relay1, "relay2": relay2}
+
+
+def test_interval_split_at_hour_boundary():
+    integrator = EnergyIntegrator()
+    start = local_ms(2024, 1, 10, 10, 58)
+    integrator.add(reading(start, 0))
+    energy = integrator.add(reading(start + 4 * MINUTE_MS, 120))
+
+    # Rata-rata 60 W selama 4 menit = 4 Wh; daya 60 W tepat di pukul 11:00
+    assert energy == pytest.approx(0.004)
+    assert integrator.totals("ESP32", "hour", "2024-01-10 10:00")["total"] == pytest.approx(0.001)
+    assert integrator.totals("ESP32", "hour", "2024-01-10 11:00")["total"] == pytest.approx(0.003)
+    assert integrator.totals("ESP32", "day", "2024-01-10")["total"] == pytest.approx(0.004)
+    assert integrator.totals("ESP32", "month", "2024-01")["total"] == pytest.approx(0.004)
+
+
+def test_matches_trapezoid_over_many_samples():
+    integrator = EnergyIntegrator()
+    start = local_ms(2024, 1, 10, 9, 30)
+    powers = [100, 300, 200, 0, 50, 400, 400, 150] * 15
+    for i, power in enumerate(powers):
+        integrator.add(reading(start + i * MINUTE_MS, power))
+
+    expected = sum((a + b) / 2 / 60 / 1000 for a, b in zip(powers, powers[1:]))
+    day = integrator.totals("ESP32", "day", "2024-01-10")["total"]
+    hours = sum(integrator.totals("ESP32", "hour", f"2024-01-10 {hour:02d}:00")["total"] for hour in (9, 10, 11))
+    assert day == pytest.approx(expected)
+    assert hours == pytest.approx(expected)
+
+
+def test_relay_channels():
+    integrator = EnergyIntegrator()
+    start = local_ms(2024, 1, 10, 12, 0)
+    integrator.add(reading(start, 0, relay1=1))
+    integrator.add(reading(start + 3 * MINUTE_MS, 0, relay1=1, relay2=1))
+    totals = integrator.totals("ESP32", "hour", "2024-01-10 12:00")
+    assert totals["relay1"] == pytest.approx(RELAY_POWER_W * 3 / 60 / 1000)
+    assert totals["relay2"] == pytest.approx(RELAY_POWER_W / 2 * 3 / 60 / 1000)
+
+
+def test_gap_and_late_readings_are_not_integrated():
+    integrator = EnergyIntegrator()
+    start = local_ms(2024, 1, 10, 12, 0)
+    integrator.add(reading(start, 100))
+    assert integrator.add(reading(start + ENERGY_MAX_GAP_MS + 1, 100)) == 0.0
+    late = reading(start, 100)
+    assert integrator.add(late) == 0.0 and late["energy"] == 0.0
+    assert integrator.totals("ESP32", "day", "2024-01-10")["total"] == 0.0
+
+
+def test_only_current_and_previous_days_are_kept():
+    integrator = EnergyIntegrator()
+    for day in (10, 11, 12):
+        start = local_ms(2024, 1, day, 12, 0)
+        integrator.add(reading(start, 100))
+        integrator.add(reading(start + MINUTE_MS, 100))
+    assert integrator.totals("ESP32", "day", "2024-01-10")["total"] == 0.0
+    assert integrator.totals("ESP32", "day", "2024-01-11")["total"] > 0
+    assert integrator.totals("ESP32", "day", "2024-01-12")["total"] > 0
@@ -0,0 +1,66 @@
+"""Export SensorStore yang melewati batas data raw / downsampled"""
+import io
+
+import pandas as pd
+import pytest
+
+from config import STORE_RAW_RETENTION_DAYS
+from export_service import PYARROW_AVAILABLE, ExportService, frame_chunks, store_chunks, write_csv, write_parquet
+from sensor_store import DAY_MS, READING_COLUMNS, SensorStore
+
+NOW_MS = 1_700_000_000_000
+HOUR_MS = 3600 * 1000
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SensorStore(str(tmp_path / "sensor.db"))
+    timestamps = [NOW_MS - (STORE_RAW_RETENTION_DAYS + 2) * DAY_MS + i * HOUR_MS for i in range(72)]
+    timestamps += [NOW_MS - DAY_MS + i * HOUR_MS for i in range(12)]
+    store.append_many([
+        {"device_id": "ESP32", "timestamp": ts, "ldr": 100, "statusLDR": "Terang", "suhu": 27.5,
+         "statusSuhu": "Normal", "relay1": 1, "relay2": 0, "power": 100.0, "voltage": 220.0,
+         "current": 0.45, "energy": 0.1}
+        for ts in timestamps
+    ])
+    store.apply_retention(NOW_MS)
+    return store
+
+
+def export_range(store):
+    start = NOW_MS - (STORE_RAW_RETENTION_DAYS + 3) * DAY_MS
+    return store_chunks(store, "ESP32", start, NOW_MS, chunk_ms=DAY_MS)
+
+
+def test_query_columns_fixed_across_boundary(store):
+    old = store.query("ESP32", 0, NOW_MS - STORE_RAW_RETENTION_DAYS * DAY_MS)
+    new = store.query("ESP32", NOW_MS - 2 * DAY_MS, NOW_MS)
+    both = store.query("ESP32", 0, NOW_MS)
+    assert list(old.columns) == list(new.columns) == list(both.columns) == list(READING_COLUMNS[1:])
+    assert (old["statusLDR"] == "").all()
+
+
+def test_csv_export_across_boundary(store):
+    data = write_csv(export_range(store))
+    frame = pd.read_csv(io.BytesIO(data), keep_default_na=False)
+    assert list(frame.columns) == list(READING_COLUMNS[1:])
+    assert len(frame) == 72 + 12
+    assert set(frame["statusLDR"]) == {"", "Terang"}
+    assert frame["power"].eq(100.0).all()
+
+
+@pytest.mark.skipif(not PYARROW_AVAILABLE, reason="pyarrow tidak terinstall")
+def test_parquet_export_across_boundary(store):
+    frame = pd.read_parquet(io.BytesIO(write_parquet(export_range(store))))
+    assert list(frame.columns) == list(READING_COLUMNS[1:])
+    assert len(frame) == 72 + 12
+    assert frame["relay1"].eq(1).all()
+
+
+def test_export_cache_is_keyed_on_version():
+    exports = ExportService()
+    frame = pd.DataFrame({"power": [1.0, 2.0]})
+    data = exports.build("sensor", 3, frame_chunks(frame))
+    assert exports.get("sensor", 3) is data
+    assert exports.get("sensor", 4) is None
+    assert exports.get("sensor", 3, "parquet") is None
@@ -0,0 +1,51 @@
+"""Optimasi pengurangan jam: target, urutan rasio, batas minimum dan pengecualian"""
+import numpy as np
+
+from device_table import DeviceTable
+from household_optimizer import default_constraints, optimize_hours
+
+
+def device(name, category, power, hours, days=30):
+    return {"name": name, "category": category, "power": power, "hours": hours, "days": days,
+            "energy": power * hours * days / 1000, "cost": 0.0}
+
+
+def household():
+    return DeviceTable([
+        device("Lampu", "Penerangan", 100, 10),    # 3 kWh/jam, prioritas 3
+        device("AC", "AC & Pendingin", 1000, 8),   # 30 kWh/jam, prioritas 4 -> rasio termurah
+        device("TV", "Elektronik", 200, 6),        # 6 kWh/jam, prioritas 2
+        device("Kulkas", "Dapur", 150, 24),
+    ])
+
+
+def test_target_already_met():
+    table = household()
+    result = optimize_hours(table, table.total("energy") + 1)
+    assert result.feasible and result.needed_kwh == 0 and result.plan.empty
+
+
+def test_cheapest_ratio_first_and_partial_reduction():
+    table = household()
+    result = optimize_hours(table, table.total("energy") - 60)
+    assert result.feasible and result.saved_kwh >= result.needed_kwh == 60
+    assert result.plan["name"].tolist() == ["AC"]
+    assert result.plan["new_hours"].tolist() == [6.0]
+    assert result.comfort_cost == 2 * 4
+
+
+def test_infeasible_uses_all_capacity_but_respects_minimum():
+    table = household()
+    result = optimize_hours(table, 0)
+    assert not result.feasible
+    assert result.saved_kwh < result.needed_kwh
+    assert "Kulkas" not in result.plan["name"].tolist()
+    limits = default_constraints(table).set_index("name")["min_hours"]
+    assert (result.plan["new_hours"].to_numpy() == limits[result.plan["name"]].to_numpy()).all()
+
+
+def test_default_constraints_exempt_always_on():
+    constraints = default_constraints(household()).set_index("name")
+    assert constraints.loc["Kulkas", "min_hours"] == 24
+    assert constraints.loc["AC", "min_hours"] == 4
+    assert np.all(constraints["min_hours"] <= constraints["hours"])
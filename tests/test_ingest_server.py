@@ -0,0 +1,129 @@
+"""Validasi batch push ingestion, server HTTP, dan urutan timestamp di collector"""
+import json
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import ingest_server
+from config import INGEST_MAX_AGE_S, INGEST_MAX_FUTURE_S
+from ingest_server import INGEST_PATH, IngestServer, parse_payload, validate_readings
+from sensor_buffer import SensorRingBuffer
+from sensor_collector import SensorCollector
+
+NOW_S = 1_700_000_000
+
+
+def test_batch_device_id_and_errors_per_index():
+    payload = {"device_id": "ESP32", "readings": [
+        {"ldr": 10, "ts": NOW_S},
+        "bukan object",
+        {"ldr": "10"},
+        {"relay1": True, "suhu": None},
+        {"device_id": "lain", "suhu": 27.5},
+    ]}
+    valid, errors = validate_readings(payload, now=NOW_S)
+    assert [reading["device_id"] for reading in valid] == ["ESP32", "lain"]
+    assert errors == [
+        {"index": 1, "error": "Reading harus object"},
+        {"index": 2, "error": "Field harus numerik: ldr"},
+        {"index": 3, "error": "Field harus numerik: suhu, relay1"},
+    ]
+
+
+def test_missing_device_id():
+    valid, errors = validate_readings([{"ldr": 1}, {"device_id": "", "ldr": 1}], now=NOW_S)
+    assert valid == []
+    assert [error["index"] for error in errors] == [0, 1]
+
+
+@pytest.mark.parametrize("ts, accepted", [
+    (NOW_S, True),
+    (NOW_S - INGEST_MAX_AGE_S, True),
+    (NOW_S - INGEST_MAX_AGE_S - 1, False),
+    (NOW_S + INGEST_MAX_FUTURE_S + 1, False),
+    (NOW_S * 1000, False),  # Milidetik, bukan detik
+])
+def test_ts_range(ts, accepted):
+    valid, errors = validate_readings({"device_id": "ESP32", "ts": ts}, now=NOW_S)
+    assert bool(valid) == accepted
+    assert bool(errors) != accepted
+
+
+def test_nan_rejected_by_parser():
+    with pytest.raises(ValueError):
+        parse_payload(b'{"device_id": "ESP32", "ldr": NaN}')
+
+
+def test_out_of_order_push_keeps_buffer_sorted():
+    collector = SensorCollector()
+    for ts in (1000, 2000, 500, 3000):
+        collector.submit({"device_id": "ESP32", "ts": ts})
+    _, columns = collector.entries_since(0, device_id="ESP32")
+    timestamps = columns["timestamp"]
+    assert list(timestamps) == [1_000_000, 2_000_000, 2_000_000, 3_000_000]
+
+    buffer = SensorRingBuffer(8)
+    buffer.extend_columns(columns)
+    assert list(buffer.window_since(1_500_000)["timestamp"]) == [2_000_000, 2_000_000, 3_000_000]
+
+
+class FakeCollector:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+
+    def submit_many(self, readings):
+        if self.fail:
+            raise OSError("disk penuh")
+        self.batches.append(readings)
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(collector):
+        server = IngestServer(collector, host="127.0.0.1", port=0)
+        server.start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}{INGEST_PATH}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def post(url, body, token=None):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), method="POST")
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_post_accepts_valid_and_reports_rejected(serve):
+    collector = FakeCollector()
+    status, body = post(serve(collector), [{"device_id": "ESP32", "ts": time.time()}, {"ldr": 1}])
+    assert status == 200
+    assert body["accepted"] == 1 and body["rejected"][0]["index"] == 1
+    assert len(collector.batches) == 1
+
+
+def test_post_requires_token(serve, monkeypatch):
+    monkeypatch.setattr(ingest_server, "INGEST_TOKEN", "rahasia")
+    url = serve(FakeCollector())
+    assert post(url, {"device_id": "ESP32"})[0] == 401
+    assert post(url, {"device_id": "ESP32"}, token="salah")[0] == 401
+    assert post(url, {"device_id": "ESP32"}, token="rahasia")[0] == 200
+
+
+def test_post_collector_failure_returns_500(serve):
+    status, body = post(serve(FakeCollector(fail=True)), {"device_id": "ESP32"})
+    assert status == 500
+    assert "disk penuh" in body["error"]
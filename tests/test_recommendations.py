@@ -0,0 +1,83 @@
+"""Aturan rekomendasi terhadap DeviceTable kecil"""
+import pytest
+
+from config import REC_AC_COMFORT_HOURS, REC_HIGH_TOTAL_KWH
+from device_table import DeviceTable
+from recommendations import (
+    RecommendationEngine,
+    rule_always_on,
+    rule_high_total,
+    rule_long_ac_hours,
+    rule_standby,
+    rule_top_consumers,
+    top_k_by_category,
+)
+
+RATE = 1500
+
+
+def device(name, category, power, hours, days=30):
+    return {"name": name, "category": category, "power": power, "hours": hours, "days": days,
+            "energy": power * hours * days / 1000, "cost": 0.0}
+
+
+@pytest.fixture
+def table():
+    return DeviceTable([
+        device("AC 1 PK", "AC & Pendingin", 900, 12),
+        device("ac kamar", "AC & Pendingin", 750, 10),
+        device("Ac Daikin", "AC & Pendingin", 800, 9),
+        device("Kulkas", "AC & Pendingin", 150, 24),
+        device("Vacuum Cleaner", "AC & Pendingin", 600, 10),
+        device("TV", "Elektronik", 120, 6),
+        device("Router", "Elektronik", 10, 24),
+        device("Lampu Teras", "Penerangan", 20, 24),
+    ])
+
+
+def test_top_k_by_category_order_and_limit(table):
+    top = top_k_by_category(table, k=2)
+    assert [table.column("name")[i] for i in top["AC & Pendingin"]] == ["AC 1 PK", "ac kamar"]
+    assert len(top["Elektronik"]) == 2
+    assert len(top["Penerangan"]) == 1
+
+
+def test_top_consumers_respects_k(table):
+    one = rule_top_consumers(table, RATE, 1)
+    assert len(one) == 3  # Satu per kategori
+    assert len(rule_top_consumers(table, RATE, 2)) == 5
+
+
+def test_long_ac_hours_matches_ac_names_case_insensitively(table):
+    names = {rec.message.split("**")[1] for rec in rule_long_ac_hours(table, RATE, 5)}
+    assert names == {"AC 1 PK", "ac kamar", "Ac Daikin"}  # Bukan Kulkas atau Vacuum Cleaner
+
+
+def test_long_ac_saving(table):
+    best = max(rule_long_ac_hours(table, RATE, 1), key=lambda rec: rec.saving)
+    assert best.saving == pytest.approx(900 * (12 - REC_AC_COMFORT_HOURS) * 30 / 1000 * RATE)
+
+
+def test_always_on_skips_exempt_and_ac(table):
+    names = {rec.message.split("**")[1] for rec in rule_always_on(table, RATE, 5)}
+    assert names == {"Router", "Lampu Teras"}
+
+
+def test_standby_counts_only_electronics_below_24h(table):
+    (rec,) = rule_standby(table, RATE, 3)
+    assert rec.message.startswith("🔌 1 perangkat")
+
+
+def test_high_total_threshold():
+    small = DeviceTable([device("Lampu", "Penerangan", 10, 1)])
+    assert rule_high_total(small, RATE, 3) == []
+    big = DeviceTable([device("Pompa", "Lainnya", 1000, REC_HIGH_TOTAL_KWH / 30 + 1)])
+    assert len(rule_high_total(big, RATE, 3)) == 2
+
+
+def test_engine_ranks_by_saving_and_caches(table):
+    engine = RecommendationEngine(limit=4, per_rule=2)
+    ranked = engine.recommend(table, RATE)
+    assert len(ranked) == 4
+    assert [rec.saving for rec in ranked] == sorted((rec.saving for rec in ranked), reverse=True)
+    assert engine.recommend(table, RATE) is ranked
@@ -0,0 +1,34 @@
+"""Penggabungan perintah relay dan berhentinya worker yang menganggur"""
+import time
+
+import pytest
+
+import relay_queue
+from relay_queue import CONFIRMED, SUPERSEDED, RelayCommandQueue
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setattr(relay_queue, "esp32_get",
+                        lambda ip, port, path, params: type("Response", (), {"status_code": 200})())
+    return RelayCommandQueue(window=0.05, idle_s=0.2)
+
+
+def test_superseded_command_is_resolved(queue):
+    first = queue.submit("192.168.1.10", 80, "r1", True, False)
+    queue.submit("192.168.1.10", 80, "r1", False, False)
+    assert first.done.is_set()
+    assert first.state == SUPERSEDED
+    assert first.message
+
+
+def test_idle_worker_stops_and_restarts(queue):
+    command = queue.submit("192.168.1.10", 80, "r1", True, False)
+    assert command.done.wait(2) and command.state == CONFIRMED
+    deadline = time.monotonic() + 2
+    while queue._wakeups and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not queue._wakeups
+
+    command = queue.submit("192.168.1.10", 80, "r1", False, True)
+    assert command.done.wait(2) and command.state == CONFIRMED
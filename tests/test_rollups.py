@@ -0,0 +1,87 @@
+"""Rollup jam/hari/bulan dibandingkan dengan groupby brute-force atas reading mentah"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from rollups import HOUR_MS, RollupEngine, pick_tier
+from sensor_buffer import to_local_datetime
+from tariff import PLN_TARIFFS, Tariff
+
+START_MS = int(pd.Timestamp("2024-01-20 00:00").timestamp() * 1000)
+
+
+@pytest.fixture
+def readings():
+    rng = np.random.default_rng(7)
+    count = 5000
+    timestamps = np.sort(START_MS + rng.integers(0, 70 * 24 * HOUR_MS, count))
+    power = rng.uniform(0, 2000, count).round(1)
+    return pd.DataFrame({"timestamp": timestamps, "power": power, "energy": power / 60_000})
+
+
+def brute_force(readings, tier):
+    local = to_local_datetime(readings["timestamp"].to_numpy())
+    key = {"hour": local.floor("h"), "day": local.normalize(), "month": local.to_period("M").to_timestamp()}[tier]
+    grouped = readings.groupby(np.asarray(key))
+    return pd.DataFrame({
+        "energy": grouped["energy"].sum(),
+        "samples": grouped["power"].size(),
+        "power_avg": grouped["power"].mean(),
+        "power_min": grouped["power"].min(),
+        "power_max": grouped["power"].max(),
+    })
+
+
+def batches(readings, sizes):
+    bounds = np.cumsum([0, *sizes])
+    return [readings.iloc[lo:hi] for lo, hi in zip(bounds, bounds[1:])]
+
+
+@pytest.mark.parametrize("tier", ["hour", "day", "month"])
+def test_totals_match_brute_force(readings, tier):
+    engine = RollupEngine()
+    # Batch tidak berurutan dan memotong bucket di tengah
+    for batch in reversed(batches(readings, [1234, 1, 2000, 1765])):
+        engine.add(batch)
+
+    frame = engine.frame(tier).set_index("time")
+    expected = brute_force(readings, tier)
+    assert list(frame.index) == list(expected.index)
+    for column in expected.columns:
+        np.testing.assert_allclose(frame[column].to_numpy(), expected[column].to_numpy(), rtol=1e-9)
+    assert len(engine) == len(readings)
+
+
+def test_flat_tariff_cost_and_reprice(readings):
+    engine = RollupEngine(Tariff.flat(1000))
+    engine.add(readings)
+    month = engine.frame("month")
+    np.testing.assert_allclose(month["cost"], month["energy"] * 1000)
+
+    engine.set_tariff(Tariff.flat(2000))
+    for tier in ("hour", "day", "month"):
+        frame = engine.frame(tier)
+        np.testing.assert_allclose(frame["cost"], frame["energy"] * 2000)
+
+
+def test_block_tariff_cost_independent_of_batching(readings):
+    tariff = PLN_TARIFFS["R1-900"]
+    whole = RollupEngine(tariff)
+    whole.add(readings)
+    pieces = RollupEngine(tariff)
+    for batch in batches(readings, [999, 2500, 1501]):
+        pieces.add(batch)
+    np.testing.assert_allclose(pieces.frame("hour")["cost"], whole.frame("hour")["cost"])
+    monthly = whole.frame("month")
+    np.testing.assert_allclose(monthly["cost"], tariff.energy_charge(monthly["energy"].to_numpy()))
+
+
+def test_query_range_and_tier(readings):
+    engine = RollupEngine()
+    engine.add(readings)
+    end = START_MS + 3 * 24 * HOUR_MS
+    hours = engine.query("hour", START_MS, end)
+    assert hours["start"].min() >= START_MS and hours["start"].max() < end
+    assert pick_tier(START_MS, end) == "hour"
+    assert pick_tier(START_MS, START_MS + 30 * 24 * HOUR_MS) == "day"
+    assert pick_tier(START_MS, START_MS + 365 * 24 * HOUR_MS) == "month"
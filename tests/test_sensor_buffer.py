@@ -0,0 +1,65 @@
+"""Ring buffer kolumnar: wraparound, window kontigu, dan pencarian berdasarkan seq/waktu"""
+import numpy as np
+import pytest
+
+from sensor_buffer import SensorRingBuffer
+
+
+def filled(capacity, count):
+    buffer = SensorRingBuffer(capacity)
+    for i in range(count):
+        buffer.append({"timestamp": 1000 * i, "power": float(i)}, seq=i + 1)
+    return buffer
+
+
+@pytest.mark.parametrize("count", [0, 3, 5, 7, 13])
+def test_window_after_wraparound_is_latest_in_order(count):
+    buffer = filled(5, count)
+    kept = min(count, 5)
+    assert len(buffer) == kept
+    window = buffer.window()
+    assert list(window["power"]) == [float(i) for i in range(count - kept, count)]
+    assert list(buffer.window(2)["seq"]) == list(range(count - min(2, kept) + 1, count + 1))
+
+
+def test_window_is_contiguous_readonly_view():
+    buffer = filled(4, 11)
+    window = buffer.window()
+    for values in window.values():
+        assert values.base is not None  # Slice dari array internal, bukan salinan
+        assert values.flags["C_CONTIGUOUS"]
+        assert not values.flags.writeable
+    with pytest.raises(ValueError):
+        window["power"][0] = -1
+
+
+def test_since_and_window_since_after_wraparound():
+    buffer = filled(4, 10)  # Isi: seq 7..10, timestamp 6000..9000
+    assert list(buffer.since(8)["seq"]) == [9, 10]
+    assert list(buffer.since(0)["seq"]) == [7, 8, 9, 10]
+    assert list(buffer.window_since(7500)["timestamp"]) == [8000, 9000]
+    assert len(buffer.window_since(10_000)["timestamp"]) == 0
+
+
+def test_extend_columns_wraps_and_truncates_to_capacity():
+    buffer = filled(4, 3)
+    buffer.extend_columns({"seq": np.arange(10, 16), "timestamp": np.arange(6) * 10, "power": np.arange(6.0)})
+    assert len(buffer) == 4
+    assert list(buffer.window()["power"]) == [2.0, 3.0, 4.0, 5.0]
+    assert buffer.latest()["power"] == 5.0
+
+
+def test_copy_is_independent():
+    buffer = filled(3, 2)
+    clone = buffer.copy()
+    clone.append({"power": 99.0}, seq=3)
+    assert len(buffer) == 2 and len(clone) == 3
+    assert buffer.latest()["power"] == 1.0
+
+
+def test_frame_cache_invalidated_by_version():
+    buffer = filled(3, 2)
+    first = buffer.to_frame()
+    assert buffer.to_frame() is first
+    buffer.append({"power": 5.0}, seq=3)
+    assert list(buffer.to_frame()["power"]) == [0.0, 1.0, 5.0]
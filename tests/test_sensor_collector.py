@@ -0,0 +1,68 @@
+"""Rollup collector dibangun dari SensorStore di background"""
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from sensor_collector import SensorCollector
+from sensor_store import SensorStore
+
+HOUR_MS = 3600 * 1000
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SensorStore(str(tmp_path / "sensor.db"))
+    now = int(time.time() * 1000)
+    count = 48
+    store.append_columns({
+        "device_id": np.full(count, "ESP32", dtype=object),
+        "timestamp": now - 2 * 24 * HOUR_MS + np.arange(count, dtype=np.int64) * HOUR_MS,
+        "power": np.full(count, 100.0),
+        "energy": np.full(count, 0.1),
+    })
+    return store
+
+
+def test_seed_runs_in_background_and_sets_ready(store):
+    collector = SensorCollector(store=store)
+    assert not collector.rollups_ready.is_set()
+    collector.seed_rollups_background().join(timeout=10)
+    assert collector.rollups_ready.is_set()
+
+    rollups = collector.rollup_snapshot("ESP32")
+    assert len(rollups) == 48
+    assert rollups.frame("hour")["energy"].sum() == pytest.approx(4.8)
+
+
+def test_ready_without_store():
+    collector = SensorCollector()
+    collector.seed_rollups_background().join(timeout=10)
+    assert collector.rollups_ready.is_set()
+
+
+def test_import_feeds_rollups_and_energy_totals(tmp_path):
+    store = SensorStore(str(tmp_path / "sensor.db"))
+    collector = SensorCollector(store=store)
+    collector.seed_rollups_background().join(timeout=10)
+    noon = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    now = int(noon.timestamp() * 1000)  # Jauh dari pergantian hari
+    collector.submit({"device_id": "ESP32", "ts": now / 1000})
+    before = collector.energy_totals("ESP32", now)["day"]["total"]
+
+    count = 10
+    columns = {
+        "device_id": np.full(count, "ESP32", dtype=object),
+        "timestamp": now - 1000 - np.arange(count, dtype=np.int64) * 1000,
+        "power": np.full(count, 100.0),
+        "energy": np.full(count, 0.01),
+    }
+    rows = store.import_columns(columns)
+    assert len(rows) == count
+    collector.add_history(rows)
+    assert len(collector.rollup_snapshot("ESP32")) == 1 + count
+    assert collector.energy_totals("ESP32", now)["day"]["total"] == pytest.approx(before + 0.1)
+
+    # Import ulang tidak menulis apa-apa, jadi tidak ada yang dihitung dua kali
+    assert store.import_columns(columns).empty
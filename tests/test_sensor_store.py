@@ -0,0 +1,41 @@
+"""Import ulang arsip ke SensorStore setelah data lama di-downsample"""
+import numpy as np
+
+from config import STORE_RAW_RETENTION_DAYS
+from sensor_store import DAY_MS, SensorStore
+
+NOW_MS = 1_700_000_000_000
+
+
+def archive_columns(start_ms, count):
+    return {
+        "device_id": np.full(count, "ESP32", dtype=object),
+        "timestamp": start_ms + np.arange(count, dtype=np.int64) * 10_000,
+        "power": np.full(count, 100.0),
+        "energy": np.full(count, 0.001),
+    }
+
+
+def downsampled_totals(store):
+    return store._connection().execute(
+        "SELECT COUNT(*), SUM(samples), SUM(energy) FROM readings_downsampled"
+    ).fetchone()
+
+
+def test_reimport_of_downsampled_rows_is_noop(tmp_path):
+    store = SensorStore(str(tmp_path / "sensor.db"))
+    old = archive_columns(NOW_MS - (STORE_RAW_RETENTION_DAYS + 1) * DAY_MS, 360)
+    assert store.append_columns(old) == 360
+    store.apply_retention(NOW_MS)
+    before = downsampled_totals(store)
+
+    assert store.append_columns(old) == 0
+    store.apply_retention(NOW_MS)
+    assert downsampled_totals(store) == before
+
+
+def test_reimport_of_raw_rows_is_noop(tmp_path):
+    store = SensorStore(str(tmp_path / "sensor.db"))
+    recent = archive_columns(NOW_MS - DAY_MS, 100)
+    assert store.append_columns(recent) == 100
+    assert store.append_columns(recent) == 0
@@ -0,0 +1,52 @@
+"""Copy-on-write SharedState: pembaca memegang snapshot lama yang utuh"""
+import pytest
+
+from device_table import DeviceTable
+from shared_state import SharedState
+from state_store import StateStore
+
+
+def device(name):
+    return {"name": name, "category": "Lainnya", "power": 100.0, "hours": 1.0, "days": 30.0,
+            "energy": 3.0, "cost": 0.0}
+
+
+def test_write_publishes_new_snapshot_and_keeps_old_one_intact():
+    shared = SharedState(DeviceTable([device("A")]), {"relay1": {"name": "R1", "status": False, "pin": "r1"}})
+    before = shared.read()
+    with shared.write("devices", "relays") as state:
+        state.devices.append(device("B"))
+        state.relays["relay1"]["status"] = True
+
+    after = shared.read()
+    assert after.version == before.version + 1
+    assert len(before.devices) == 1 and before.relays["relay1"]["status"] is False
+    assert len(after.devices) == 2 and after.relays["relay1"]["status"] is True
+    assert after.sensor_data is before.sensor_data  # Field yang tidak ditulis tidak disalin
+
+
+def test_failed_write_keeps_snapshot_and_resyncs_journal(tmp_path):
+    paths = (str(tmp_path / "state.snapshot"), str(tmp_path / "state.journal"))
+    shared = SharedState(DeviceTable([device("A")]), state_store=StateStore(*paths))
+    before = shared.read()
+    with pytest.raises(RuntimeError):
+        with shared.write("devices") as state:
+            state.devices.append(device("B"))
+            raise RuntimeError("gagal")
+
+    assert shared.read() is before
+    table, _ = StateStore(*paths).load()
+    assert list(table.to_frame()["name"]) == ["A"]  # Baris journal draft yang gagal tidak ikut dipulihkan
+
+
+def test_when_predicate_skips_copy_and_publish():
+    shared = SharedState(collector_seq=5)
+    before = shared.read()
+    with shared.write("sensor_data", when=lambda current: current.collector_seq < 5) as state:
+        assert state is None
+    assert shared.read() is before
+
+
+def test_initial_values():
+    shared = SharedState(tariff_code="R1-900", energy_rate=2000)
+    assert (shared.read().tariff_code, shared.read().energy_rate) == ("R1-900", 2000)
@@ -0,0 +1,94 @@
+"""Journal + snapshot StateStore"""
+import pandas as pd
+import pytest
+
+from device_table import DeviceTable
+from state_store import StateStore
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "state.snapshot"), str(tmp_path / "state.journal")
+
+
+def journal_lines(paths):
+    with open(paths[1], encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_update_settings_merges_and_skips_unchanged(paths):
+    store = StateStore(*paths)
+    store.attach(DeviceTable())
+    store.update_settings({"energy_target": 300, "esp32_ip": "10.0.0.2"})
+    store.update_settings({"energy_target": 300})  # Tidak berubah: tidak ada baris baru
+    store.update_settings({"esp32_ip": "10.0.0.3"})
+    assert len(journal_lines(paths)) == 2
+
+    _, settings = StateStore(*paths).load()
+    assert settings == {"energy_target": 300, "esp32_ip": "10.0.0.3"}
+
+
+def device(name, power=100.0):
+    return {"name": name, "category": "Lainnya", "power": power, "hours": 2.0, "days": 30.0,
+            "energy": power * 2 * 30 / 1000, "cost": 0.0}
+
+
+def restored_frame(paths):
+    table, _ = StateStore(*paths).load()
+    return table.to_frame()
+
+
+def test_replay_after_compaction(paths):
+    store = StateStore(*paths, compact_every=3)
+    table = DeviceTable()
+    store.attach(table)
+    for i in range(5):
+        table.append(device(f"D{i}", 10.0 * (i + 1)))  # Kompaksi setelah 3 baris journal
+    table.update(1, {"power": 999.0})
+    table.pop(0)
+    store.update_settings({"energy_target": 250})
+
+    assert len(journal_lines(paths)) < 8  # Sebagian sudah masuk snapshot
+    restored, settings = StateStore(*paths).load()
+    assert restored.to_frame().equals(table.to_frame())
+    assert settings == {"energy_target": 250}
+
+
+def test_crash_between_snapshot_and_journal_truncate(paths):
+    store = StateStore(*paths, compact_every=100)
+    table = DeviceTable()
+    store.attach(table)
+    table.append(device("A"))
+    table.append(device("B"))
+    with open(paths[1], encoding="utf-8") as f:
+        journal = f.read()
+
+    table.extend_frame(pd.DataFrame([device("C")]))  # Perubahan massal: snapshot, lalu journal dikosongkan
+    with open(paths[1], "w", encoding="utf-8") as f:
+        f.write(journal)  # Seolah crash sebelum journal dikosongkan
+
+    assert list(restored_frame(paths)["name"]) == ["A", "B", "C"]  # Tidak diterapkan dua kali
+
+
+def test_truncated_last_line_is_ignored(paths):
+    store = StateStore(*paths)
+    table = DeviceTable()
+    store.attach(table)
+    table.append(device("A"))
+    table.append(device("B"))
+    with open(paths[1], "a", encoding="utf-8") as f:
+        f.write('{"seq": 3, "op": "app')
+    assert list(restored_frame(paths)["name"]) == ["A", "B"]
+
+
+def test_derived_columns_are_not_journaled(paths):
+    store = StateStore(*paths)
+    table = DeviceTable()
+    store.attach(table)
+    table.append(device("A"))
+    table.set_column("cost", [12345.0])
+    assert len(journal_lines(paths)) == 1
+
+
+def test_nothing_saved_returns_none(paths):
+    assert StateStore(*paths).load() is None
@@ -0,0 +1,76 @@
+"""Tarif blok, rekening minimum, abonemen dan WBP"""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from tariff import PLN_TARIFFS, Tariff, get_tariff
+
+R1_900 = PLN_TARIFFS["R1-900"]   # 275 / 445 / 495, batas blok 20 dan 60 kWh
+R1_1300 = PLN_TARIFFS["R1-1300"]  # Flat 1444.70, minimum 40 jam x 1.300 VA
+B3 = PLN_TARIFFS["B3"]            # WBP 17-22 x1.4
+
+
+def local_ms(*args):
+    return int(datetime(*args).timestamp() * 1000)
+
+
+@pytest.mark.parametrize("kwh, expected", [
+    (0, 0.0),
+    (20, 20 * 275),
+    (21, 20 * 275 + 445),
+    (60, 20 * 275 + 40 * 445),
+    (61, 20 * 275 + 40 * 445 + 495),
+])
+def test_block_edges(kwh, expected):
+    assert R1_900.energy_charge(kwh) == pytest.approx(expected)
+
+
+def test_energy_charge_vectorized():
+    np.testing.assert_allclose(R1_900.energy_charge([20, 60]), [5500, 23300])
+
+
+@pytest.mark.parametrize("kwh, rate", [(0, 275), (19.9, 275), (20, 445), (59.9, 445), (60, 495)])
+def test_marginal_rate_at_block_edges(kwh, rate):
+    assert R1_900.marginal_rate(kwh) == pytest.approx(rate)
+
+
+def test_incremental_cost_spans_blocks():
+    assert R1_900.incremental_cost(15, 10) == pytest.approx(5 * 275 + 5 * 445)
+
+
+@pytest.mark.parametrize("kwh, billed_kwh", [(0, 52), (51.9, 52), (52, 52), (80, 80)])
+def test_minimum_bill(kwh, billed_kwh):
+    assert R1_1300.minimum_kwh == pytest.approx(52)
+    assert R1_1300.energy_cost(kwh) == pytest.approx(billed_kwh * 1444.70)
+
+
+def test_fixed_charge_only_in_monthly_bill():
+    tariff = PLN_TARIFFS["R1-450"]
+    assert tariff.monthly_bill(10) == pytest.approx(tariff.energy_cost(10) + 11000)
+
+
+def test_peak_factor_follows_local_hour():
+    timestamps = [local_ms(2024, 3, 5, hour) for hour in (10, 17, 21, 22)]
+    costs = B3.interval_costs(timestamps, np.ones(4))
+    np.testing.assert_allclose(costs, np.array([1, 1.4, 1.4, 1]) * 1114.74)
+    assert B3.uniform_factor == pytest.approx((5 * 1.4 + 19) / 24)
+
+
+def test_interval_blocks_reset_each_month():
+    timestamps = [local_ms(2024, 1, 31, 12), local_ms(2024, 2, 1, 12)]
+    np.testing.assert_allclose(R1_900.interval_costs(timestamps, [15.0, 15.0]), [15 * 275, 15 * 275])
+    # start_kwh: kWh bulan ini yang sudah dihitung sebelumnya
+    assert R1_900.interval_costs(timestamps[:1], [10.0], start_kwh=15.0)[0] == pytest.approx(5 * 275 + 5 * 445)
+
+
+def test_allocate_splits_bill_by_energy_share():
+    shares = R1_900.allocate([10, 30, 0])
+    assert shares.sum() == pytest.approx(R1_900.energy_cost(40))
+    assert shares[1] == pytest.approx(3 * shares[0])
+    assert R1_900.allocate([0, 0]).tolist() == [0, 0]
+
+
+def test_get_tariff_custom():
+    assert get_tariff("CUSTOM", 1234) == Tariff.flat(1234)
+    assert get_tariff("B3", 1234) is B3